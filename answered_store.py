@@ -0,0 +1,328 @@
+import os
+import json
+import fcntl
+import argparse
+import importlib.util
+import threading
+
+# Compacted state (binary runs per category) plus an append-only log of later additions.
+# This is the real answered state (not tracked by git); answered.py is an export of it, see `export`.
+ANSWERED_DIR = ".answered"
+STATE_FILE = "state.bin"
+LOG_FILE = "log.jsonl"
+LOCK_FILE = "lock"
+STATE_MAGIC = b"ANS1"
+# The log is folded into the state file once it grows past this size
+COMPACT_LOG_BYTES = 64 * 1024
+
+# Path of the Python import/export format
+ANSWERED_PYTHON_FILE = "answered.py"
+
+# --------------------------
+# Bitsets and runs
+# --------------------------
+
+def to_bitset(questions):
+    bits = 0
+    for number in questions:
+        bits |= 1 << number
+    return bits
+
+def from_bitset(bits):
+    questions = set()
+    number = 0
+    while bits:
+        if bits & 1:
+            questions.add(number)
+        bits >>= 1
+        number += 1
+    return questions
+
+def bitset_runs(bits):
+    """ Splits a bitset into [start, stop) runs of consecutive answered questions. """
+    runs = []
+    number = 0
+    while bits:
+        # Skip to the next set bit, then measure the run of set bits
+        skip = (bits & -bits).bit_length() - 1
+        bits >>= skip
+        number += skip
+        length = (~bits & (bits + 1)).bit_length() - 1
+        runs.append([number, number + length])
+        bits >>= length
+        number += length
+    return runs
+
+def runs_bitset(runs):
+    bits = 0
+    for start, stop in runs:
+        bits |= ((1 << (stop - start)) - 1) << start
+    return bits
+
+def write_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, offset
+
+def encode_state(state):
+    """ Binary form of `{category name: bitset}`: per category, the name and its runs as (gap, length) varints. """
+    out = bytearray(STATE_MAGIC)
+    write_varint(out, len(state))
+    for name, bits in state.items():
+        encoded_name = name.encode("utf-8")
+        write_varint(out, len(encoded_name))
+        out += encoded_name
+        runs = bitset_runs(bits)
+        write_varint(out, len(runs))
+        previous = 0
+        for start, stop in runs:
+            write_varint(out, start - previous)
+            write_varint(out, stop - start)
+            previous = stop
+    return bytes(out)
+
+def decode_state(data):
+    if not data.startswith(STATE_MAGIC):
+        raise ValueError("Not an answered state file.")
+    state = {}
+    count, offset = read_varint(data, len(STATE_MAGIC))
+    for _ in range(count):
+        length, offset = read_varint(data, offset)
+        name = data[offset:offset + length].decode("utf-8")
+        offset += length
+        run_count, offset = read_varint(data, offset)
+        runs = []
+        previous = 0
+        for _ in range(run_count):
+            gap, offset = read_varint(data, offset)
+            run_length, offset = read_varint(data, offset)
+            runs.append([previous + gap, previous + gap + run_length])
+            previous += gap + run_length
+        state[name] = runs_bitset(runs)
+    return state
+
+# --------------------------
+# answered.py format
+# --------------------------
+
+def format_answered(questions):
+    """ Convert a set of numbers into a mix of `range()` and single numbers. """
+    parts = []
+    for start, stop in bitset_runs(to_bitset(questions)):
+        if stop - start > 1:
+            parts.append(f"range({start}, {stop})")
+        else:
+            parts.append(str(start))
+    return "[" + ", ".join(parts) + "]"
+
+def expand_answered(entries):
+    """ Turns `ANSWERED`-style entries (numbers and ranges) into `{category name: set}`. """
+    answered = {}
+    for entry in entries:
+        answered_set = answered.setdefault(entry["name"], set())
+        for r in entry["answered"]:
+            if isinstance(r, range):
+                answered_set.update(r)
+            else:
+                answered_set.add(r)
+    return answered
+
+def load_answered_python(path=ANSWERED_PYTHON_FILE):
+    spec = importlib.util.spec_from_file_location("answered_import", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ANSWERED
+
+def save_answered_python(answered, path=ANSWERED_PYTHON_FILE):
+    """ Exports `{category name: set}` in the `answered.py` format. """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\nANSWERED = [\n")
+        for category, questions in answered.items():
+            f.write(f'    {{"name": "{category}", "answered": {format_answered(questions)}}},\n')
+        f.write("]\n\n")
+    os.replace(tmp_path, path)
+    print(f"✅ Saved answered questions to `{path}`.")
+
+# --------------------------
+# Store
+# --------------------------
+
+class AnsweredStore:
+    """
+    Answered questions per category, shared safely between threads and processes.
+    Additions are appended to a log (O(delta) per save) under an exclusive file lock;
+    the log is periodically compacted into the binary state file with an atomic rename.
+    """
+
+    def __init__(self, directory=ANSWERED_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.state_path = os.path.join(directory, STATE_FILE)
+        self.log_path = os.path.join(directory, LOG_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        self.thread_lock = threading.Lock()
+        self.state = {}
+        self.state_id = None
+        self.log_offset = 0
+
+    def is_empty(self):
+        return not os.path.exists(self.state_path) and not os.path.exists(self.log_path)
+
+    def file_lock(self):
+        return FileLock(self.lock_path, self.thread_lock)
+
+    def _state_id(self):
+        try:
+            stat = os.stat(self.state_path)
+            return (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            return None
+
+    def _refresh(self):
+        """ Picks up what other writers added: a new state file, then log lines past our offset. """
+        state_id = self._state_id()
+        if state_id != self.state_id:
+            self.state = {}
+            if state_id is not None:
+                with open(self.state_path, "rb") as f:
+                    self.state = decode_state(f.read())
+            self.state_id = state_id
+            self.log_offset = 0
+        try:
+            with open(self.log_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < self.log_offset:
+                    # The log was truncated by a compaction we have not seen yet
+                    self.log_offset = 0
+                f.seek(self.log_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn write of a killed process
+                    self.log_offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.state[record["name"]] = self.state.get(record["name"], 0) | runs_bitset(record["runs"])
+        except FileNotFoundError:
+            pass
+
+    def load(self):
+        """ Returns `{category name: set of answered question numbers}`. """
+        with self.file_lock():
+            self._refresh()
+            return {name: from_bitset(bits) for name, bits in self.state.items()}
+
+    def answered(self, name):
+        with self.file_lock():
+            self._refresh()
+            return from_bitset(self.state.get(name, 0))
+
+    def add(self, name, questions):
+        """ Marks questions of a category as answered. Only the new numbers are written. """
+        with self.file_lock():
+            self._refresh()
+            current = self.state.get(name, 0)
+            new_bits = to_bitset(questions) & ~current
+            if not new_bits:
+                return
+            record = json.dumps({"name": name, "runs": bitset_runs(new_bits)}, ensure_ascii=False) + "\n"
+            with open(self.log_path, "ab") as f:
+                f.write(record.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh()
+            if self.log_offset > COMPACT_LOG_BYTES:
+                self._compact()
+
+    def add_many(self, answered):
+        for name, questions in answered.items():
+            self.add(name, questions)
+
+    def _compact(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encode_state(self.state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+        # Everything in the log is now in the state file
+        open(self.log_path, "wb").close()
+        self.state_id = self._state_id()
+        self.log_offset = 0
+
+    def compact(self):
+        with self.file_lock():
+            self._refresh()
+            self._compact()
+
+    def export(self, path=ANSWERED_PYTHON_FILE):
+        """ Writes the whole state to `answered.py`, so the tracked file follows the store. """
+        with self.file_lock():
+            self._refresh()
+            save_answered_python({name: from_bitset(bits) for name, bits in self.state.items()}, path)
+
+class FileLock:
+    """ Exclusive lock held across threads (threading lock) and processes (flock on a lock file). """
+
+    def __init__(self, path, thread_lock):
+        self.path = path
+        self.thread_lock = thread_lock
+        self.fd = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.thread_lock.release()
+
+def open_answered_store(directory=ANSWERED_DIR):
+    """ Opens the store, importing `answered.py` the first time so no history is lost. """
+    store = AnsweredStore(directory)
+    if store.is_empty() and os.path.exists(ANSWERED_PYTHON_FILE):
+        store.add_many(expand_answered(load_answered_python()))
+        store.compact()
+        print(f"Imported `{ANSWERED_PYTHON_FILE}` into {directory}.")
+    return store
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the answered-questions store.")
+    parser.add_argument("command", choices=["show", "import", "export", "compact"],
+                        help="show: print the state; import/export: merge from / write to answered.py; "
+                             "compact: fold the log into the state file.")
+    parser.add_argument("--file", type=str, default=ANSWERED_PYTHON_FILE,
+                        help=f"answered.py-format file for import/export (default: {ANSWERED_PYTHON_FILE}).")
+    args = parser.parse_args()
+
+    store = open_answered_store()
+    if args.command == "show":
+        for name, questions in store.load().items():
+            print(f"{name}: {format_answered(questions)}")
+    elif args.command == "import":
+        store.add_many(expand_answered(load_answered_python(args.file)))
+        print(f"Merged `{args.file}` into the store.")
+    elif args.command == "export":
+        store.export(args.file)
+    elif args.command == "compact":
+        store.compact()
+        print("Compacted the answered log.")
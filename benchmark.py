@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import psutil
+
+from fixture_server import DEFAULT_QUESTIONS, FIXTURE_PORT, fixture_url, start_fixture_server
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_INTERVAL = 0.05
+MODE_TIMEOUT = 600
+QUIZ_QUESTIONS = 5
+
+# Every mode runs in a fresh working directory against the fixture site.
+# "warmup" runs the same command once (unmeasured) first, e.g. to fill the session and HTTP caches.
+MODES = {
+    "scrape": {"argv": ["scrape.py", "--concurrency", "1", "--no-session-cache"]},
+    "scrape-concurrent": {"argv": ["scrape.py", "--concurrency", "4", "--no-session-cache"]},
+    "scrape-warm": {"argv": ["scrape.py", "--concurrency", "4"], "warmup": True},
+    "resume": {"argv": ["scrape.py", "--concurrency", "4", "--resume"], "warmup": True},
+    "text-only": {"argv": ["scrape.py", "--concurrency", "4", "--text-only", "--no-session-cache"]},
+    # Opens a visible browser and waits for its windows to close; stopped once all questions are open
+    "quiz": {"argv": ["quiz.py", "--categories", "Číslo a početní operace", "--num_questions", str(QUIZ_QUESTIONS),
+                      "--no-daemon"],
+             "stop_after_questions": QUIZ_QUESTIONS + 1, "needs_display": True},
+}
+SCRAPE_ARGS = ["--subject", "ma", "--category", "radio_2", "--detect-total", "--headless"]
+
+def process_tree_rss(process):
+    total = 0
+    try:
+        processes = [process] + process.children(recursive=True)
+    except psutil.Error:
+        return 0
+    for p in processes:
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+def command_for(mode):
+    argv = list(mode["argv"])
+    argv[0] = os.path.join(REPO_DIR, argv[0])
+    if argv[0].endswith("scrape.py"):
+        argv += SCRAPE_ARGS
+    return [sys.executable] + argv
+
+def run_once(command, workdir, env, state, stop_after_questions=None, timeout=MODE_TIMEOUT):
+    """ Runs one command and samples its process tree. Returns the raw measurements. """
+    state.reset_stats()
+    with open(os.path.join(workdir, "output.log"), "ab") as log:
+        started = time.time()
+        process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        tree = psutil.Process(process.pid)
+        peak_rss = 0
+        while process.poll() is None:
+            peak_rss = max(peak_rss, process_tree_rss(tree))
+            stats = state.stats()
+            if stop_after_questions and stats["question_pages"] >= stop_after_questions:
+                process.terminate()
+            if time.time() - started > timeout:
+                print(f"Timed out after {timeout} s, stopping.")
+                process.kill()
+            time.sleep(SAMPLE_INTERVAL)
+        finished = time.time()
+    stats = state.stats()
+    first = stats["first_question_at"]
+    return {
+        "exit_code": process.returncode,
+        "wall_s": finished - started,
+        "ttfq_s": first - started if first else None,
+        "question_pages": stats["question_pages"],
+        "questions_per_s": stats["question_pages"] / (finished - first) if first and finished > first else None,
+        "peak_rss_mb": peak_rss / (1024 * 1024),
+        "requests": stats["requests"],
+        "bytes_transferred": stats["bytes_sent"],
+    }
+
+def run_mode(name, state, port, keep_dirs=False):
+    mode = MODES[name]
+    workdir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    env = dict(os.environ, CERMAT_BASE_URL=fixture_url(port))
+    command = command_for(mode)
+    try:
+        if mode.get("warmup"):
+            run_once(command, workdir, env, state, mode.get("stop_after_questions"))
+        return run_once(command, workdir, env, state, mode.get("stop_after_questions"))
+    finally:
+        if keep_dirs:
+            print(f"Output of {name} kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def format_value(value, digits=2):
+    if value is None:
+        return "-"
+    return f"{value:.{digits}f}" if isinstance(value, float) else str(value)
+
+def print_report(results):
+    header = f"{'mode':<18} {'ttfq s':>8} {'q/s':>8} {'wall s':>8} {'peak MB':>8} {'requests':>9} {'kB sent':>9} {'exit':>5}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<18} {format_value(r['ttfq_s']):>8} {format_value(r['questions_per_s']):>8} "
+              f"{format_value(r['wall_s']):>8} {format_value(r['peak_rss_mb'], 0):>8} {r['requests']:>9} "
+              f"{r['bytes_transferred'] / 1024:>9.1f} {r['exit_code']:>5}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scripts against the local fixture site.")
+    parser.add_argument("--modes", nargs="*", choices=sorted(MODES), default=None,
+                        help="Modes to run (default: all; quiz only when a display is available).")
+    parser.add_argument("--questions", type=int, default=DEFAULT_QUESTIONS,
+                        help=f"Questions per category on the fixture site (default: {DEFAULT_QUESTIONS}).")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay the fixture adds to every response.")
+    parser.add_argument("--port", type=int, default=FIXTURE_PORT, help=f"Fixture site port (default: {FIXTURE_PORT}).")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this JSON file.")
+    parser.add_argument("--keep", action="store_true", help="Keep each mode's working directory for inspection.")
+    args = parser.parse_args()
+
+    modes = args.modes
+    if modes is None:
+        has_display = bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")) or sys.platform != "linux"
+        modes = [name for name, mode in MODES.items() if has_display or not mode.get("needs_display")]
+
+    server, state = start_fixture_server(args.port, args.questions, args.latency_ms)
+    print(f"Fixture site on {fixture_url(args.port)}: {args.questions} questions, {args.latency_ms} ms latency.")
+    results = {}
+    try:
+        for name in modes:
+            print(f"Running {name}...")
+            results[name] = run_mode(name, state, args.port, args.keep)
+    finally:
+        server.shutdown()
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"questions": args.questions, "latency_ms": args.latency_ms, "results": results}, f, indent=1)
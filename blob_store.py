@@ -0,0 +1,265 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+
+from checkpoint import CHECKPOINT_DIR, write_atomic
+
+# Content-addressed store: every screenshot and text is kept once, as blobs/<2 hex>/<62 hex> named by its SHA-256
+# (the same hash the checkpoint manifests record). The screenshots/ and html_pages/ files become hard links
+# to these objects, so everything that reads the trees keeps working while identical bytes take disk space once.
+BLOB_DIR = "blobs"
+# Objects younger than this are never collected, so a running scrape cannot lose one between write and link
+GC_GRACE_SECONDS = 60 * 60
+OUTPUT_FILE = re.compile(r"^(question_\d+|results)\.(png|webp|avif|html)$")
+
+STORE = None
+
+class BlobStore:
+    """
+    Hash-named objects under `root`, fanned out by the first two hex digits.
+    Objects are read-only; the output trees are only ever changed by replacing links (see `write_atomic`).
+    """
+
+    def __init__(self, root=BLOB_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        self.written = self.written_bytes = 0
+        self.duplicates = self.duplicate_bytes = 0
+
+    def object_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def count(self, size, duplicate):
+        with self.lock:
+            if duplicate:
+                self.duplicates += 1
+                self.duplicate_bytes += size
+            else:
+                self.written += 1
+                self.written_bytes += size
+
+    def put(self, data):
+        """ Stores `data` unless an identical object exists. Returns its hash. """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            self.count(len(data), True)
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A unique temporary name: several processes may store the same object at once
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, path)
+        self.count(len(data), False)
+        return digest
+
+    def link(self, digest, path):
+        """ Points `path` at the object, as a hard link (a copy where the filesystem has none). """
+        source = self.object_path(digest)
+        if os.path.exists(path) and os.path.samefile(source, path):
+            return
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.link"
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, path)
+
+    def write(self, path, data):
+        """ Drop-in for `write_atomic`: writes the object once and links `path` to it. Returns the hash. """
+        digest = self.put(data)
+        self.link(digest, path)
+        return digest
+
+    def adopt(self, path):
+        """
+        Moves a file written by other means (strip-by-strip PNGs, older trees) into the store.
+        If the content is already there, the file is replaced by a link and its own copy freed.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.object_path(digest)
+        if os.path.exists(target):
+            if not os.path.samefile(target, path):
+                self.count(len(data), True)
+                self.link(digest, path)
+            return digest
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(path, target)
+            os.chmod(target, 0o444)
+            self.count(len(data), False)
+        except FileExistsError:
+            self.link(digest, path)
+        except OSError:
+            self.put(data)
+            self.link(digest, path)
+        return digest
+
+    def objects(self):
+        """ Yields (hash, path) of every object. """
+        if not os.path.isdir(self.root):
+            return
+        for prefix in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if not name.endswith(".tmp"):
+                    yield prefix + name, os.path.join(folder, name)
+
+    def print_stats(self):
+        if self.written or self.duplicates:
+            print(f"Blob store: {self.written} new objects ({self.written_bytes / 1e6:.1f} MB written), "
+                  f"{self.duplicates} duplicates linked ({self.duplicate_bytes / 1e6:.1f} MB not written).")
+
+# --------------------------
+# Active store of a scrape run
+# --------------------------
+
+def enable_blob_store(root):
+    """ Sends the outputs of `write_output` and `adopt_output` through the store at `root`. """
+    global STORE
+    STORE = BlobStore(root)
+    print(f"Writing outputs through the blob store in {root}/")
+
+def finish_blob_store():
+    global STORE
+    if STORE is not None:
+        STORE.print_stats()
+        STORE = None
+
+def write_output(path, data):
+    """ Writes a screenshot or text atomically, through the blob store when one is enabled. """
+    if STORE is not None:
+        STORE.write(path, data)
+    else:
+        write_atomic(path, data)
+
+def adopt_output(path):
+    if STORE is not None:
+        STORE.adopt(path)
+
+# --------------------------
+# Maintenance
+# --------------------------
+
+def manifest_records(checkpoint_dir=CHECKPOINT_DIR):
+    """ Yields (manifest, kind, name, record) for every output the checkpoint manifests recorded. """
+    if not os.path.isdir(checkpoint_dir):
+        return
+    for filename in sorted(os.listdir(checkpoint_dir)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(checkpoint_dir, filename), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable manifest {filename}:", e)
+            continue
+        for question_number, entry in manifest.get("questions", {}).items():
+            for kind in ("png", "html"):
+                if kind in entry:
+                    yield manifest, kind, f"question_{question_number}", entry[kind]
+        if "results" in manifest:
+            yield manifest, "png", "results", manifest["results"]
+
+def collect_garbage(store, checkpoint_dir=CHECKPOINT_DIR, dry_run=False):
+    """
+    Removes objects that no manifest references and no output file links to any more
+    (e.g. older versions of re-captured questions). Returns (objects removed, bytes freed).
+    """
+    referenced = {record["sha256"] for _, _, _, record in manifest_records(checkpoint_dir)}
+    removed = freed = 0
+    now = time.time()
+    for digest, path in list(store.objects()):
+        stat = os.stat(path)
+        if digest in referenced or stat.st_nlink > 1 or now - stat.st_mtime < GC_GRACE_SECONDS:
+            continue
+        removed += 1
+        freed += stat.st_size
+        if not dry_run:
+            os.remove(path)
+    for prefix in (os.listdir(store.root) if os.path.isdir(store.root) and not dry_run else []):
+        try:
+            os.rmdir(os.path.join(store.root, prefix))
+        except OSError:
+            pass
+    return removed, freed
+
+def import_tree(store, roots):
+    """ Moves the existing output files under `roots` into the store. Returns the number of files. """
+    count = 0
+    for root in roots:
+        for folder, _, filenames in os.walk(root):
+            for filename in filenames:
+                if OUTPUT_FILE.match(filename):
+                    store.adopt(os.path.join(folder, filename))
+                    count += 1
+    return count
+
+def image_extension(path):
+    with open(path, "rb") as f:
+        header = f.read(12)
+    if header[:4] == b"RIFF" and header[8:] == b"WEBP":
+        return ".webp"
+    if header[4:12] in (b"ftypavif", b"ftypavis"):
+        return ".avif"
+    return ".png"
+
+def checkout(store, screenshot_dir="screenshots", html_dir="html_pages", checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Recreates the output trees from the manifests and the objects, e.g. after copying
+    `blobs/` and `checkpoints/` to another machine. Returns (files linked, objects missing).
+    """
+    linked = missing = 0
+    for manifest, kind, name, record in manifest_records(checkpoint_dir):
+        if not manifest.get("folder"):
+            continue
+        source = store.object_path(record["sha256"])
+        if not os.path.exists(source):
+            missing += 1
+            continue
+        if kind == "html":
+            path = os.path.join(html_dir, manifest["folder"], name + ".html")
+        else:
+            path = os.path.join(screenshot_dir, manifest["folder"], name + image_extension(source))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        store.link(record["sha256"], path)
+        linked += 1
+    return linked, missing
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the content-addressed store of screenshots and texts.")
+    parser.add_argument("--store", type=str, default=BLOB_DIR, help=f"Store directory (default: {BLOB_DIR}).")
+    parser.add_argument("--screenshot-dir", type=str, default="screenshots")
+    parser.add_argument("--html-dir", type=str, default="html_pages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    gc_parser = subparsers.add_parser("gc", help="Remove objects nothing refers to any more.")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed.")
+    subparsers.add_parser("import", help="Move existing screenshot and text files into the store (hard links).")
+    subparsers.add_parser("checkout", help="Recreate the output trees from the checkpoint manifests.")
+    args = parser.parse_args()
+
+    store = BlobStore(args.store)
+    if args.command == "gc":
+        removed, freed = collect_garbage(store, dry_run=args.dry_run)
+        print(f"{'Would remove' if args.dry_run else 'Removed'} {removed} unreferenced objects "
+              f"({freed / 1e6:.1f} MB).")
+    elif args.command == "import":
+        count = import_tree(store, [args.screenshot_dir, args.html_dir])
+        print(f"Imported {count} files.")
+        store.print_stats()
+    elif args.command == "checkout":
+        linked, missing = checkout(store, args.screenshot_dir, args.html_dir)
+        print(f"Linked {linked} files" + (f", {missing} objects missing (copy them from the source store)."
+                                         if missing else "."))
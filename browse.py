@@ -1,45 +1,33 @@
 import os
 import time
+import asyncio
 import argparse
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 import psutil
 from questions import CATEGORIES
 from answered import ANSWERED
-from common import accept_cookies, click_prijimacky, select_category, select_subject, wait_for_subject_selection
+from common import TEST_URL, set_legacy_waits, wait_for_question_ready
+from daemon import daemon_request
+from offline import open_offline, question_url
+from session_cache import open_category_page
 
-def main(subject, category_radio_id, start_question):
-    base_test_url = "https://tau.cermat.cz/test-kategorie.php?poradi_ulohy="
+async def main(subject, category_radio_id, start_question):
+    base_test_url = TEST_URL
 
-    with sync_playwright() as p:
+    async with async_playwright() as p:
         # Launch the browser; set headless=True if you do not need the UI.
-        browser = p.chromium.launch(headless=False)
-        browser = p.chromium.launch(headless=False, args=["--start-maximized"], ignore_default_args=["--enable-automation"])
-        context = browser.new_context(no_viewport=True)  # Ensures it uses the full maximized window
+        browser = await p.chromium.launch(headless=False, args=["--start-maximized"], ignore_default_args=["--enable-automation"])
+        # Steps 1-5: Reach the category, from a saved session snapshot when possible.
+        # no_viewport ensures it uses the full maximized window.
+        context, page = await open_category_page(browser, subject, category_radio_id, no_viewport=True)
 
-        page = context.new_page()
-
-        # Step 1: Open Homepage and Accept Cookies
-        page.goto("https://tau.cermat.cz/")
-        accept_cookies(page)
-
-        # Step 2: Click on the PŘIJÍMAČKY Button
-        click_prijimacky(page)
-
-        # Step 3: Wait for subject selection page to load
-        wait_for_subject_selection(page)
-
-        # Step 4: Select subject
-        select_subject(page, subject)
-        # Step 5: Select category and submit
-        select_category(page, category_radio_id)
-    
         question_url = base_test_url + str(start_question)
 
         print("Navigating to:", question_url)
-        page.goto(question_url)
-        page.wait_for_load_state("networkidle")
+        await page.goto(question_url)
+        await wait_for_question_ready(page)
 
-        page.wait_for_timeout(9999999)
+        await page.wait_for_timeout(9999999)
 
 def find_category(name):
     for item in CATEGORIES:
@@ -54,7 +42,27 @@ if __name__ == "__main__":
     parser.add_argument("--name", type=str, help="Name of the category.")
     parser.add_argument("--question", type=int, default=1,
                         help="Question number to open (default: 1).")
+    parser.add_argument("--legacy-waits", action="store_true",
+                        help="Use the old fixed sleeps and networkidle waits instead of the readiness checks.")
+    parser.add_argument("--offline", action="store_true",
+                        help="Show the question from the local scraped output instead of tau.cermat.cz.")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="Start a browser here even if a daemon.py browser pool is running.")
     args = parser.parse_args()
+    set_legacy_waits(args.legacy_waits)
+
+    # Offline: show the scraped copy of the question, no browser automation at all
+    if args.offline:
+        item = find_category(args.name)
+        open_offline([question_url(item["subject"], item["category"], args.question)])
+        raise SystemExit(0)
+
+    # A running browser pool opens the question instantly in its warm context
+    if not args.no_daemon:
+        result = daemon_request("/open", {"category": args.name, "questions": [args.question]})
+        if result is not None:
+            print(result.get("error") or f"Opened question {args.question} of '{args.name}' in the browser pool.")
+            raise SystemExit(0)
 
     # Configuration
     item = find_category(args.name)
@@ -62,4 +70,4 @@ if __name__ == "__main__":
     subject = item["subject"]
     start_question = args.question
 
-    main(subject, category_radio_id, start_question)
+    asyncio.run(main(subject, category_radio_id, start_question))
@@ -0,0 +1,42 @@
+import os
+import json
+import time
+import fcntl
+
+# Per-category metadata (total question count, when it was last seen) shared by all entry points
+CATEGORY_CACHE_FILE = ".category_cache.json"
+# Cached totals older than this are not trusted for sampling
+CATEGORY_CACHE_TTL = 7 * 24 * 60 * 60
+
+def cache_key(subject, category_radio_id):
+    return f"{subject}/{category_radio_id}"
+
+def load_category_cache(path=CATEGORY_CACHE_FILE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def cached_total(subject, category_radio_id, ttl=CATEGORY_CACHE_TTL, path=CATEGORY_CACHE_FILE):
+    """ Returns the cached total number of questions, or None if unknown or older than `ttl`. """
+    entry = load_category_cache(path).get(cache_key(subject, category_radio_id))
+    if not entry or time.time() - entry["seen_at"] > ttl:
+        return None
+    return entry["total"]
+
+def remember_total(subject, category_radio_id, total, path=CATEGORY_CACHE_FILE):
+    """ Records a total read from `span.pocet_text`. Safe against concurrent writers. """
+    if total is None:
+        return
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        cache = load_category_cache(path)
+        previous = cache.get(cache_key(subject, category_radio_id), {}).get("total")
+        if previous is not None and previous != total:
+            print(f"Cached total for {subject}/{category_radio_id} was stale ({previous} -> {total}), refreshed.")
+        cache[cache_key(subject, category_radio_id)] = {"total": total, "seen_at": time.time()}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=1)
+        os.replace(tmp_path, path)
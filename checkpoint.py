@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+
+# One manifest per (subject, category radio id), recording every completed question
+CHECKPOINT_DIR = "checkpoints"
+# Every complete PNG ends with the IEND chunk (type + CRC)
+PNG_TRAILER = b"IEND\xaeB`\x82"
+# Screenshot formats the image pipeline can write (see image_pipeline.py)
+SCREENSHOT_EXTENSIONS = (".png", ".webp", ".avif")
+
+def manifest_path(subject, category_radio_id):
+    return os.path.join(CHECKPOINT_DIR, f"{subject}_{category_radio_id}.json")
+
+def new_manifest(subject, category_radio_id):
+    return {"subject": subject, "category": category_radio_id, "folder": None, "total": None, "questions": {}}
+
+def load_manifest(subject, category_radio_id):
+    """ Loads the checkpoint manifest of a category, or starts an empty one. """
+    path = manifest_path(subject, category_radio_id)
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        manifest.setdefault("questions", {})
+        return manifest
+    except FileNotFoundError:
+        return new_manifest(subject, category_radio_id)
+    except (OSError, ValueError) as e:
+        print(f"Checkpoint manifest {path} is unreadable, starting over:", e)
+        return new_manifest(subject, category_radio_id)
+
+def write_atomic(path, data):
+    """ Writes bytes via a temporary file and a rename, so readers never see a partial file. """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def save_manifest(manifest):
+    """
+    Saves the manifest, keeping questions that other processes recorded meanwhile
+    (workers of the work queue capture different ranges of the same category).
+    """
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = manifest_path(manifest["subject"], manifest["category"])
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        on_disk = load_manifest(manifest["subject"], manifest["category"])
+        for question_number, entry in on_disk["questions"].items():
+            manifest["questions"].setdefault(question_number, entry)
+        write_atomic(path, json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+
+def file_record(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+def record_question(manifest, question_number, outputs, fingerprint=None):
+    """
+    Records the outputs written for one question and saves the manifest.
+    `outputs` maps an output kind ("png", "html") to the written path, or None if it failed.
+    `fingerprint` is the question's content fingerprint as a sync fetched it over HTTP (see delta_sync.py).
+    """
+    entry = manifest["questions"].setdefault(str(question_number), {})
+    for kind, path in outputs.items():
+        if path and os.path.exists(path):
+            entry[kind] = file_record(path)
+    if fingerprint:
+        entry["fingerprint"] = fingerprint
+    entry["captured_at"] = time.time()
+    save_manifest(manifest)
+
+def record_results(manifest, path):
+    """ Records the written results screenshot and saves the manifest. """
+    if path and os.path.exists(path):
+        manifest["results"] = file_record(path)
+        save_manifest(manifest)
+
+def is_png_complete(path):
+    try:
+        size = os.path.getsize(path)
+        if size < len(PNG_TRAILER):
+            return False
+        with open(path, "rb") as f:
+            f.seek(-len(PNG_TRAILER), os.SEEK_END)
+            return f.read() == PNG_TRAILER
+    except OSError:
+        return False
+
+def is_image_complete(path):
+    """ PNGs must end with IEND; WebP files must be as long as their RIFF header says. """
+    extension = os.path.splitext(path)[1]
+    if extension == ".png":
+        return is_png_complete(path)
+    try:
+        size = os.path.getsize(path)
+        if extension == ".webp":
+            with open(path, "rb") as f:
+                header = f.read(12)
+            return header[:4] == b"RIFF" and header[8:] == b"WEBP" and int.from_bytes(header[4:8], "little") + 8 == size
+        return size > 0
+    except OSError:
+        return False
+
+def screenshot_file(screenshot_dir, name):
+    """ Path of the screenshot `name` (without extension) in whichever format it was written, else the .png path. """
+    for extension in SCREENSHOT_EXTENSIONS:
+        path = os.path.join(screenshot_dir, name + extension)
+        if os.path.exists(path):
+            return path
+    return os.path.join(screenshot_dir, name + ".png")
+
+def is_output_complete(manifest, question_number, kind, path):
+    """
+    An output is complete when the manifest recorded it and the file on disk still
+    has the recorded size. Screenshots are also accepted without a record if they are not truncated.
+    """
+    record = manifest["questions"].get(str(question_number), {}).get(kind)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    if record:
+        return size == record["size"] and (kind != "png" or is_image_complete(path))
+    return kind == "png" and is_image_complete(path)
+
+def missing_questions(manifest, question_numbers, screenshot_dir, html_dir, kinds=("png", "html")):
+    """ Returns the question numbers for which any of the output `kinds` is missing or incomplete. """
+    missing = []
+    for question_number in question_numbers:
+        paths = {
+            "png": screenshot_file(screenshot_dir, f"question_{question_number}"),
+            "html": os.path.join(html_dir, f"question_{question_number}.html"),
+        }
+        if not all(is_output_complete(manifest, question_number, kind, paths[kind]) for kind in kinds):
+            missing.append(question_number)
+    return missing
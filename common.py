@@ -1,76 +1,198 @@
-import time
+import os
+import asyncio
 
-def accept_cookies(page):
-    try:
-        page.wait_for_selector("body", timeout=10000)
-        time.sleep(2)
-        page.click("xpath=//button[contains(text(), 'Přijmout všechny soubory cookie')]", timeout=5000)
-        print("Accepted cookies.")
-    except Exception as e:
-        print("Cookie acceptance failed or already done:", e)
+from tracing import span
 
-def click_prijimacky(page):
-    try:
-        page.wait_for_selector("a.odkaz.vyber_pr", state="visible", timeout=10000)
-        page.get_by_role("link", name="PŘIJÍMAČKY").click(timeout=10000)
-        print("Clicked on PŘIJÍMAČKY button.")
-    except Exception as e:
-        print("Failed to click on PŘIJÍMAČKY button:", e)
+# Overridable so the scripts can run against a local stand-in (see fixture_server.py)
+BASE_URL = os.environ.get("CERMAT_BASE_URL", "https://tau.cermat.cz/").rstrip("/") + "/"
+TEST_URL = BASE_URL + "test-kategorie.php?poradi_ulohy="
 
-def wait_for_subject_selection(page):
-    try:
-        page.wait_for_url("**/predmet_prijimacky.php", timeout=10000)
-        print("Navigated to subject selection page.")
-    except Exception as e:
-        print("Subject selection page did not load as expected:", e)
-
-def select_subject(page, subject):
-    if subject == "ma":
-        subject_selector = "a.odkaz[href*='predmet=ma']"
-    elif subject == "cj":
-        subject_selector = "a.odkaz[href*='predmet=cj']"
-    else:
-        raise ValueError("Unsupported subject value.")
-    try:
-        page.click(subject_selector, timeout=10000)
-        print(f"Clicked on subject selection link for '{subject}'.")
-    except Exception as e:
-        print("Failed to click on the subject selection link:", e)
+# --------------------------
+# Readiness checks
+# --------------------------
 
-def select_category(page, category_radio_id):
-    try:
-        # Expand the category selection panel
-        page.click("#vyber_ulohy", timeout=10000)
-        print("Expanded category selection panel.")
-        page.wait_for_selector("#content-ulohy", state="visible", timeout=10000)
-    except Exception as e:
-        print("Failed to expand category selection:", e)
+# The fixed sleeps and `networkidle` waits used before the readiness checks existed.
+# They are only applied when enabled, e.g. via `--legacy-waits` on the command line.
+LEGACY_WAITS = False
 
-    try:
-        # Select the desired category radio button
-        page.click(f"#{category_radio_id}", timeout=10000)
-        print(f"Selected the category radio button ({category_radio_id}).")
-    except Exception as e:
-        print("Failed to select category radio button:", e)
+def set_legacy_waits(enabled):
+    global LEGACY_WAITS
+    LEGACY_WAITS = enabled
+
+# The question text has been rendered into the test container.
+QUESTION_RENDERED_JS = """() => {
+    const container = document.querySelector("div.container-test");
+    return !!container && container.innerText.trim().length > 0;
+}"""
+
+# Every image inside `root_selector` is decoded and all web fonts are loaded.
+# Broken images count as done; the whole check gives up after `timeout` ms.
+ASSETS_READY_JS = """([rootSelector, timeout]) => {
+    const root = document.querySelector(rootSelector) || document;
+    const images = Array.from(root.querySelectorAll("img"));
+    const ready = Promise.all([
+        document.fonts ? document.fonts.ready : null,
+        ...images.map(img => img.decode().catch(() => null)),
+    ]).then(() => true);
+    const expired = new Promise(resolve => setTimeout(() => resolve(false), timeout));
+    return Promise.race([ready, expired]);
+}"""
+
+async def legacy_sleep(seconds):
+    if LEGACY_WAITS:
+        await asyncio.sleep(seconds)
 
+async def wait_for_assets(page, root_selector, timeout=10000):
     try:
-        # Click the submit button to start the test
-        page.click("#submitButton", timeout=10000)
-        print("Clicked on the submit button to start the test.")
+        if not await page.evaluate(ASSETS_READY_JS, [root_selector, timeout]):
+            print(f"Images/fonts in {root_selector} still loading after {timeout} ms, continuing.")
     except Exception as e:
-        print("Failed to click the submit button:", e)
+        print("Error waiting for images and fonts:", e)
+
+async def wait_for_question_ready(page, timeout=15000):
+    """
+    Waits until a `test-kategorie.php?poradi_ulohy=N` page is ready to be read or captured:
+    question content rendered in div.container-test, its images decoded and fonts loaded.
+    """
+    with span("wait_for_question_ready") as step:
+        if LEGACY_WAITS:
+            await page.wait_for_load_state("networkidle")
+            await asyncio.sleep(2)
+            return
+        try:
+            await page.wait_for_function(QUESTION_RENDERED_JS, timeout=timeout)
+        except Exception as e:
+            step.fail(e)
+            print("Question content did not render in time:", e)
+            return
+        await wait_for_assets(page, "div.container-test", timeout)
+
+async def wait_for_results_ready(page, timeout=15000):
+    """
+    Waits until the results summary (div.shrnuti-width) and its images are rendered.
+    Returns False if the container never appeared.
+    """
+    with span("wait_for_results_ready") as step:
+        try:
+            await page.wait_for_selector("div.shrnuti-width", state="visible", timeout=timeout)
+        except Exception as e:
+            step.fail(e)
+            print("Results container did not appear:", e)
+            return False
+        await wait_for_assets(page, "div.shrnuti-width", timeout)
+        return True
+
+# --------------------------
+# Navigation steps
+# --------------------------
+
+async def accept_cookies(page):
+    with span("accept_cookies") as step:
+        try:
+            await page.wait_for_selector("body", timeout=10000)
+            await legacy_sleep(2)
+            await page.click("xpath=//button[contains(text(), 'Přijmout všechny soubory cookie')]", timeout=5000)
+            print("Accepted cookies.")
+        except Exception as e:
+            step.fail(e)
+            print("Cookie acceptance failed or already done:", e)
+
+async def click_prijimacky(page):
+    with span("click_prijimacky") as step:
+        try:
+            await page.wait_for_selector("a.odkaz.vyber_pr", state="visible", timeout=10000)
+            await page.get_by_role("link", name="PŘIJÍMAČKY").click(timeout=10000)
+            print("Clicked on PŘIJÍMAČKY button.")
+        except Exception as e:
+            step.fail(e)
+            print("Failed to click on PŘIJÍMAČKY button:", e)
+
+async def wait_for_subject_selection(page):
+    with span("wait_for_subject_selection") as step:
+        try:
+            await page.wait_for_url("**/predmet_prijimacky.php", timeout=10000)
+            print("Navigated to subject selection page.")
+        except Exception as e:
+            step.fail(e)
+            print("Subject selection page did not load as expected:", e)
+
+async def select_subject(page, subject):
+    with span("select_subject") as step:
+        if subject == "ma":
+            subject_selector = "a.odkaz[href*='predmet=ma']"
+        elif subject == "cj":
+            subject_selector = "a.odkaz[href*='predmet=cj']"
+        else:
+            raise ValueError("Unsupported subject value.")
+        try:
+            await page.click(subject_selector, timeout=10000)
+            print(f"Clicked on subject selection link for '{subject}'.")
+        except Exception as e:
+            step.fail(e)
+            print("Failed to click on the subject selection link:", e)
+
+async def select_category(page, category_radio_id):
+    with span("select_category", category=category_radio_id) as step:
+        try:
+            # Expand the category selection panel
+            await page.click("#vyber_ulohy", timeout=10000)
+            print("Expanded category selection panel.")
+            await page.wait_for_selector("#content-ulohy", state="visible", timeout=10000)
+        except Exception as e:
+            step.fail(e)
+            print("Failed to expand category selection:", e)
+
+        try:
+            # Select the desired category radio button
+            await page.click(f"#{category_radio_id}", timeout=10000)
+            print(f"Selected the category radio button ({category_radio_id}).")
+        except Exception as e:
+            step.fail(e)
+            print("Failed to select category radio button:", e)
+
+        try:
+            # Click the submit button to start the test
+            await page.click("#submitButton", timeout=10000)
+            print("Clicked on the submit button to start the test.")
+        except Exception as e:
+            step.fail(e)
+            print("Failed to click the submit button:", e)
 
-def detect_total_questions(page):
+async def detect_total_questions(page):
     """
     Looks for a paragraph with class "info_text" and a span with class "pocet_text"
     and returns the total number of questions as an integer.
     """
-    try:
-        page.wait_for_selector("p.info_text span.pocet_text", timeout=5000)
-        total_text = page.query_selector("p.info_text span.pocet_text").inner_text().strip()
-        total_questions = int(total_text)
-        print(f"Detected total questions: {total_questions}")
-        return total_questions
-    except Exception as e:
-        print("Error detecting total questions:", e)
-        return None
+    with span("detect_total_questions") as step:
+        try:
+            await page.wait_for_selector("p.info_text span.pocet_text", timeout=5000)
+            element = await page.query_selector("p.info_text span.pocet_text")
+            total_text = (await element.inner_text()).strip()
+            total_questions = int(total_text)
+            print(f"Detected total questions: {total_questions}")
+            return total_questions
+        except Exception as e:
+            step.fail(e)
+            print("Error detecting total questions:", e)
+            return None
+
+async def navigate_to_category(page, subject, category_radio_id):
+    """
+    Runs the full navigation from the homepage to the first question of a category.
+    """
+    with span("navigate_to_category", subject=subject, category=category_radio_id):
+        # Step 1: Open Homepage and Accept Cookies
+        await page.goto(BASE_URL)
+        await accept_cookies(page)
+
+        # Step 2: Click on the PŘIJÍMAČKY Button
+        await click_prijimacky(page)
+
+        # Step 3: Wait for subject selection page to load
+        await wait_for_subject_selection(page)
+
+        # Step 4: Select subject
+        await select_subject(page, subject)
+
+        # Step 5: Select category and submit
+        await select_category(page, category_radio_id)
@@ -0,0 +1,253 @@
+import os
+import re
+import sys
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+from questions import CATEGORIES
+
+CORPUS_PATH = "corpus.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    subject TEXT NOT NULL,
+    category TEXT NOT NULL,
+    name TEXT,
+    folder TEXT,
+    total INTEGER,
+    PRIMARY KEY (subject, category)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS questions (
+    subject TEXT NOT NULL,
+    category TEXT NOT NULL,
+    question INTEGER NOT NULL,
+    text TEXT,
+    text_hash TEXT,
+    screenshot BLOB,
+    screenshot_path TEXT,
+    screenshot_hash TEXT,
+    text_captured_at REAL,
+    screenshot_captured_at REAL,
+    PRIMARY KEY (subject, category, question)
+) WITHOUT ROWID;
+"""
+
+UPSERT_QUESTION = """
+INSERT INTO questions (subject, category, question, text, text_hash, screenshot, screenshot_path,
+                       screenshot_hash, text_captured_at, screenshot_captured_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (subject, category, question) DO UPDATE SET
+    text = COALESCE(excluded.text, text),
+    text_hash = COALESCE(excluded.text_hash, text_hash),
+    screenshot = COALESCE(excluded.screenshot, screenshot),
+    screenshot_path = COALESCE(excluded.screenshot_path, screenshot_path),
+    screenshot_hash = COALESCE(excluded.screenshot_hash, screenshot_hash),
+    text_captured_at = COALESCE(excluded.text_captured_at, text_captured_at),
+    screenshot_captured_at = COALESCE(excluded.screenshot_captured_at, screenshot_captured_at)
+"""
+
+UPSERT_CATEGORY = """
+INSERT INTO categories (subject, category, name, folder, total) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (subject, category) DO UPDATE SET
+    name = COALESCE(excluded.name, name),
+    folder = COALESCE(excluded.folder, folder),
+    total = COALESCE(excluded.total, total)
+"""
+
+QUESTION_FILE = re.compile(r"^question_(\d+)\.(png|webp|avif|html)$")
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def category_name(subject, category_radio_id):
+    for item in CATEGORIES:
+        if item["subject"] == subject and item["category"] == category_radio_id:
+            return item["name"]
+    return None
+
+def category_for_folder(folder):
+    """
+    Maps an output folder name from `get_test_folder_name`
+    (e.g. "Matematika (5. ročník) - Číslo a početní operace") back to its `CATEGORIES` item.
+    """
+    matches = [item for item in CATEGORIES if folder.endswith(" - " + item["name"]) or folder == item["name"]]
+    return max(matches, key=lambda item: len(item["name"]), default=None)
+
+class Corpus:
+    """
+    The question corpus in one SQLite database, keyed by (subject, category, question number).
+    Writes are buffered and committed in batches; the connection may be shared between threads.
+    """
+
+    def __init__(self, path=CORPUS_PATH, batch_size=200):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pending = []
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def add_category(self, subject, category_radio_id, folder=None, total=None):
+        with self.lock:
+            self.conn.execute(UPSERT_CATEGORY, (subject, category_radio_id, category_name(subject, category_radio_id),
+                                                folder, total))
+            self.conn.commit()
+
+    def add_question(self, subject, category_radio_id, question_number, text=None, screenshot_path=None,
+                     embed_screenshot=False, captured_at=None):
+        """
+        Queues one question. Only the given parts are updated, so text and
+        screenshot can come from different runs (e.g. `--text-only` first).
+        """
+        captured_at = captured_at or time.time()
+        screenshot = screenshot_hash = None
+        if screenshot_path:
+            with open(screenshot_path, "rb") as f:
+                data = f.read()
+            screenshot_hash = sha256(data)
+            if embed_screenshot:
+                screenshot = data
+        row = (subject, category_radio_id, question_number,
+               text, sha256(text.encode("utf-8")) if text is not None else None,
+               screenshot, screenshot_path, screenshot_hash,
+               captured_at if text is not None else None,
+               captured_at if screenshot_path else None)
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.conn.executemany(UPSERT_QUESTION, self.pending)
+            self.conn.commit()
+            self.pending = []
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def question(self, subject, category_radio_id, question_number):
+        self.flush()
+        cursor = self.conn.execute(
+            "SELECT text, text_hash, screenshot_path, screenshot_hash, text_captured_at, screenshot_captured_at"
+            " FROM questions WHERE subject = ? AND category = ? AND question = ?",
+            (subject, category_radio_id, question_number))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        keys = ("text", "text_hash", "screenshot_path", "screenshot_hash", "text_captured_at", "screenshot_captured_at")
+        return dict(zip(keys, row))
+
+    def question_numbers(self, subject, category_radio_id):
+        self.flush()
+        cursor = self.conn.execute("SELECT question FROM questions WHERE subject = ? AND category = ? ORDER BY question",
+                                   (subject, category_radio_id))
+        return [row[0] for row in cursor]
+
+    def iter_questions(self, with_blobs=False):
+        """ Streams every question row as a dict, ordered by key. """
+        self.flush()
+        cursor = self.conn.execute(
+            "SELECT q.subject, q.category, c.name, q.question, q.text, q.text_hash, q.screenshot_path,"
+            " q.screenshot_hash, q.text_captured_at, q.screenshot_captured_at, q.screenshot"
+            " FROM questions q LEFT JOIN categories c ON c.subject = q.subject AND c.category = q.category"
+            " ORDER BY q.subject, q.category, q.question")
+        keys = ("subject", "category", "name", "question", "text", "text_hash", "screenshot_path",
+                "screenshot_hash", "text_captured_at", "screenshot_captured_at")
+        for row in cursor:
+            item = dict(zip(keys, row))
+            if with_blobs and row[-1] is not None:
+                item["screenshot"] = base64.b64encode(row[-1]).decode("ascii")
+            yield item
+
+    def export_jsonl(self, out, with_blobs=False):
+        count = 0
+        for item in self.iter_questions(with_blobs):
+            out.write(json.dumps(item, ensure_ascii=False) + "\n")
+            count += 1
+        return count
+
+    def import_tree(self, screenshot_dir="screenshots", html_dir="html_pages", embed_screenshots=False):
+        """ Imports an existing `screenshots/<folder>` + `html_pages/<folder>` output tree. """
+        count = 0
+        for root, kind in ((html_dir, "html"), (screenshot_dir, "png")):
+            if not os.path.isdir(root):
+                continue
+            for folder in sorted(os.listdir(root)):
+                folder_path = os.path.join(root, folder)
+                if not os.path.isdir(folder_path):
+                    continue
+                item = category_for_folder(folder)
+                if item is None:
+                    print(f"Skipping folder that matches no category: {folder_path}")
+                    continue
+                self.add_category(item["subject"], item["category"], folder)
+                for filename in os.listdir(folder_path):
+                    match = QUESTION_FILE.match(filename)
+                    if not match or (match.group(2) == "html") != (kind == "html"):
+                        continue
+                    path = os.path.join(folder_path, filename)
+                    captured_at = os.path.getmtime(path)
+                    if kind == "html":
+                        with open(path, encoding="utf-8") as f:
+                            self.add_question(item["subject"], item["category"], int(match.group(1)), text=f.read(),
+                                              captured_at=captured_at)
+                    else:
+                        self.add_question(item["subject"], item["category"], int(match.group(1)), screenshot_path=path,
+                                          embed_screenshot=embed_screenshots, captured_at=captured_at)
+                    count += 1
+        self.flush()
+        return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the SQLite question corpus.")
+    parser.add_argument("--db", type=str, default=CORPUS_PATH, help=f"Corpus database (default: {CORPUS_PATH}).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Import an existing screenshots/ + html_pages/ tree.")
+    import_parser.add_argument("--screenshot-dir", type=str, default="screenshots")
+    import_parser.add_argument("--html-dir", type=str, default="html_pages")
+    import_parser.add_argument("--embed-screenshots", action="store_true",
+                               help="Store the PNG bytes in the database instead of only their paths.")
+
+    export_parser = subparsers.add_parser("export", help="Stream the corpus as JSONL.")
+    export_parser.add_argument("--output", type=str, default="-", help="Output file (default: stdout).")
+    export_parser.add_argument("--with-blobs", action="store_true", help="Include embedded screenshots as base64.")
+
+    show_parser = subparsers.add_parser("show", help="Print one question.")
+    show_parser.add_argument("--name", type=str, required=True, help="Name of the category.")
+    show_parser.add_argument("--question", type=int, required=True)
+    args = parser.parse_args()
+
+    corpus = Corpus(args.db)
+    if args.command == "import":
+        count = corpus.import_tree(args.screenshot_dir, args.html_dir, args.embed_screenshots)
+        print(f"Imported {count} files into {args.db}.")
+    elif args.command == "export":
+        if args.output == "-":
+            corpus.export_jsonl(sys.stdout, args.with_blobs)
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                count = corpus.export_jsonl(f, args.with_blobs)
+            print(f"Exported {count} questions to {args.output}.")
+    elif args.command == "show":
+        item = next((item for item in CATEGORIES if item["name"] == args.name), None)
+        if item is None:
+            print(f"Unknown category: {args.name}")
+        else:
+            row = corpus.question(item["subject"], item["category"], args.question)
+            print(row["text"] if row else "Question not in corpus.")
+    corpus.close()
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psutil
+from playwright.async_api import async_playwright
+
+from answered_store import open_answered_store
+from category_cache import remember_total
+from common import TEST_URL, detect_total_questions, wait_for_question_ready
+from questions import CATEGORIES
+from route_cache import StaticCache, install_routes
+from session_cache import open_category_page
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+# Contexts unused for this long are closed (and re-warmed if they belong to the warm set)
+IDLE_TIMEOUT = 15 * 60
+# Memory ceiling for this process, the Playwright driver and Chromium together
+MEMORY_LIMIT_MB = 1500
+MAINTENANCE_INTERVAL = 30
+
+def find_category(name):
+    return next((item for item in CATEGORIES if item["name"] == name), None)
+
+def process_tree_rss_mb():
+    """ Resident memory of this process and all its children (driver, Chromium renderers). """
+    process = psutil.Process(os.getpid())
+    total = 0
+    for p in [process] + process.children(recursive=True):
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+# --------------------------
+# Client side (quiz.py, browse.py)
+# --------------------------
+
+def daemon_request(path, payload=None, port=DAEMON_PORT, timeout=120):
+    """
+    Sends a request to a running daemon and returns its JSON answer, or None if no daemon
+    is listening (callers then fall back to their own browser). A request the daemon received
+    but did not answer (in time) returns {"error": ...}: the daemon may still carry it out.
+    """
+    url = f"http://{DAEMON_HOST}:{port}{path}"
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read() or b"{}") or {"error": str(e)}
+    except urllib.error.URLError:
+        # Nothing listening: the request never reached a daemon
+        return None
+    except TimeoutError:
+        return {"error": f"no answer within {timeout} s; the daemon may still open the questions"}
+    except (OSError, ValueError) as e:
+        # A dropped connection or a garbled answer after the request was sent
+        return {"error": f"the daemon's answer was lost ({e})"}
+
+# --------------------------
+# Browser pool
+# --------------------------
+
+class BrowserPool:
+    """
+    One browser with a pre-navigated context per category, ready to open question tabs.
+    """
+
+    def __init__(self, browser, cache, warm_names, idle_timeout=IDLE_TIMEOUT, memory_limit_mb=MEMORY_LIMIT_MB):
+        self.browser = browser
+        self.cache = cache
+        self.warm_names = list(warm_names)
+        self.idle_timeout = idle_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.entries = {}
+        self.locks = {}
+        self.store = open_answered_store()
+
+    async def prepare_context(self, context):
+        await install_routes(context, self.cache)
+
+    async def warm(self, name):
+        item = find_category(name)
+        if item is None:
+            raise ValueError(f"Unknown category: {name}")
+        await self.enforce_memory_limit()
+        context, page = await open_category_page(self.browser, item["subject"], item["category"],
+                                                 prepare_context=self.prepare_context, no_viewport=True)
+        entry = {"name": name, "context": context, "page": page, "last_used": time.time(),
+                 "total": await detect_total_questions(page)}
+        remember_total(item["subject"], item["category"], entry["total"])
+        self.entries[name] = entry
+        print(f"Warmed context for '{name}' ({entry['total']} questions).")
+        return entry
+
+    async def get(self, name):
+        lock = self.locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                entry = await self.warm(name)
+            entry["last_used"] = time.time()
+            return entry
+
+    async def close_entry(self, name):
+        entry = self.entries.pop(name, None)
+        if entry:
+            try:
+                await entry["context"].close()
+            except Exception as e:
+                print(f"Error closing context for '{name}':", e)
+            print(f"Closed context for '{name}'.")
+
+    async def open_questions(self, name, questions):
+        entry = await self.get(name)
+        context = entry["context"]
+
+        async def open_tab(question):
+            tab = await context.new_page()
+            await tab.goto(TEST_URL + str(question))
+            await wait_for_question_ready(tab)
+
+        await asyncio.gather(*(open_tab(question) for question in questions))
+        entry["last_used"] = time.time()
+        return {"category": name, "opened": list(questions)}
+
+    async def quiz(self, name, num_questions):
+        """ Opens `num_questions` random unanswered questions and marks them answered. """
+        entry = await self.get(name)
+        if entry["total"] is None:
+            raise ValueError(f"Total number of questions unknown for '{name}'.")
+        answered = self.store.answered(name)
+        unanswered = [n for n in range(1, entry["total"] + 1) if n not in answered]
+        if not unanswered:
+            return {"category": name, "opened": []}
+        selected = random.sample(unanswered, min(num_questions, len(unanswered)))
+        result = await self.open_questions(name, selected)
+        self.store.add(name, selected)
+        self.store.export()
+        return result
+
+    def has_open_questions(self, entry):
+        """ The warm page is always open; any further tab is a question the user is looking at. """
+        return len(entry["context"].pages) > 1
+
+    async def status(self):
+        now = time.time()
+        return {
+            "rss_mb": round(process_tree_rss_mb()),
+            "memory_limit_mb": self.memory_limit_mb,
+            "contexts": [{"category": name, "total": entry["total"], "tabs": len(entry["context"].pages),
+                          "idle_s": round(now - entry["last_used"])}
+                         for name, entry in self.entries.items()],
+        }
+
+    async def enforce_memory_limit(self):
+        """
+        Closes least recently used contexts while the process tree is over the memory ceiling.
+        Contexts with questions still open are left alone.
+        """
+        while process_tree_rss_mb() > self.memory_limit_mb:
+            candidates = [n for n, e in self.entries.items() if not self.has_open_questions(e)]
+            if not candidates:
+                break
+            name = min(candidates, key=lambda n: self.entries[n]["last_used"])
+            print(f"Memory above {self.memory_limit_mb} MB, recycling '{name}'.")
+            await self.close_entry(name)
+
+    async def maintain(self):
+        """ Periodically recycles idle contexts and keeps the warm set ready. """
+        while True:
+            now = time.time()
+            for name in [n for n, e in self.entries.items()
+                         if now - e["last_used"] > self.idle_timeout and not self.has_open_questions(e)]:
+                print(f"Context for '{name}' idle for over {self.idle_timeout} s, recycling.")
+                await self.close_entry(name)
+            await self.enforce_memory_limit()
+            for name in self.warm_names:
+                if name not in self.entries and process_tree_rss_mb() < self.memory_limit_mb:
+                    try:
+                        await self.get(name)
+                    except Exception as e:
+                        print(f"Warming '{name}' failed:", e)
+            await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+# --------------------------
+# Local HTTP API
+# --------------------------
+
+def make_handler(pool, loop):
+    """
+    POST /open {"category": name, "questions": [..]}  opens the given questions
+    POST /quiz {"category": name, "num_questions": n}  opens random unanswered questions
+    GET  /status                                       pool and memory overview
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def run(self, coroutine):
+            try:
+                result = asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+                self.reply(200, result)
+            except ValueError as e:
+                self.reply(400, {"error": str(e)})
+            except Exception as e:
+                self.reply(500, {"error": str(e)})
+
+        def do_GET(self):
+            if self.path == "/status":
+                self.run(pool.status())
+            else:
+                self.reply(404, {"error": "Not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self.reply(400, {"error": "Invalid JSON"})
+                return
+            if not isinstance(payload, dict) or not isinstance(payload.get("category"), str):
+                self.reply(400, {"error": "Expected a JSON object with a \"category\" name"})
+                return
+            if self.path == "/open":
+                self.run(pool.open_questions(payload["category"], payload.get("questions", [1])))
+            elif self.path == "/quiz":
+                self.run(pool.quiz(payload["category"], payload.get("num_questions", 5)))
+            else:
+                self.reply(404, {"error": "Not found"})
+
+        def log_message(self, format, *args):
+            print("API:", format % args)
+
+    return Handler
+
+async def serve(warm_names, port, idle_timeout, memory_limit_mb):
+    cache = StaticCache()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False, args=["--start-maximized"], ignore_default_args=["--enable-automation"])
+        pool = BrowserPool(browser, cache, warm_names, idle_timeout, memory_limit_mb)
+        server = ThreadingHTTPServer((DAEMON_HOST, port), make_handler(pool, asyncio.get_running_loop()))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Browser pool listening on http://{DAEMON_HOST}:{port}")
+        try:
+            await pool.maintain()
+        finally:
+            server.shutdown()
+            cache.flush()
+            if browser.is_connected():
+                await browser.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Keep a warm browser with pre-navigated category contexts for quiz.py and browse.py."
+    )
+    parser.add_argument("--warm", nargs="*", default=[], help="Category names to keep pre-navigated.")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT, help=f"Local API port (default: {DAEMON_PORT}).")
+    parser.add_argument("--idle-timeout", type=int, default=IDLE_TIMEOUT,
+                        help=f"Seconds before an unused context is recycled (default: {IDLE_TIMEOUT}).")
+    parser.add_argument("--memory-limit", type=int, default=MEMORY_LIMIT_MB,
+                        help=f"Memory ceiling in MB for the whole browser (default: {MEMORY_LIMIT_MB}).")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.warm, args.port, args.idle_timeout, args.memory_limit))
+    except KeyboardInterrupt:
+        print("Browser pool stopped.")
@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import zlib
+import argparse
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from corpus import category_for_folder
+from search_index import fold
+
+DUPLICATES_FILE = "duplicates.json"
+
+NUM_PERMUTATIONS = 128
+SHINGLE_WORDS = 3
+# Texts with fewer shingles than this (e.g. image-only maths questions) are not compared
+MIN_SHINGLES = 5
+DEFAULT_THRESHOLD = 0.7
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+WORD = re.compile(r"\w+")
+# The saved texts join the passage (`div.citace-container`) and the task (`div.vypis_zadani`) with blank lines
+BLOCK_SEPARATOR = re.compile(r"\n\s*\n")
+
+def shingles(text, size=SHINGLE_WORDS):
+    words = WORD.findall(fold(text))
+    return {" ".join(words[i:i + size]) for i in range(max(0, len(words) - size + 1))}
+
+def blocks(text):
+    return [" ".join(block.split()) for block in BLOCK_SEPARATOR.split(text) if block.strip()]
+
+def shared_blocks(texts):
+    """
+    Paragraphs found in more than one distinct text: mostly passages that several tasks share.
+    Identical texts count once, so real copies of a question keep all their paragraphs.
+    """
+    counts = Counter(block for text in set(texts) for block in set(blocks(text)))
+    return {block for block, count in counts.items() if count > 1}
+
+def task_text(text, shared):
+    """ The text without its shared paragraphs, so tasks about one passage are compared by what they ask. """
+    return "\n\n".join(block for block in blocks(text) if block not in shared)
+
+def permutations(num_permutations=NUM_PERMUTATIONS, seed=1):
+    generator = np.random.RandomState(seed)
+    # Coefficients below 2^31 keep a*h + b (with 32-bit h) inside uint64
+    a = generator.randint(1, 1 << 31, size=num_permutations, dtype=np.uint64)
+    b = generator.randint(0, 1 << 31, size=num_permutations, dtype=np.uint64)
+    return a, b
+
+def minhash(shingle_set, a, b):
+    """ MinHash signature of a shingle set, all permutations at once: min over (a*h + b) mod p. """
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    values = (np.outer(hashes, a) + b) % MERSENNE_PRIME & MAX_HASH
+    return values.min(axis=0)
+
+def lsh_bands(threshold, num_permutations=NUM_PERMUTATIONS):
+    """ Picks (bands, rows) so that the LSH S-curve crosses 50 % close to `threshold`. """
+    best = None
+    for rows in range(1, num_permutations + 1):
+        if num_permutations % rows:
+            continue
+        bands = num_permutations // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+def load_texts(html_dir="html_pages"):
+    """ Yields ((subject, category, name, question), text) for every scraped question text. """
+    if not os.path.isdir(html_dir):
+        return
+    for folder in sorted(os.listdir(html_dir)):
+        item = category_for_folder(folder)
+        folder_path = os.path.join(html_dir, folder)
+        if item is None or not os.path.isdir(folder_path):
+            continue
+        for filename in os.listdir(folder_path):
+            match = re.match(r"^question_(\d+)\.html$", filename)
+            if match:
+                with open(os.path.join(folder_path, filename), encoding="utf-8") as f:
+                    yield (item["subject"], item["category"], item["name"], int(match.group(1))), f.read()
+
+def find_duplicates(items, threshold=DEFAULT_THRESHOLD, num_permutations=NUM_PERMUTATIONS):
+    """
+    Clusters near-duplicate texts. `items` is an iterable of (key, text).
+    Paragraphs shared by different texts (passages) are left out, see `shared_blocks`.
+    Only pairs that share an LSH bucket are compared, so the work grows with the
+    number of candidates rather than with the square of the corpus size.
+    Returns a list of {"members": [key, ...], "pairs": [(i, j, similarity), ...]}.
+    """
+    items = list(items)
+    shared = shared_blocks(text for _, text in items)
+    a, b = permutations(num_permutations)
+    keys, signatures = [], []
+    for key, text in items:
+        shingle_set = shingles(task_text(text, shared))
+        if len(shingle_set) < MIN_SHINGLES:
+            continue
+        keys.append(key)
+        signatures.append(minhash(shingle_set, a, b))
+    if not keys:
+        return []
+    signatures = np.vstack(signatures)
+
+    bands, rows = lsh_bands(threshold, num_permutations)
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        for index, chunk in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets[chunk.tobytes()].append(index)
+        for members in buckets.values():
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    candidates.add((members[i], members[j]))
+
+    # Union-find over the candidate pairs that really are similar
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    pairs = []
+    for i, j in candidates:
+        similarity = float(np.mean(signatures[i] == signatures[j]))
+        if similarity >= threshold:
+            pairs.append((i, j, similarity))
+            parent[find(i)] = find(j)
+
+    clusters = defaultdict(list)
+    for i, j, similarity in pairs:
+        clusters[find(i)].append((i, j, similarity))
+    result = []
+    for cluster_pairs in clusters.values():
+        members = sorted({index for i, j, _ in cluster_pairs for index in (i, j)})
+        position = {index: n for n, index in enumerate(members)}
+        result.append({
+            "members": [keys[index] for index in members],
+            "pairs": [(position[i], position[j], round(similarity, 3)) for i, j, similarity in cluster_pairs],
+        })
+    result.sort(key=lambda cluster: -len(cluster["members"]))
+    return result
+
+def save_duplicates(clusters, path=DUPLICATES_FILE):
+    data = [{"members": [{"subject": s, "category": c, "name": n, "question": q} for s, c, n, q in cluster["members"]],
+             "pairs": cluster["pairs"]}
+            for cluster in clusters]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+
+def load_duplicate_map(path=DUPLICATES_FILE):
+    """ Maps (category name, question) to the set of its near-duplicates, as (category name, question). """
+    try:
+        with open(path, encoding="utf-8") as f:
+            clusters = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    duplicates = defaultdict(set)
+    for cluster in clusters:
+        members = cluster["members"]
+        for i, j, _ in cluster["pairs"]:
+            first = (members[i]["name"], members[i]["question"])
+            second = (members[j]["name"], members[j]["question"])
+            duplicates[first].add(second)
+            duplicates[second].add(first)
+    return duplicates
+
+def with_answered_duplicates(answered, duplicate_map):
+    """
+    Returns a copy of `{category name: answered set}` that also counts a question as
+    answered when one of its near-duplicates is, in any category.
+    """
+    extended = {name: set(questions) for name, questions in answered.items()}
+    for (name, question), others in duplicate_map.items():
+        if any(other_question in answered.get(other_name, ()) for other_name, other_question in others):
+            extended.setdefault(name, set()).add(question)
+    return extended
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate questions across categories (MinHash + LSH).")
+    parser.add_argument("--html-dir", type=str, default="html_pages")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Minimum estimated Jaccard similarity (default: {DEFAULT_THRESHOLD}).")
+    parser.add_argument("--output", type=str, default=DUPLICATES_FILE,
+                        help=f"Where to write the clusters (default: {DUPLICATES_FILE}).")
+    args = parser.parse_args()
+
+    clusters = find_duplicates(load_texts(args.html_dir), args.threshold)
+    save_duplicates(clusters, args.output)
+    for cluster in clusters:
+        similarities = [similarity for _, _, similarity in cluster["pairs"]]
+        members = ", ".join(f"{name} #{question}" for _, _, name, question in cluster["members"])
+        print(f"[{min(similarities):.2f}-{max(similarities):.2f}] {members}")
+    print(f"{len(clusters)} duplicate clusters written to {args.output}.")
@@ -0,0 +1,102 @@
+import hashlib
+
+import lxml.html
+
+from checkpoint import missing_questions
+from scheduler import WrongPageError
+from text_fetch import CONTAINER_TEST_XPATH, fetch_page, inner_text
+from tracing import span
+
+# The task text alone: passages (`citace-container`) are shared by many questions, so they would not tell them apart
+TASK_TEXT_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' vypis_zadani ')]"
+
+def fingerprint(texts):
+    """
+    Content fingerprint of a question from its `div.vypis_zadani` texts, with whitespace collapsed.
+    The browser's innerText and the lxml approximation in text_fetch.py still differ on some markup
+    (table cells, hidden elements), so manifests only record fingerprints fetched over HTTP.
+    """
+    normalized = "\n".join(" ".join(text.split()) for text in texts)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+def extract_fingerprint(html, encoding="utf-8"):
+    """ Fingerprint of a question page, or None if it is not a question page. """
+    document = lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding=encoding))
+    if not document.xpath(CONTAINER_TEST_XPATH):
+        return None
+    return fingerprint(inner_text(element) for element in document.xpath(TASK_TEXT_XPATH))
+
+def fetch_fingerprint(session, base_test_url, question_number, timeout=30):
+    """ Fingerprint of one question fetched over the pooled session; fails like `text_fetch.fetch_question_text`. """
+    with span("fetch_fingerprint", question=question_number) as step:
+        html, encoding = fetch_page(session, base_test_url + str(question_number), step, timeout)
+        value = extract_fingerprint(html, encoding)
+        if value is None:
+            raise WrongPageError(f"Question {question_number} did not return a question page (session expired?)")
+        return value
+
+def plan_sync(manifest, previous_total, total, fingerprints, screenshot_dir, html_dir):
+    """
+    Compares fresh `fingerprints` of questions 1..`total` with the ones recorded in the manifest
+    when the category had `previous_total` questions.
+    Returns {"capture": question numbers to capture, "new", "changed", "shifted": [(new number, old number)],
+    "removed", "incomplete", "unreadable", "baseline", "unchanged": count}.
+    "baseline" are questions captured before fingerprints were recorded. Their stored text cannot
+    be compared with a fingerprint, so they are captured once more, which records one.
+    """
+    previous_total = previous_total or 0
+    recorded = {int(n): entry.get("fingerprint") for n, entry in manifest["questions"].items()}
+    old_numbers = {}
+    for n, value in recorded.items():
+        if value:
+            old_numbers.setdefault(value, []).append(n)
+    plan = {"new": [], "changed": [], "shifted": [], "removed": [], "incomplete": [], "unreadable": [],
+            "baseline": [], "unchanged": 0}
+    for n in range(1, total + 1):
+        value = fingerprints.get(n)
+        if value is None:
+            plan["unreadable"].append(n)
+        elif recorded.get(n) == value:
+            plan["unchanged"] += 1
+        elif len(old_numbers.get(value, ())) == 1 and old_numbers[value][0] != n:
+            plan["shifted"].append((n, old_numbers[value][0]))
+        elif n > previous_total or n not in recorded:
+            plan["new"].append(n)
+        elif recorded[n] is None:
+            plan["baseline"].append(n)
+        else:
+            plan["changed"].append(n)
+    plan["removed"] = [n for n in range(total + 1, previous_total + 1)]
+    # Unchanged questions whose files went missing or were cut short are captured again too
+    kept = [n for n in range(1, total + 1) if recorded.get(n) == fingerprints.get(n)]
+    plan["incomplete"] = missing_questions(manifest, kept, screenshot_dir, html_dir)
+    plan["capture"] = sorted(set(plan["new"]) | set(plan["changed"]) | {n for n, _ in plan["shifted"]}
+                             | set(plan["unreadable"]) | set(plan["incomplete"]) | set(plan["baseline"]))
+    return plan
+
+def shift_runs(shifted):
+    """ Groups (new number, old number) pairs into runs of consecutive questions moved by the same offset. """
+    runs = []
+    for new, old in sorted(shifted):
+        if runs and new == runs[-1][1] + 1 and new - old == runs[-1][2]:
+            runs[-1][1] = new
+        else:
+            runs.append([new, new, new - old])
+    return [tuple(run) for run in runs]
+
+def format_numbers(numbers, limit=20):
+    shown = ", ".join(str(n) for n in numbers[:limit])
+    return shown + (f" ... ({len(numbers)} in total)" if len(numbers) > limit else "")
+
+def print_sync_report(subject, category_radio_id, previous_total, total, plan):
+    print(f"Sync of {subject}/{category_radio_id}: {previous_total or '?'} -> {total} questions, "
+          f"{plan['unchanged']} unchanged, {len(plan['capture'])} to capture.")
+    for key, label in (("new", "new"), ("changed", "changed"), ("removed", "no longer upstream (files kept)"),
+                       ("incomplete", "missing or incomplete files"), ("unreadable", "fingerprint unavailable"),
+                       ("baseline", "no fingerprint recorded yet, captured once more")):
+        if plan[key]:
+            print(f"  {label}: {format_numbers(plan[key])}")
+    for start, end, offset in shift_runs(plan["shifted"]):
+        moved = f"{start}" if start == end else f"{start}-{end}"
+        was = f"{start - offset}" if start == end else f"{start - offset}-{end - offset}"
+        print(f"  numbering shift: questions {moved} were {was} ({offset:+d})")
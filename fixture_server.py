@@ -0,0 +1,207 @@
+import time
+import html
+import secrets
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from questions import CATEGORIES
+
+# A local stand-in for tau.cermat.cz with the pages and selectors common.py relies on.
+# Point the scripts at it with CERMAT_BASE_URL=http://127.0.0.1:8767/
+FIXTURE_HOST = "127.0.0.1"
+FIXTURE_PORT = 8767
+DEFAULT_QUESTIONS = 40
+SESSION_COOKIE = "PHPSESSID"
+
+SUBJECT_TITLES = {"ma": "Matematika (9. ročník)", "cj": "Český jazyk a literatura (9. ročník)"}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="cs"><head><meta charset="utf-8"><title>{title}</title>
+<link rel="stylesheet" href="/static/style.css"></head><body>{body}</body></html>"""
+
+STYLE = b"""body { font-family: sans-serif; margin: 0 auto; max-width: 1100px; }
+.container-test { border: 1px solid #ccc; padding: 1em; }
+.shrnuti-width .radek { height: 40px; border-bottom: 1px solid #eee; }
+#content-ulohy, .vyskakovaci-okno { display: none; }
+"""
+
+COOKIE_BANNER = """<div id="cookies"><button onclick="this.parentNode.remove()">Přijmout všechny soubory cookie</button></div>"""
+
+def figure_svg(n):
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="400" height="200">'
+            f'<rect width="400" height="200" fill="#eef"/><circle cx="{40 + 30 * (n % 10)}" cy="100" r="30"/>'
+            f'<text x="10" y="190">obrázek {n}</text></svg>').encode("utf-8")
+
+def question_text(subject, category_radio_id, n):
+    # Several categories share passages, like the real site does
+    passage = (f"Výchozí text {n % 7}: Příliš žluťoučký kůň úpěl ďábelské ódy. "
+               f"Text pro úlohy s číslem dělitelným sedmi, zbytek {n % 7}.")
+    task = f"Úloha {n} ({subject}/{category_radio_id}): Rozhodněte, které z tvrzení {n} a {n + 1} je pravdivé."
+    return passage, task
+
+class FixtureState:
+    """ Sessions of the fixture site plus request and byte counters for benchmarks. """
+
+    def __init__(self, questions=DEFAULT_QUESTIONS, latency_ms=0):
+        self.questions = questions
+        self.latency = latency_ms / 1000
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.question_pages = 0
+            self.first_question_at = None
+
+    def count(self, body, is_question=False):
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += len(body)
+            if is_question:
+                self.question_pages += 1
+                if self.first_question_at is None:
+                    self.first_question_at = time.time()
+
+    def stats(self):
+        with self.lock:
+            return {"requests": self.requests, "bytes_sent": self.bytes_sent,
+                    "question_pages": self.question_pages, "first_question_at": self.first_question_at}
+
+def render_home():
+    body = (COOKIE_BANNER + '<h1>TAU</h1><a class="odkaz vyber_pr" href="/predmet_prijimacky.php">PŘIJÍMAČKY</a>')
+    return PAGE_TEMPLATE.format(title="TAU", body=body)
+
+def render_subjects():
+    links = "".join(f'<a class="odkaz" href="/vyber-kategorie.php?predmet={subject}">{html.escape(title)}</a> '
+                    for subject, title in SUBJECT_TITLES.items())
+    return PAGE_TEMPLATE.format(title="Přijímačky", body=links)
+
+def render_categories(subject):
+    radios = "".join(f'<label><input type="radio" name="kategorie" id="{item["category"]}" value="{item["category"]}">'
+                     f'{html.escape(item["name"])}</label><br>'
+                     for item in CATEGORIES if item["subject"] == subject)
+    body = (f'<a id="vyber_ulohy" href="#" onclick="document.getElementById(\'content-ulohy\').style.display=\'block\';'
+            f'return false;">Výběr úloh</a>'
+            f'<form id="content-ulohy" action="/start.php"><input type="hidden" name="predmet" value="{subject}">'
+            f'{radios}<button id="submitButton" type="submit">Spustit</button></form>')
+    return PAGE_TEMPLATE.format(title="Výběr kategorie", body=body)
+
+def category_name(subject, category_radio_id):
+    item = next((i for i in CATEGORIES if i["subject"] == subject and i["category"] == category_radio_id), None)
+    return item["name"] if item else category_radio_id
+
+def render_question(state, session, n):
+    subject, category_radio_id = session["subject"], session["category"]
+    passage, task = question_text(subject, category_radio_id, n)
+    body = (f'<p class="cesta">{SUBJECT_TITLES[subject]} / {html.escape(category_name(subject, category_radio_id))}</p>'
+            f'<p class="info_text">Úloha {n} z <span class="pocet_text">{state.questions}</span></p>'
+            f'<div class="container-test"><div class="citace-container">{html.escape(passage)}</div>'
+            f'<div class="vypis_zadani">{html.escape(task)}</div><img src="/static/figure_{n % 10}.svg" alt=""></div>'
+            f'<a class="odkaz ukoncit" href="#" onclick="document.querySelector(\'.vyskakovaci-okno\').style.display='
+            f'\'block\';return false;">ukončit</a>'
+            f'<div class="vyskakovaci-okno">Opravdu ukončit? <button class="opravit-button" '
+            f'onclick="location.href=\'/vysledky.php\'">Ano</button></div>')
+    return PAGE_TEMPLATE.format(title=f"Úloha {n}", body=body)
+
+def render_results(state):
+    rows = "".join(f'<div class="radek">Úloha {n}: nezodpovězeno</div>' for n in range(1, state.questions + 1))
+    return PAGE_TEMPLATE.format(title="Výsledky", body=f'<div class="shrnuti-width"><h2>Shrnutí</h2>{rows}</div>')
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def send_body(self, status, content_type, body, headers=(), is_question=False):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+            state.count(body, is_question)
+
+        def send_page(self, page, is_question=False):
+            self.send_body(200, "text/html; charset=utf-8", page.encode("utf-8"), is_question=is_question)
+
+        def redirect(self, location, headers=()):
+            self.send_body(302, "text/plain", b"", [("Location", location), *headers])
+
+        def session(self):
+            for part in (self.headers.get("Cookie") or "").split(";"):
+                name, _, value = part.strip().partition("=")
+                if name == SESSION_COOKIE:
+                    return state.sessions.get(value)
+            return None
+
+        def do_GET(self):
+            if state.latency:
+                time.sleep(state.latency)
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if url.path == "/":
+                self.send_page(render_home())
+            elif url.path == "/predmet_prijimacky.php":
+                self.send_page(render_subjects())
+            elif url.path == "/vyber-kategorie.php" and query.get("predmet") in SUBJECT_TITLES:
+                self.send_page(render_categories(query["predmet"]))
+            elif url.path == "/start.php" and query.get("predmet") in SUBJECT_TITLES and "kategorie" in query:
+                session_id = secrets.token_hex(16)
+                state.sessions[session_id] = {"subject": query["predmet"], "category": query["kategorie"]}
+                self.redirect("/test-kategorie.php?poradi_ulohy=1",
+                              [("Set-Cookie", f"{SESSION_COOKIE}={session_id}; Path=/")])
+            elif url.path == "/test-kategorie.php":
+                session = self.session()
+                try:
+                    n = int(query.get("poradi_ulohy", 1))
+                except ValueError:
+                    n = 0
+                if session is None:
+                    self.redirect("/")
+                elif 1 <= n <= state.questions:
+                    self.send_page(render_question(state, session, n), is_question=True)
+                else:
+                    self.send_body(404, "text/plain; charset=utf-8", "Úloha neexistuje.".encode("utf-8"))
+            elif url.path == "/vysledky.php":
+                self.send_page(render_results(state))
+            elif url.path == "/static/style.css":
+                self.send_body(200, "text/css", STYLE, [("Cache-Control", "max-age=86400")])
+            elif url.path.startswith("/static/figure_") and url.path.endswith(".svg"):
+                self.send_body(200, "image/svg+xml", figure_svg(int(url.path[len("/static/figure_"):-4] or 0)),
+                               [("Cache-Control", "max-age=86400")])
+            else:
+                self.send_body(404, "text/plain", b"Not found")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def start_fixture_server(port=FIXTURE_PORT, questions=DEFAULT_QUESTIONS, latency_ms=0):
+    """ Starts the fixture site in a background thread. Returns (server, state). """
+    state = FixtureState(questions, latency_ms)
+    server = ThreadingHTTPServer((FIXTURE_HOST, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+def fixture_url(port=FIXTURE_PORT):
+    return f"http://{FIXTURE_HOST}:{port}/"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for tau.cermat.cz.")
+    parser.add_argument("--port", type=int, default=FIXTURE_PORT, help=f"Port (default: {FIXTURE_PORT}).")
+    parser.add_argument("--questions", type=int, default=DEFAULT_QUESTIONS,
+                        help=f"Number of questions in every category (default: {DEFAULT_QUESTIONS}).")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay added to every response.")
+    args = parser.parse_args()
+
+    server, state = start_fixture_server(args.port, args.questions, args.latency_ms)
+    print(f"Fixture site running on {fixture_url(args.port)} (run the scripts with CERMAT_BASE_URL set to it).")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
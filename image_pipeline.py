@@ -0,0 +1,217 @@
+import io
+import os
+import zlib
+import struct
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, features
+
+import blob_store
+from blob_store import BlobStore
+from checkpoint import write_atomic
+
+# Output formats: Pillow save options per format. Without an explicit quality, WebP is
+# lossless, which is both exact and smallest for text-heavy screenshots.
+IMAGE_FORMATS = {
+    "png": {"format": "PNG", "optimize": True},
+    "webp": {"format": "WEBP", "method": 4, "lossless": True},
+    "avif": {"format": "AVIF", "speed": 6, "quality": 60},
+}
+# Raw screenshots waiting to be encoded; capture pauses when this many are queued
+QUEUE_SIZE = 32
+BATCH_SIZE = 8
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def format_supported(image_format):
+    return image_format == "png" or features.check(image_format)
+
+# Lossless WebP where this Pillow can write it: exact and many times smaller than PNG for text screenshots
+DEFAULT_FORMAT = "webp" if format_supported("webp") else "png"
+
+def output_path(path, image_format):
+    """ `question_1.png` -> `question_1.webp` for the chosen format. """
+    return os.path.splitext(path)[0] + "." + image_format
+
+def encode(data, image_format, quality):
+    """ Re-encodes a PNG screenshot. Runs in a worker process. """
+    options = dict(IMAGE_FORMATS[image_format])
+    image = Image.open(io.BytesIO(data))
+    if image_format != "png":
+        if quality is not None:
+            options.update(quality=quality, lossless=False)
+        # Screenshots have no useful transparency; dropping alpha makes lossy files smaller
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+def encode_batch(items, image_format, quality, blob_root=None):
+    """
+    Encodes and writes a batch of (path, png bytes), through the blob store at `blob_root` if given.
+    Runs in a worker process. Returns [(path, size or error)].
+    """
+    store = BlobStore(blob_root) if blob_root else None
+    results = []
+    for path, data in items:
+        try:
+            encoded = encode(data, image_format, quality)
+            if store is not None:
+                store.write(path, encoded)
+            else:
+                write_atomic(path, encoded)
+            results.append((path, len(encoded)))
+        except Exception as e:
+            results.append((path, f"{type(e).__name__}: {e}"))
+    return results
+
+class ImageWriteError(Exception):
+    """ A queued screenshot could not be encoded or written. """
+
+class ImageWriter:
+    """
+    Takes raw screenshots from the capture tabs and encodes and writes them in a process pool,
+    so capturing does not wait for compression or the disk. The queue is bounded:
+    when encoding falls behind, `submit` waits instead of buffering without limit.
+    """
+
+    def __init__(self, image_format=DEFAULT_FORMAT, quality=None, workers=None,
+                 queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE):
+        if not format_supported(image_format):
+            print(f"Pillow has no {image_format} support here, writing optimized PNG instead.")
+            image_format = "png"
+        self.image_format = image_format
+        self.quality = quality
+        # Workers are separate processes, so they get the enabled store's location rather than the store
+        self.blob_root = blob_store.STORE.root if blob_store.STORE is not None else None
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        # Not "fork": this process already runs Playwright's event loop and thread pools,
+        # and a forked child can hang on a lock some other thread held at fork time
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("forkserver"))
+        self.queue = asyncio.Queue(queue_size)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.running = set()
+        self.raw_bytes = self.written_bytes = 0
+        self.consumer = asyncio.create_task(self.consume())
+
+    def path_for(self, path):
+        return output_path(path, self.image_format)
+
+    async def submit(self, path, data):
+        """
+        Queues a PNG screenshot for `path` (its extension follows the output format).
+        Returns a future that resolves to the written path once the file is on disk,
+        or raises ImageWriteError if encoding or writing failed.
+        """
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put((self.path_for(path), data, done))
+        return done
+
+    async def consume(self):
+        while True:
+            batch = [await self.queue.get()]
+            if batch[0] is None:
+                break
+            stop = False
+            while len(batch) < self.batch_size and not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            await self.slots.acquire()
+            task = asyncio.create_task(self.encode(batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+            if stop:
+                break
+        await asyncio.gather(*self.running)
+
+    async def encode(self, batch):
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self.executor, encode_batch,
+                                                 [(path, data) for path, data, _ in batch],
+                                                 self.image_format, self.quality, self.blob_root)
+        except Exception as e:
+            results = [(path, str(e)) for path, _, _ in batch]
+        finally:
+            self.slots.release()
+        for (path, data, done), (_, result) in zip(batch, results):
+            if isinstance(result, int):
+                self.raw_bytes += len(data)
+                self.written_bytes += result
+                done.set_result(path)
+            else:
+                print(f"Error encoding {path}:", result)
+                done.set_exception(ImageWriteError(f"{path}: {result}"))
+
+    async def close(self):
+        """ Waits until every queued screenshot is written, then stops the workers. """
+        await self.queue.put(None)
+        await self.consumer
+        self.executor.shutdown()
+        if self.raw_bytes:
+            print(f"Screenshots: {self.raw_bytes / 1e6:.1f} MB captured, {self.written_bytes / 1e6:.1f} MB written "
+                  f"as {self.image_format}.")
+
+# --------------------------
+# Strip-by-strip PNG
+# --------------------------
+
+class PngStripWriter:
+    """
+    Writes an RGB PNG from horizontal strips as they arrive, compressing each one
+    straight into the file, so only a single strip is ever held in memory.
+    The final height is only known at the end and is patched into the header by `close`.
+    """
+
+    def __init__(self, path, width, compress_level=6):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.width = width
+        self.height = 0
+        self.compressor = zlib.compressobj(compress_level)
+        self.file = open(self.tmp_path, "wb")
+        self.file.write(PNG_SIGNATURE)
+        self.write_chunk(b"IHDR", self.header())
+
+    def header(self):
+        # 8-bit RGB, deflate, adaptive filtering, no interlace
+        return struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+
+    def write_chunk(self, kind, data):
+        self.file.write(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data)))
+
+    def add_strip(self, image):
+        """ Appends a strip (a PIL image), cropped or padded with white to the PNG width. """
+        pixels = np.asarray(image.convert("RGB"))[:, :self.width]
+        if pixels.shape[1] < self.width:
+            pixels = np.pad(pixels, ((0, 0), (0, self.width - pixels.shape[1]), (0, 0)), constant_values=255)
+        rows = pixels.reshape(len(pixels), -1)
+        # "Sub" filter: every byte minus the same channel of the pixel to its left
+        filtered = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:4] = rows[:, :3]
+        filtered[:, 4:] = rows[:, 3:] - rows[:, :-3]
+        data = self.compressor.compress(filtered.tobytes())
+        if data:
+            self.write_chunk(b"IDAT", data)
+        self.height += len(rows)
+
+    def close(self):
+        self.write_chunk(b"IDAT", self.compressor.flush())
+        self.write_chunk(b"IEND", b"")
+        self.file.seek(len(PNG_SIGNATURE))
+        self.write_chunk(b"IHDR", self.header())
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """ Drops the partial file, so a failed capture never leaves a truncated image behind. """
+        self.file.close()
+        os.remove(self.tmp_path)
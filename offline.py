@@ -0,0 +1,208 @@
+import os
+import re
+import html
+import mmap
+import time
+import argparse
+import threading
+import webbrowser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from checkpoint import load_manifest, screenshot_file
+from corpus import category_for_folder
+from questions import CATEGORIES
+
+OFFLINE_HOST = "127.0.0.1"
+OFFLINE_PORT = 8766
+
+QUESTION_FILE = re.compile(r"^question_(\d+)\.(png|webp|avif|html)$")
+CONTENT_TYPES = {".png": "image/png", ".webp": "image/webp", ".avif": "image/avif"}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="cs"><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em auto; max-width: 1100px; }}
+pre {{ white-space: pre-wrap; font-family: inherit; font-size: 1.1em; }}
+img {{ max-width: 100%; border: 1px solid #ccc; }}
+nav a {{ margin-right: 1em; }}
+</style></head><body>{body}</body></html>"""
+
+class OfflineCorpus:
+    """ Resolves (subject, category radio id, question number) to the files `scrape.py` saved. """
+
+    def __init__(self, screenshot_dir="screenshots", html_dir="html_pages"):
+        self.screenshot_dir = screenshot_dir
+        self.html_dir = html_dir
+        self.folders = {}
+
+    def folder(self, subject, category_radio_id):
+        key = (subject, category_radio_id)
+        if key not in self.folders:
+            folder = load_manifest(subject, category_radio_id).get("folder")
+            if not folder:
+                for root in (self.html_dir, self.screenshot_dir):
+                    if not os.path.isdir(root):
+                        continue
+                    for name in os.listdir(root):
+                        item = category_for_folder(name)
+                        if item and (item["subject"], item["category"]) == key:
+                            folder = name
+                            break
+                    if folder:
+                        break
+            self.folders[key] = folder
+        return self.folders[key]
+
+    def question_numbers(self, subject, category_radio_id):
+        folder = self.folder(subject, category_radio_id)
+        numbers = set()
+        for root in (self.html_dir, self.screenshot_dir):
+            path = os.path.join(root, folder) if folder else None
+            if path and os.path.isdir(path):
+                numbers.update(int(m.group(1)) for m in map(QUESTION_FILE.match, os.listdir(path)) if m)
+        return sorted(numbers)
+
+    def text(self, subject, category_radio_id, question_number):
+        folder = self.folder(subject, category_radio_id)
+        if not folder:
+            return None
+        try:
+            with open(os.path.join(self.html_dir, folder, f"question_{question_number}.html"), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def screenshot_path(self, subject, category_radio_id, question_number):
+        folder = self.folder(subject, category_radio_id)
+        if not folder:
+            return None
+        path = screenshot_file(os.path.join(self.screenshot_dir, folder), f"question_{question_number}")
+        return path if os.path.exists(path) else None
+
+def question_path(subject, category_radio_id, question_number):
+    """ Local counterpart of `test-kategorie.php?poradi_ulohy=N`, with the category in the query. """
+    return f"/test-kategorie.php?predmet={subject}&kategorie={category_radio_id}&poradi_ulohy={question_number}"
+
+def question_url(subject, category_radio_id, question_number, port=OFFLINE_PORT):
+    return f"http://{OFFLINE_HOST}:{port}" + question_path(subject, category_radio_id, question_number)
+
+def render_index():
+    items = []
+    for item in CATEGORIES:
+        link = question_path(item["subject"], item["category"], 1)
+        items.append(f'<li><a href="{link}">{html.escape(item["name"])}</a> ({item["subject"]})</li>')
+    return PAGE_TEMPLATE.format(title="Otázky offline", body="<h1>Kategorie</h1><ul>" + "".join(items) + "</ul>")
+
+def render_question(corpus, subject, category_radio_id, question_number):
+    item = next((i for i in CATEGORIES if i["subject"] == subject and i["category"] == category_radio_id), None)
+    name = item["name"] if item else f"{subject}/{category_radio_id}"
+    text = corpus.text(subject, category_radio_id, question_number)
+    has_screenshot = corpus.screenshot_path(subject, category_radio_id, question_number) is not None
+    if text is None and not has_screenshot:
+        return None
+    screenshot_link = (f"/screenshot?predmet={subject}&kategorie={category_radio_id}"
+                       f"&poradi_ulohy={question_number}")
+    nav = ['<a href="/">Kategorie</a>']
+    if question_number > 1:
+        nav.append(f'<a href="{question_path(subject, category_radio_id, question_number - 1)}">'
+                   f'&larr; {question_number - 1}</a>')
+    nav.append(f'<a href="{question_path(subject, category_radio_id, question_number + 1)}">'
+               f'{question_number + 1} &rarr;</a>')
+    body = [f"<nav>{''.join(nav)}</nav>", f"<h1>{html.escape(name)} – úloha {question_number}</h1>"]
+    if has_screenshot:
+        body.append(f'<img loading="lazy" decoding="async" src="{screenshot_link}" alt="úloha {question_number}">')
+    if text is not None:
+        body.append(f"<pre>{html.escape(text)}</pre>")
+    return PAGE_TEMPLATE.format(title=f"{html.escape(name)} {question_number}", body="".join(body))
+
+def make_handler(corpus):
+    class Handler(BaseHTTPRequestHandler):
+        def send_body(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            try:
+                if url.path == "/":
+                    self.send_body(200, "text/html; charset=utf-8", render_index().encode("utf-8"))
+                elif url.path == "/test-kategorie.php":
+                    page = render_question(corpus, query["predmet"], query["kategorie"], int(query["poradi_ulohy"]))
+                    if page is None:
+                        self.send_body(404, "text/plain; charset=utf-8", "Otázka nebyla stažena.".encode("utf-8"))
+                    else:
+                        self.send_body(200, "text/html; charset=utf-8", page.encode("utf-8"))
+                elif url.path == "/screenshot":
+                    self.send_screenshot(query)
+                else:
+                    self.send_body(404, "text/plain", b"Not found")
+            except (KeyError, ValueError):
+                self.send_body(400, "text/plain", b"Bad request")
+
+        def send_screenshot(self, query):
+            path = corpus.screenshot_path(query["predmet"], query["kategorie"], int(query["poradi_ulohy"]))
+            if path is None:
+                self.send_body(404, "text/plain", b"Not found")
+                return
+            # Memory-mapped, so large screenshots go to the socket without being copied into Python
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPES[os.path.splitext(path)[1]])
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Cache-Control", "max-age=3600")
+                self.end_headers()
+                self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def start_server(port=OFFLINE_PORT, screenshot_dir="screenshots", html_dir="html_pages"):
+    """
+    Starts the offline viewer in a background thread and returns the server,
+    or None if the port is taken (most likely by an offline viewer that is already running).
+    """
+    try:
+        server = ThreadingHTTPServer((OFFLINE_HOST, port), make_handler(OfflineCorpus(screenshot_dir, html_dir)))
+    except OSError:
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Offline viewer running on http://{OFFLINE_HOST}:{port}/")
+    return server
+
+def open_offline(urls, port=OFFLINE_PORT):
+    """ Opens the URLs in the default browser, serving them until Ctrl-C if no viewer was running yet. """
+    server = start_server(port)
+    for url in urls:
+        webbrowser.open_new_tab(url)
+    if server is None:
+        return
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("Offline viewer stopped.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the scraped questions locally, without a browser session.")
+    parser.add_argument("--port", type=int, default=OFFLINE_PORT, help=f"Port (default: {OFFLINE_PORT}).")
+    parser.add_argument("--screenshot-dir", type=str, default="screenshots")
+    parser.add_argument("--html-dir", type=str, default="html_pages")
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.screenshot_dir, args.html_dir)
+    if server is None:
+        print(f"Port {args.port} is already in use.")
+    else:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
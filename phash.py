@@ -0,0 +1,200 @@
+import io
+import os
+import re
+import json
+import fcntl
+import argparse
+
+import numpy as np
+from PIL import Image
+
+from checkpoint import write_atomic
+
+# Per-folder perceptual hashes, stored next to the screenshots they describe
+PHASH_FILE = "phash.json"
+HASH_SIZE = 8
+# Images are reduced to this size before the DCT; the hash keeps the lowest 8x8 frequencies
+SAMPLE_SIZE = 32
+# Hashes at most this many bits apart count as the same picture (anti-aliasing, font hinting)
+DEFAULT_THRESHOLD = 4
+BATCH_SIZE = 256
+
+QUESTION_IMAGE = re.compile(r"^question_(\d+)\.(png|webp|avif)$")
+
+def dct_matrix(size=SAMPLE_SIZE):
+    """ Orthonormal DCT-II basis, so the 2D transform of X is D @ X @ D.T. """
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+DCT = dct_matrix()
+
+def load_gray(source):
+    """ Decodes a screenshot (path or PNG bytes) into a SAMPLE_SIZE x SAMPLE_SIZE grayscale array. """
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    image.draft("L", (SAMPLE_SIZE, SAMPLE_SIZE))
+    return np.asarray(image.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.BILINEAR), dtype=np.float32)
+
+def phash_batch(grays):
+    """
+    pHash of a stack of grayscale samples (N x 32 x 32): DCT of every image at once,
+    then one bit per low frequency, set when it is above that image's median.
+    Returns the hashes as Python ints.
+    """
+    if len(grays) == 0:
+        return []
+    frequencies = DCT @ np.asarray(grays, dtype=np.float32) @ DCT.T
+    low = frequencies[:, :HASH_SIZE, :HASH_SIZE].reshape(len(grays), -1)
+    # The DC term only carries the mean brightness
+    medians = np.median(low[:, 1:], axis=1, keepdims=True)
+    bits = np.packbits(low > medians, axis=1)
+    return [int.from_bytes(row.tobytes(), "big") for row in bits]
+
+def phash(source):
+    return phash_batch([load_gray(source)])[0]
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+def to_hex(value):
+    return f"{value:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+# --------------------------
+# Per-folder hash store
+# --------------------------
+
+class HashStore:
+    """
+    `{question number: pHash}` of one screenshot folder, kept in `phash.json` inside it.
+    Screenshots taken by scrape.py also keep the SHA-256 of the raw capture and the question's
+    text fingerprint (`captures`), which decide whether a re-capture really is unchanged.
+    """
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, PHASH_FILE)
+        self.hashes = {}
+        self.captures = {}
+        self.dirty = False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for n, value in json.load(f).items():
+                    # Older stores hold just the hex pHash
+                    if isinstance(value, dict):
+                        self.captures[int(n)] = {key: value.get(key) for key in ("sha256", "fingerprint")}
+                        value = value["phash"]
+                    self.hashes[int(n)] = int(value, 16)
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def get(self, question_number):
+        return self.hashes.get(question_number)
+
+    def capture(self, question_number):
+        """ {"sha256", "fingerprint"} of the last capture of a question, or {}. """
+        return self.captures.get(question_number, {})
+
+    def set(self, question_number, value, sha256=None, fingerprint=None):
+        if self.hashes.get(question_number) != value:
+            self.hashes[question_number] = value
+            self.dirty = True
+        if sha256 and self.capture(question_number) != {"sha256": sha256, "fingerprint": fingerprint}:
+            self.captures[question_number] = {"sha256": sha256, "fingerprint": fingerprint}
+            self.dirty = True
+
+    def forget(self, question_number):
+        """ Drops a question whose new screenshot never reached the disk. """
+        if self.hashes.pop(question_number, None) is not None:
+            self.captures.pop(question_number, None)
+            self.dirty = True
+
+    def entry(self, question_number):
+        value = to_hex(self.hashes[question_number])
+        if question_number in self.captures:
+            return {"phash": value, **self.captures[question_number]}
+        return value
+
+    def save(self):
+        """ Writes the store, keeping hashes other processes saved for questions not seen here. """
+        if not self.dirty:
+            return
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            on_disk = HashStore(os.path.dirname(self.path))
+            for n, value in on_disk.hashes.items():
+                if n not in self.hashes:
+                    self.hashes[n] = value
+                    if n in on_disk.captures:
+                        self.captures[n] = on_disk.captures[n]
+            data = {str(n): self.entry(n) for n in sorted(self.hashes)}
+            write_atomic(self.path, json.dumps(data, indent=1).encode("utf-8"))
+        self.dirty = False
+
+def question_images(folder):
+    """ {question number: path} of the question screenshots in a folder. """
+    if not os.path.isdir(folder):
+        return {}
+    return {int(m.group(1)): os.path.join(folder, m.group(0))
+            for m in map(QUESTION_IMAGE.match, os.listdir(folder)) if m}
+
+def update_folder(folder, batch_size=BATCH_SIZE):
+    """ Hashes, in batches, every screenshot of a folder that has no stored hash yet. Returns the store. """
+    store = HashStore(folder)
+    pending = sorted((n, path) for n, path in question_images(folder).items() if store.get(n) is None)
+    for i in range(0, len(pending), batch_size):
+        batch = []
+        for question_number, path in pending[i:i + batch_size]:
+            try:
+                batch.append((question_number, load_gray(path)))
+            except (OSError, ValueError) as e:
+                print(f"Could not hash {path}:", e)
+        for (question_number, _), value in zip(batch, phash_batch([gray for _, gray in batch])):
+            store.set(question_number, value)
+    store.save()
+    return store
+
+def compare_folders(old_folder, new_folder, threshold=DEFAULT_THRESHOLD):
+    """ Returns {"changed": [(n, distance)], "added": [n], "removed": [n], "unchanged": count}. """
+    old, new = update_folder(old_folder).hashes, update_folder(new_folder).hashes
+    changed = [(n, hamming(old[n], new[n])) for n in sorted(old.keys() & new.keys())
+               if hamming(old[n], new[n]) > threshold]
+    return {
+        "changed": changed,
+        "added": sorted(new.keys() - old.keys()),
+        "removed": sorted(old.keys() - new.keys()),
+        "unchanged": len(old.keys() & new.keys()) - len(changed),
+    }
+
+def subfolders(root):
+    return sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perceptual hashes of the question screenshots.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    update_parser = subparsers.add_parser("update", help="Hash the screenshots that have no stored hash yet.")
+    update_parser.add_argument("--screenshot-dir", type=str, default="screenshots")
+    report_parser = subparsers.add_parser("report", help="List the questions that changed between two scrape runs.")
+    report_parser.add_argument("old", type=str, help="Screenshot directory of the earlier run.")
+    report_parser.add_argument("new", type=str, help="Screenshot directory of the later run.")
+    report_parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                               help=f"Maximum Hamming distance for an unchanged question (default: {DEFAULT_THRESHOLD}).")
+    args = parser.parse_args()
+
+    if args.command == "update":
+        for folder in subfolders(args.screenshot_dir):
+            store = update_folder(os.path.join(args.screenshot_dir, folder))
+            print(f"{folder}: {len(store.hashes)} hashes.")
+    else:
+        for folder in sorted(set(subfolders(args.old)) | set(subfolders(args.new))):
+            report = compare_folders(os.path.join(args.old, folder), os.path.join(args.new, folder), args.threshold)
+            if not (report["changed"] or report["added"] or report["removed"]):
+                continue
+            print(f"{folder}: {len(report['changed'])} changed, {len(report['added'])} added, "
+                  f"{len(report['removed'])} removed, {report['unchanged']} unchanged")
+            for question_number, distance in report["changed"]:
+                print(f"  question {question_number}: distance {distance}")
+            if report["added"]:
+                print(f"  added: {report['added']}")
+            if report["removed"]:
+                print(f"  removed: {report['removed']}")
@@ -1,33 +1,30 @@
-import os
-import time
+import asyncio
 import argparse
 import random
-import threading
-from playwright.sync_api import sync_playwright
-from answered import ANSWERED
+from playwright.async_api import async_playwright
 from questions import CATEGORIES
-from common import accept_cookies, click_prijimacky, detect_total_questions, select_category, select_subject, wait_for_subject_selection
-
-# Path to store the updated answered questions in Python format
-ANSWERED_PYTHON_FILE = "answered.py"
+from answered_store import open_answered_store
+from common import TEST_URL, detect_total_questions, set_legacy_waits, wait_for_question_ready
+from daemon import daemon_request
+from offline import OfflineCorpus, open_offline, question_url
+from route_cache import StaticCache, install_routes
+from category_cache import cached_total, remember_total
+from dedup import load_duplicate_map, with_answered_duplicates
+from session_cache import ensure_category, new_category_context
 
 # --------------------------
 # Helper Functions
 # --------------------------
 
-def get_manually_answered():
-    """ Load manually confirmed answered questions from `questions.py`. """
-    answered_dict = {}
-    for entry in ANSWERED:
-        category_name = entry["name"]
-        answered_set = set()
-        for r in entry["answered"]:
-            if isinstance(r, range):
-                answered_set.update(range(r.start, r.stop))  # Convert range to set of numbers
-            else:
-                answered_set.add(r)
-        answered_dict[category_name] = answered_set
-    return answered_dict
+def get_manually_answered(store):
+    """ Load answered questions from the answered store (seeded from `answered.py` on first use). """
+    return store.load()
+
+def with_duplicates(manually_answered, skip_duplicates):
+    """ Also treats questions as answered when a near-duplicate (see `dedup.py`) has been answered. """
+    if not skip_duplicates:
+        return manually_answered
+    return with_answered_duplicates(manually_answered, load_duplicate_map())
 
 def get_unanswered_questions(category_name, total_questions, manually_answered):
     """ Get a list of unanswered questions for a category. """
@@ -39,157 +36,239 @@ def find_category(name):
     """ Get category details from `CATEGORIES` list. """
     return next((item for item in CATEGORIES if item["name"] == name), None)
 
-def format_answered(questions):
-    """ Convert a set of numbers into a mix of `range()` and single numbers. """
-    sorted_questions = sorted(questions)
-    if not sorted_questions:
-        return "[]"
-
-    ranges = []
-    current_range = [sorted_questions[0]]
-
-    for num in sorted_questions[1:]:
-        if num == current_range[-1] + 1:
-            current_range.append(num)
-        else:
-            if len(current_range) > 1:
-                ranges.append(f"range({current_range[0]}, {current_range[-1] + 1})")
-            else:
-                ranges.append(str(current_range[0]))
-            current_range = [num]
-
-    if len(current_range) > 1:
-        ranges.append(f"range({current_range[0]}, {current_range[-1] + 1})")
-    else:
-        ranges.append(str(current_range[0]))
-
-    return "[" + ", ".join(ranges) + "]"
-
-def save_questions_python(updated_answered):
-    """ Saves the answered questions into a Python script format (`questions_now.py`). """
-    with open(ANSWERED_PYTHON_FILE, "w", encoding="utf-8") as f:
-
-        f.write("\nANSWERED = [\n")
-        
-        # Writing the updated ANSWERED dictionary
-        for category, questions in updated_answered.items():
-            formatted_questions = format_answered(questions)
-            f.write(f'    {{"name": "{category}", "answered": {formatted_questions}}},\n')
-
-        f.write("]\n\n")
-
-    print(f"✅ Saved updated answered questions to `{ANSWERED_PYTHON_FILE}`.")
-
 # --------------------------
-# Browser Session Per Category
+# Browser Context Per Category
 # --------------------------
-def start_category_session(category_name, subject, category_radio_id, num_questions, manually_answered, answered_now):
+async def open_tab(tab, question_url):
+    print(f"Opening question: {question_url}")
+    try:
+        await tab.goto(question_url)
+        await wait_for_question_ready(tab)
+    except Exception as e:
+        print(f"Failed to open {question_url}:", e)
+
+async def open_questions(context, questions, first_tab=None):
+    """ Opens the questions concurrently, the first one in `first_tab` if given, and returns the tabs. """
+    tabs = [first_tab] if first_tab else []
+    tabs += [await context.new_page() for _ in questions[len(tabs):]]
+    await asyncio.gather(*(open_tab(tab, TEST_URL + str(question)) for tab, question in zip(tabs, questions)))
+    return tabs
+
+def pick_questions(category_name, total_questions, num_questions, manually_answered, exclude=()):
+    unanswered = [n for n in get_unanswered_questions(category_name, total_questions, manually_answered)
+                  if n not in exclude]
+    return random.sample(unanswered, min(num_questions, len(unanswered)))
+
+async def start_category_session(browser, cache, category_name, subject, category_radio_id, num_questions,
+                                 manually_answered, store):
     """
-    Starts a **separate browser instance** for a category.
-    Each browser instance handles multiple tabs for the category, ensuring an independent session.
+    Opens a **separate browser context** for a category in the shared browser.
+    Each context has its own session cookie, so categories stay independent,
+    and its question tabs are opened concurrently.
+    With a cached total, the random questions are picked and start loading
+    while the navigation is still running; a stale total is corrected afterwards.
     """
-    base_test_url = "https://tau.cermat.cz/test-kategorie.php?poradi_ulohy="
-
-    def run_in_thread():
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False, args=["--start-maximized"], ignore_default_args=["--enable-automation"])
-            context = browser.new_context(no_viewport=True)  # Ensures full maximized window
-            page = context.new_page()
-
-            # Step 1: Open Homepage and Accept Cookies
-            page.goto("https://tau.cermat.cz/")
-            accept_cookies(page)
-
-            # Step 2: Click on the PŘIJÍMAČKY Button
-            click_prijimacky(page)
-
-            # Step 3: Wait for subject selection page to load
-            wait_for_subject_selection(page)
-
-            # Step 4: Select subject
-            select_subject(page, subject)
-
-            # Step 5: Select category and submit
-            select_category(page, category_radio_id)
-
-            # Step 6: Detect total questions
-            total_questions = detect_total_questions(page)
-
-            # Get list of unanswered questions
-            unanswered = get_unanswered_questions(category_name, total_questions, manually_answered)
-
-            if len(unanswered) == 0:
-                print(f"No unanswered questions left in {category_name}.")
-                return None
-
-            # Select random questions
-            selected_questions = random.sample(unanswered, min(num_questions, len(unanswered)))
+    # Static assets come from the shared on-disk cache, analytics and ads are blocked.
+    context, from_snapshot = await new_category_context(
+        browser, subject, category_radio_id,
+        prepare_context=lambda context: install_routes(context, cache),
+        no_viewport=True)  # Ensures full maximized window
+    page = await context.new_page()
+
+    # Steps 1-5: Reach the category, from a saved session snapshot when possible.
+    navigation = ensure_category(context, page, subject, category_radio_id, from_snapshot)
+
+    cached = cached_total(subject, category_radio_id)
+    selected_questions, tabs = [], []
+    if cached is not None:
+        selected_questions = pick_questions(category_name, cached, num_questions, manually_answered)
+        print(f"Opening {len(selected_questions)} questions from {category_name} (cached total {cached}): {selected_questions}")
+        navigated, tabs = await asyncio.gather(navigation, open_questions(context, selected_questions))
+    else:
+        navigated = await navigation
+
+    # Step 6: Detect total questions and refresh the cache
+    total_questions = await detect_total_questions(page)
+    remember_total(subject, category_radio_id, total_questions)
+    if total_questions is None:
+        total_questions = cached
+    if total_questions is None:
+        print(f"Could not detect the number of questions in {category_name}.")
+        return
+
+    if cached is not None:
+        # Questions beyond a shrunken total are replaced
+        kept = [(tab, question) for tab, question in zip(tabs, selected_questions) if question <= total_questions]
+        for tab, question in zip(tabs, selected_questions):
+            if question > total_questions:
+                await tab.close()
+        # Tabs that loaded before a full navigation had no valid session yet
+        if navigated:
+            await asyncio.gather(*(open_tab(tab, TEST_URL + str(question)) for tab, question in kept))
+        selected_questions = [question for _, question in kept]
+        extra = pick_questions(category_name, total_questions, num_questions - len(kept), manually_answered,
+                               exclude=selected_questions)
+        if extra:
+            print(f"Opening replacement questions from {category_name}: {extra}")
+            await open_questions(context, extra)
+            selected_questions += extra
+        # The navigation tab is not needed once the questions are open
+        if selected_questions:
+            await page.close()
+    else:
+        # Select random questions
+        selected_questions = pick_questions(category_name, total_questions, num_questions, manually_answered)
+        if selected_questions:
             print(f"Opening {len(selected_questions)} questions from {category_name}: {selected_questions}")
+            # First question in the current tab, the rest in new tabs, all loading at once
+            await open_questions(context, selected_questions, first_tab=page)
 
-            # Open first question in current tab
-            first_question_url = base_test_url + str(selected_questions[0])
-            print(f"Opening first question in current tab: {first_question_url}")
-            page.goto(first_question_url)
-            page.wait_for_load_state("networkidle")
+    if not selected_questions:
+        print(f"No unanswered questions left in {category_name}.")
+        await context.close()
+        return
 
-            # Open remaining questions in separate tabs
-            for question in selected_questions[1:]:
-                question_url = base_test_url + str(question)
-                new_tab = context.new_page()
-                print(f"Opening extra question in new tab: {question_url}")
-                new_tab.goto(question_url)
-                new_tab.wait_for_load_state("networkidle")
+    print(f"✅ Session for category '{category_name}' is running in its own browser context.")
 
-            print(f"✅ Session for category '{category_name}' is running in its own browser instance.")
+    # **Save Answered Questions** (appends only the new numbers, safe across threads and processes)
+    store.add(category_name, selected_questions)
+    store.export()
 
-            # **Merge and Save Answered Questions**
-            if category_name in answered_now:
-                answered_now[category_name].update(selected_questions)
-            else:
-                answered_now[category_name] = manually_answered.get(category_name, set()).union(selected_questions)
+async def wait_until_closed(browser):
+    """ Returns once the browser is gone or the user has closed every question window. """
+    closed = asyncio.Event()
 
-            # Save updated answered log in Python format
-            save_questions_python(answered_now)
+    def check(*_):
+        if not browser.is_connected() or not any(context.pages for context in browser.contexts):
+            closed.set()
 
-            # Prevent the browser from closing immediately
-            page.wait_for_timeout(9999999)
-
-    # Run each browser session in a new thread
-    thread = threading.Thread(target=run_in_thread)
-    thread.start()
+    browser.on("disconnected", check)
+    for context in browser.contexts:
+        context.on("page", lambda page: page.on("close", check))
+        for page in context.pages:
+            page.on("close", check)
+    check()
+    await closed.wait()
 
 # --------------------------
 # Main Function
 # --------------------------
-def main(categories, num_questions_per_category):
+async def run_quiz(categories, num_questions_per_category, skip_duplicates=False):
     """
-    Starts a **separate browser instance** for each category.
-    Each instance runs an independent session and opens multiple tabs for questions.
+    Starts **one browser** with a separate context per category.
+    Each context runs an independent session and opens multiple tabs for questions.
     """
-    manually_answered = get_manually_answered()  # Load manually confirmed answered questions from `questions.py`
-    answered_now = manually_answered.copy()  # Copy existing answers and update them
+    store = open_answered_store()
+    manually_answered = get_manually_answered(store)  # Load answered questions from the store
+    manually_answered = with_duplicates(manually_answered, skip_duplicates)
+    cache = StaticCache()
 
+    sessions = []
     for category_name in categories:
         category_info = find_category(category_name)
         if not category_info:
             print(f"Skipping unknown category: {category_name}")
             continue
-
-        subject = category_info["subject"]
-        category_radio_id = category_info["category"]
-
-        # Start a separate browser instance for this category
-        start_category_session(category_name, subject, category_radio_id, num_questions_per_category, manually_answered, answered_now)
+        sessions.append((category_name, category_info["subject"], category_info["category"]))
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False, args=["--start-maximized"], ignore_default_args=["--enable-automation"])
+        try:
+            results = await asyncio.gather(*(start_category_session(browser, cache, category_name, subject,
+                                                                    category_radio_id, num_questions_per_category,
+                                                                    manually_answered, store)
+                                             for category_name, subject, category_radio_id in sessions),
+                                           return_exceptions=True)
+            for (category_name, _, _), result in zip(sessions, results):
+                if isinstance(result, Exception):
+                    print(f"Session for category '{category_name}' failed:", result)
+            cache.flush()
+            # Keep the questions open until the windows are closed (or Ctrl-C)
+            await wait_until_closed(browser)
+        finally:
+            if browser.is_connected():
+                await browser.close()
+            print("Quiz session closed.")
+
+def quiz_via_daemon(categories, num_questions_per_category):
+    """
+    Asks a running `daemon.py` to open the questions. Returns the categories no daemon received,
+    which need a browser here; a category the daemon received but did not answer is only reported.
+    """
+    local = []
+    for category_name in categories:
+        result = daemon_request("/quiz", {"category": category_name, "num_questions": num_questions_per_category})
+        if result is None:
+            local.append(category_name)
+        elif "error" in result:
+            print(f"Daemon could not open '{category_name}':", result["error"])
+        elif not result["opened"]:
+            print(f"No unanswered questions left in {category_name}.")
+        else:
+            print(f"✅ Opened questions {result['opened']} from {category_name} in the browser pool.")
+    return local
+
+def quiz_offline(categories, num_questions_per_category, skip_duplicates=False):
+    """ Samples unanswered questions from the local scraped output and opens them in the offline viewer. """
+    store = open_answered_store()
+    manually_answered = with_duplicates(get_manually_answered(store), skip_duplicates)
+    corpus = OfflineCorpus()
+    urls = []
+    for category_name in categories:
+        category_info = find_category(category_name)
+        if not category_info:
+            print(f"Skipping unknown category: {category_name}")
+            continue
+        subject, category_radio_id = category_info["subject"], category_info["category"]
+        captured = set(corpus.question_numbers(subject, category_radio_id))
+        if not captured:
+            print(f"Nothing scraped for {category_name} yet.")
+            continue
+        unanswered = [n for n in get_unanswered_questions(category_name, max(captured), manually_answered)
+                      if n in captured]
+        selected_questions = random.sample(unanswered, min(num_questions_per_category, len(unanswered)))
+        if not selected_questions:
+            print(f"No unanswered questions left in {category_name}.")
+            continue
+        print(f"Opening {len(selected_questions)} questions from {category_name}: {selected_questions}")
+        urls += [question_url(subject, category_radio_id, question) for question in selected_questions]
+        store.add(category_name, selected_questions)
+    if urls:
+        store.export()
+    open_offline(urls)
+
+def main(categories, num_questions_per_category, use_daemon=True, offline=False, skip_duplicates=False):
+    if offline:
+        quiz_offline(categories, num_questions_per_category, skip_duplicates)
+        return
+    # The daemon samples from its own answered store, so duplicate skipping needs a local browser
+    if use_daemon and not skip_duplicates:
+        categories = quiz_via_daemon(categories, num_questions_per_category)
+        if not categories:
+            return
+    try:
+        asyncio.run(run_quiz(categories, num_questions_per_category, skip_duplicates))
+    except KeyboardInterrupt:
+        print("Interrupted, browser closed.")
 
 # --------------------------
 # Command Line Arguments
 # --------------------------
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
-        description="Open multiple random unanswered questions in separate browsers, ensuring independent sessions."
+        description="Open multiple random unanswered questions in one browser, with an independent session per category."
     )
     parser.add_argument("--categories", nargs="+", required=True, help="List of category names.")
     parser.add_argument("--num_questions", type=int, default=5, help="Number of questions per category.")
+    parser.add_argument("--legacy-waits", action="store_true",
+                        help="Use the old fixed sleeps and networkidle waits instead of the readiness checks.")
+    parser.add_argument("--offline", action="store_true",
+                        help="Open the questions from the local scraped output instead of tau.cermat.cz.")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="Start a browser here even if a daemon.py browser pool is running.")
+    parser.add_argument("--skip-duplicates", action="store_true",
+                        help="Skip questions whose near-duplicate (from dedup.py) is already answered.")
     args = parser.parse_args()
+    set_legacy_waits(args.legacy_waits)
 
-    main(args.categories, args.num_questions)
+    main(args.categories, args.num_questions, not args.no_daemon, args.offline, args.skip_duplicates)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import fcntl
+import asyncio
+import hashlib
+import threading
+
+# URL fragments per resource class that can be blocked with `--block`
+BLOCKABLE_CLASSES = {
+    "analytics": ["google-analytics.com", "googletagmanager.com", "/gtag/js", "analytics.js", "hotjar.", "clarity.ms",
+                  "connect.facebook.net", "stats.g.doubleclick.net"],
+    "ads": ["doubleclick.net", "googlesyndication.com", "googleadservices.com", "adservice.google.", "/pagead/"],
+    "cookie-banner": ["cookiebot.com", "cookielaw.org", "onetrust.com", "cookieconsent"],
+    "media": [],
+}
+# Blocked by resource type rather than by URL
+BLOCKABLE_RESOURCE_TYPES = {
+    "media": ["media"],
+}
+DEFAULT_BLOCKED = ["analytics", "ads"]
+
+# Static assets served from the on-disk cache
+CACHEABLE_RESOURCE_TYPES = ("stylesheet", "script", "font", "image")
+HTTP_CACHE_DIR = ".http_cache"
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024
+# Entries younger than this are served without asking the server at all
+HTTP_CACHE_MAX_AGE = 24 * 60 * 60
+# The index is written after this many new entries (and by `flush`), not on every miss
+INDEX_SAVE_INTERVAL = 50
+# Response headers that are not replayed from the cache: hop-by-hop headers, cookies, and the
+# length/encoding of the original transfer (the stored body is already decompressed)
+UNCACHED_HEADERS = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+                    "trailers", "transfer-encoding", "upgrade", "set-cookie", "content-length", "content-encoding"}
+
+def is_blocked(request, blocked_classes):
+    url = request.url
+    for name in blocked_classes:
+        if any(fragment in url for fragment in BLOCKABLE_CLASSES.get(name, [])):
+            return True
+        if request.resource_type in BLOCKABLE_RESOURCE_TYPES.get(name, []):
+            return True
+    return False
+
+class StaticCache:
+    """
+    Content cache for static assets, shared by all contexts and runs.
+    Bodies live in `cache_dir` named by the hash of their URL; `index.json` keeps
+    the validators (ETag / Last-Modified) and the last use of every entry for LRU eviction.
+    Several processes (scrape workers, the daemon, quiz) may share the directory: the index
+    is merged with the on-disk copy under a file lock whenever it is saved.
+    """
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES, max_age=HTTP_CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.unsaved = 0
+        # Keys this process evicted or found without a body, so merging does not bring them back
+        self.removed = set()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.index = self.load_index()
+
+    def load_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def key(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def body_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def lookup(self, url):
+        with self.lock:
+            entry = self.index.get(self.key(url))
+            if entry and not os.path.exists(self.body_path(entry["key"])):
+                del self.index[entry["key"]]
+                self.removed.add(entry["key"])
+                return None
+            return entry
+
+    def is_fresh(self, entry):
+        # "no-cache" responses may be stored but must be revalidated on every use
+        if entry.get("revalidate"):
+            return False
+        return time.time() - entry["stored_at"] < self.max_age
+
+    def read(self, entry):
+        with self.lock:
+            entry["last_used"] = time.time()
+            self.hits += 1
+        with open(self.body_path(entry["key"]), "rb") as f:
+            return f.read()
+
+    def revalidation_headers(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["if-none-match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["if-modified-since"] = entry["last_modified"]
+        return headers
+
+    def refresh(self, entry):
+        """ The server confirmed (304) that the cached body is still current. """
+        with self.lock:
+            entry["stored_at"] = time.time()
+
+    def store(self, url, headers, body):
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or "private" in cache_control:
+            return
+        key = self.key(url)
+        tmp_path = f"{self.body_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, self.body_path(key))
+        now = time.time()
+        with self.lock:
+            self.misses += 1
+            self.index[key] = {
+                "key": key,
+                "url": url,
+                "size": len(body),
+                "content_type": headers.get("content-type"),
+                "headers": {name: value for name, value in headers.items() if name.lower() not in UNCACHED_HEADERS},
+                "revalidate": "no-cache" in cache_control,
+                "etag": headers.get("etag"),
+                "last_modified": headers.get("last-modified"),
+                "stored_at": now,
+                "last_used": now,
+            }
+            self.removed.discard(key)
+            self.unsaved += 1
+            if self.unsaved >= INDEX_SAVE_INTERVAL:
+                self.save_index()
+
+    def evict(self):
+        """ Drops the least recently used entries until the cache fits into `max_bytes`. """
+        total = sum(entry["size"] for entry in self.index.values())
+        for entry in sorted(self.index.values(), key=lambda e: e["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            del self.index[entry["key"]]
+            self.removed.add(entry["key"])
+            try:
+                os.remove(self.body_path(entry["key"]))
+            except OSError:
+                pass
+
+    def save_index(self):
+        """
+        Merges the on-disk index (entries stored by other processes, their newer uses) into ours,
+        evicts down to `max_bytes` over the merged set and writes it back. Called with `self.lock` held.
+        """
+        with open(self.index_path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            for key, entry in self.load_index().items():
+                if key in self.removed:
+                    continue
+                ours = self.index.get(key)
+                if ours is None or entry["stored_at"] > ours["stored_at"]:
+                    self.index[key] = entry
+                else:
+                    ours["last_used"] = max(ours["last_used"], entry["last_used"])
+            self.evict()
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+        self.unsaved = 0
+
+    def flush(self):
+        """ Persists the LRU timestamps updated by cache hits. """
+        with self.lock:
+            self.save_index()
+        print(f"HTTP cache: {self.hits} hits, {self.misses} stored, {len(self.index)} entries.")
+
+def cached_headers(entry):
+    """ The stored response headers (CORS, cache-control, vary, ...) to answer a hit or a 304 with. """
+    headers = dict(entry.get("headers") or {})
+    if entry.get("content_type") and not any(name.lower() == "content-type" for name in headers):
+        headers["content-type"] = entry["content_type"]
+    return headers
+
+def is_cacheable(request):
+    return request.method == "GET" and request.resource_type in CACHEABLE_RESOURCE_TYPES
+
+# --------------------------
+# Route handlers
+# --------------------------
+
+async def install_routes(context, cache=None, blocked_classes=DEFAULT_BLOCKED):
+    """
+    Routes every request of a context through the blocklist and the static cache.
+    Note that routing disables Chromium's own HTTP cache, which `cache` replaces.
+    """
+    async def handle(route):
+        request = route.request
+        if is_blocked(request, blocked_classes):
+            await route.abort()
+            return
+        if cache is None or not is_cacheable(request):
+            await route.continue_()
+            return
+        try:
+            entry = cache.lookup(request.url)
+            if entry and cache.is_fresh(entry):
+                # Disk reads and writes run off the event loop, so other tabs keep going meanwhile
+                body = await asyncio.to_thread(cache.read, entry)
+                await route.fulfill(status=200, headers=cached_headers(entry), body=body)
+                return
+            headers = dict(request.headers)
+            if entry:
+                headers.update(cache.revalidation_headers(entry))
+            response = await route.fetch(headers=headers)
+            if response.status == 304 and entry:
+                cache.refresh(entry)
+                body = await asyncio.to_thread(cache.read, entry)
+                await route.fulfill(status=200, headers=cached_headers(entry), body=body)
+                return
+            body = await response.body()
+            if response.status == 200:
+                await asyncio.to_thread(cache.store, request.url, response.headers, body)
+            await route.fulfill(response=response, body=body)
+        except Exception as e:
+            print(f"Cache routing failed for {request.url}:", e)
+            try:
+                await route.continue_()
+            except Exception:
+                pass
+
+    if blocked_classes or cache is not None:
+        await context.route("**/*", handle)
@@ -0,0 +1,188 @@
+import time
+import random
+import asyncio
+
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+
+from tracing import retry_attempt
+
+# Question fetches start at this many in flight and adapt between 1 and the configured maximum
+INITIAL_CONCURRENCY = 2
+# A completion slower than this multiple of the best smoothed latency counts as congestion
+LATENCY_TOLERANCE = 2.0
+LATENCY_SMOOTHING = 0.3
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+DEFAULT_ATTEMPTS = 3
+# Failed questions (after retries) tolerated per category: this share of the questions, at least the minimum
+ERROR_BUDGET_RATIO = 0.1
+ERROR_BUDGET_MIN = 5
+
+# --------------------------
+# Typed failures
+# --------------------------
+
+class ScrapeError(Exception):
+    """ Base class for failures the scheduler knows how to treat. """
+
+class TransientError(ScrapeError):
+    """ Timeouts, dropped connections, half-rendered pages: worth retrying after a pause. """
+
+class WrongPageError(TransientError):
+    """ The page is not the one we asked for (e.g. the category selection did not stick). """
+
+class PermanentError(ScrapeError):
+    """ Retrying will not help (bad input, local disk errors). """
+
+class ErrorBudgetExceeded(ScrapeError):
+    """ Too many failures in one category; its remaining work is abandoned. """
+
+def classify(error):
+    """ Maps an exception to TransientError or PermanentError. """
+    if isinstance(error, ScrapeError):
+        return error
+    if isinstance(error, (PlaywrightTimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return TransientError(str(error))
+    if isinstance(error, PlaywrightError):
+        # Network errors, crashed or closed targets
+        return TransientError(str(error))
+    return PermanentError(f"{type(error).__name__}: {error}")
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """ "Full jitter" exponential backoff: uniform in [0, min(cap, base * 2^attempt)]. """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# --------------------------
+# Error budget
+# --------------------------
+
+class ErrorBudget:
+    def __init__(self, total_items, ratio=ERROR_BUDGET_RATIO, minimum=ERROR_BUDGET_MIN):
+        self.allowed = max(minimum, int(total_items * ratio))
+        self.spent = 0
+
+    def spend(self, label, error):
+        self.spent += 1
+        print(f"{label} failed for good ({self.spent}/{self.allowed} of the error budget):", error)
+        if self.spent > self.allowed:
+            raise ErrorBudgetExceeded(f"{self.spent} failures, budget was {self.allowed}")
+
+# --------------------------
+# AIMD concurrency limit
+# --------------------------
+
+class AdaptiveLimiter:
+    """
+    Limits in-flight operations with additive increase / multiplicative decrease:
+    every fast success grows the limit by 1/limit (about +1 per round of requests),
+    an error or a completion slower than LATENCY_TOLERANCE x the best smoothed latency halves it.
+    Only operations started after the last decrease can trigger the next one.
+    """
+
+    def __init__(self, maximum, initial=INITIAL_CONCURRENCY, minimum=1):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = float(min(self.maximum, max(minimum, initial)))
+        self.in_flight = 0
+        self.latency = None
+        self.best_latency = None
+        self.last_decrease = 0.0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self, started, ok):
+        now = time.monotonic()
+        elapsed = now - started
+        async with self.condition:
+            self.in_flight -= 1
+            congested = not ok
+            if ok:
+                self.latency = elapsed if self.latency is None else \
+                    LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * self.latency
+                self.best_latency = self.latency if self.best_latency is None else min(self.best_latency, self.latency)
+                congested = elapsed > LATENCY_TOLERANCE * self.best_latency
+            if congested and started > self.last_decrease:
+                self.limit = max(self.minimum, self.limit / 2)
+                self.last_decrease = now
+            elif not congested:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+# --------------------------
+# Retries
+# --------------------------
+
+async def with_retries(label, action, *args, attempts=DEFAULT_ATTEMPTS):
+    """
+    Awaits `action(*args)` up to `attempts` times, retrying transient failures after a
+    jittered exponential pause. The last failure is raised as a TransientError or PermanentError.
+    """
+    for attempt in range(attempts):
+        # Lets the span the action opens record that it is a retry (see tracing.span)
+        token = retry_attempt.set(attempt)
+        try:
+            return await action(*args)
+        except ErrorBudgetExceeded:
+            raise
+        except Exception as e:
+            error = classify(e)
+            if isinstance(error, PermanentError) or attempt == attempts - 1:
+                raise error from e
+            delay = backoff_delay(attempt)
+            print(f"{label}: {type(error).__name__} ({error}), retrying in {delay:.1f} s.")
+            await asyncio.sleep(delay)
+        finally:
+            retry_attempt.reset(token)
+
+class Scheduler:
+    """
+    Runs question fetches under the adaptive limit with retries, and charges
+    failures that survive their retries to the category's error budget.
+    """
+
+    def __init__(self, max_concurrency, total_items, attempts=DEFAULT_ATTEMPTS):
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.budget = ErrorBudget(total_items)
+        self.attempts = attempts
+
+    async def call(self, label, action, *args):
+        """
+        Returns the result of `action(*args)`, or None once its failure has been charged
+        to the error budget. Raises ErrorBudgetExceeded when the budget is spent.
+        """
+        async def limited():
+            started = await self.limiter.acquire()
+            try:
+                result = await action(*args)
+            except Exception:
+                await self.limiter.release(started, ok=False)
+                raise
+            await self.limiter.release(started, ok=True)
+            return result
+
+        try:
+            return await with_retries(label, limited, attempts=self.attempts)
+        except ErrorBudgetExceeded:
+            raise
+        except ScrapeError as e:
+            self.budget.spend(label, e)
+            return None
+
+    async def run_all(self, worker, items):
+        """
+        Awaits `worker(item)` for every item at once; the workers pace themselves through `call`.
+        Once one raises (e.g. ErrorBudgetExceeded, or the run is interrupted), the rest are cancelled.
+        """
+        tasks = [asyncio.create_task(worker(item)) for item in items]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
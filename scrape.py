@@ -1,18 +1,50 @@
+import io
 import os
-import time
+import asyncio
+import hashlib
 import argparse
-from playwright.sync_api import sync_playwright
+from PIL import Image
+from playwright.async_api import async_playwright
 
-from common import accept_cookies, click_prijimacky, detect_total_questions, select_category, select_subject, wait_for_subject_selection
+from common import (TEST_URL, detect_total_questions, legacy_sleep, set_legacy_waits, wait_for_question_ready,
+                    wait_for_results_ready)
+from category_cache import remember_total
+from blob_store import adopt_output, enable_blob_store, finish_blob_store, write_output
+from checkpoint import (is_image_complete, load_manifest, missing_questions, record_question, record_results,
+                        screenshot_file)
+from corpus import Corpus
+from delta_sync import fetch_fingerprint, fingerprint, plan_sync, print_sync_report
+from image_pipeline import DEFAULT_FORMAT, IMAGE_FORMATS, ImageWriteError, ImageWriter, PngStripWriter
+from phash import DEFAULT_THRESHOLD, HashStore, hamming, phash
+from questions import CATEGORIES
+from route_cache import BLOCKABLE_CLASSES, DEFAULT_BLOCKED, StaticCache, install_routes
+from search_index import update_index
+from scheduler import ErrorBudgetExceeded, Scheduler, TransientError, WrongPageError, with_retries
+from session_cache import is_expected_category, open_category_page, read_cesta
+from text_fetch import create_session, fetch_question_text
+from tracing import enable_tracing, finish_tracing, span
+from work_queue import HEARTBEAT_SECONDS, WorkQueue, worker_id
 
-def get_test_folder_name(page):
+# Results summaries taller than this are captured in strips instead of one viewport-sized screenshot
+TILED_RESULTS_HEIGHT = 4000
+RESULTS_STRIP_HEIGHT = 1000
+
+ELEMENT_RECT_JS = """
+el => {
+    const r = el.getBoundingClientRect();
+    return {x: r.left, y: r.top, width: r.width, height: r.height, pageY: r.top + window.scrollY};
+}
+"""
+
+async def get_test_folder_name(page):
     """
     Extracts the folder name from the <p class="cesta"> element.
     Example content: "Matematika (5. ročník) / Číslo a početní operace"
     """
     try:
-        page.wait_for_selector("p.cesta", timeout=5000)
-        folder_name = page.query_selector("p.cesta").inner_text().strip()
+        await page.wait_for_selector("p.cesta", timeout=5000)
+        element = await page.query_selector("p.cesta")
+        folder_name = (await element.inner_text()).strip()
         # Sanitize the folder name by replacing "/" with " - "
         folder_name = folder_name.replace("/", " - ")
         print(f"Detected test folder name: {folder_name}")
@@ -21,45 +53,249 @@ def get_test_folder_name(page):
         print("Error detecting test folder name:", e)
         return "default_test_folder"
 
-def capture_question(page, question_url, question_number, screenshot_dir, html_dir):
-    print("Navigating to:", question_url)
-    page.goto(question_url)
-    page.wait_for_load_state("networkidle")
-    time.sleep(2)  # Extra wait if needed
+async def capture_question(page, question_url, question_number, screenshot_dir, html_dir, hashes=None,
+                           keep_unchanged=False, writer=None, expected_category=None):
+    """
+    Captures one question and returns the written outputs as {"png": path, "html": path},
+    with None for an output that failed, plus the question's content "fingerprint". Files are written atomically.
+    The screenshot's perceptual hash is recorded in `hashes`; with `keep_unchanged`, a screenshot
+    is not rewritten and "png" is listed in outputs["unchanged"] when it is byte-identical to the last
+    capture, or looks the same (pHash) while the question's text fingerprint is unchanged. The pHash
+    alone cannot see a changed digit or word in a downscaled text screenshot.
+    With a `writer`, the screenshot is encoded and written in the background and
+    outputs["pending"]["png"] is a future that resolves once it is on disk.
+    With `expected_category` (subject, category radio id), a page from another category raises
+    WrongPageError before anything is written, and a missing output raises TransientError.
+    """
+    with span("capture_question", question=question_number) as step:
+        outputs = {"png": None, "html": None, "unchanged": []}
+        print("Navigating to:", question_url)
+        await page.goto(question_url)
+        await wait_for_question_ready(page)
+        if expected_category and not is_expected_category(await read_cesta(page), *expected_category):
+            raise WrongPageError(f"Question {question_number} is not in {'/'.join(expected_category)}")
 
-    # Capture screenshot of the .container-test div
-    try:
-        element = page.query_selector("div.container-test")
-        if element:
-            screenshot_path = os.path.join(screenshot_dir, f"question_{question_number}.png")
-            element.screenshot(path=screenshot_path)
-            print(f"Saved screenshot as {screenshot_path}")
+        # Read the question text first: its fingerprint decides whether the screenshot changed
+        content = None
+        try:
+            # Adjust the selector(s) as needed to capture the question text.
+            content = await page.locator("div.citace-container, div.vypis_zadani").all_inner_texts()
+            outputs["fingerprint"] = fingerprint(await page.locator("div.vypis_zadani").all_inner_texts())
+        except Exception as e:
+            step.fail(e)
+            print(f"Error reading the text of question {question_number}:", e)
+
+        # Capture screenshot of the .container-test div
+        try:
+            element = await page.query_selector("div.container-test")
+            if element:
+                screenshot_path = os.path.join(screenshot_dir, f"question_{question_number}.png")
+                existing_path = screenshot_file(screenshot_dir, f"question_{question_number}")
+                # Captured into memory; encoding and the disk write happen off the capture path
+                data = await element.screenshot()
+                step.add_bytes(len(data))
+                previous = hashes.get(question_number) if hashes is not None else None
+                last_capture = hashes.capture(question_number) if hashes is not None else {}
+                value = await asyncio.to_thread(phash, data) if hashes is not None else None
+                digest = hashlib.sha256(data).hexdigest()
+                looks_same = previous is not None and hamming(previous, value) <= DEFAULT_THRESHOLD
+                same_text = outputs.get("fingerprint") is not None and \
+                    last_capture.get("fingerprint") == outputs["fingerprint"]
+                if (keep_unchanged and is_image_complete(existing_path)
+                        and (looks_same and same_text or last_capture.get("sha256") == digest)):
+                    outputs["unchanged"].append("png")
+                    screenshot_path = existing_path
+                    print(f"Screenshot of question {question_number} unchanged, keeping {screenshot_path}")
+                else:
+                    if keep_unchanged and looks_same:
+                        # The pHash is only used for this report
+                        print(f"Question {question_number} looks the same but its content changed, rewriting.")
+                    if writer is not None:
+                        outputs["pending"] = {"png": await writer.submit(screenshot_path, data)}
+                        screenshot_path = writer.path_for(screenshot_path)
+                        print(f"Queued screenshot for {screenshot_path}")
+                    else:
+                        write_output(screenshot_path, data)
+                        print(f"Saved screenshot as {screenshot_path}")
+                    if hashes is not None:
+                        hashes.set(question_number, value, digest, outputs.get("fingerprint"))
+                outputs["png"] = screenshot_path
+            else:
+                step.fail("div.container-test not found")
+                print(f"Element .container-test not found on question page {question_number}")
+        except Exception as e:
+            step.fail(e)
+            print(f"Error taking screenshot of .container-test on question {question_number}:", e)
+
+        # Save HTML content of the question part only.
+        # Here we extract only the parts that contain the question content.
+        try:
+            if content is None:
+                raise ValueError("the question text could not be read")
+            html_filename = os.path.join(html_dir, f"question_{question_number}.html")
+            text = "\n\n".join(content).encode("utf-8")
+            step.add_bytes(len(text))
+            write_output(html_filename, text)
+            outputs["html"] = html_filename
+            print(f"Saved question HTML to: {html_filename}")
+        except Exception as e:
+            step.fail(e)
+            print(f"Error saving HTML for question {question_number}:", e)
+        if expected_category and not (outputs["png"] and outputs["html"]):
+            raise TransientError(f"Question {question_number} was only partly captured")
+        return outputs
+
+def record_outputs(manifest, corpus, question_number, outputs):
+    """
+    Records a captured question in the checkpoint manifest and, if enabled, the corpus database.
+    Outputs listed in outputs["unchanged"] keep their existing records.
+    """
+    if manifest is None:
+        return
+    unchanged = outputs.get("unchanged", ())
+    changed = {kind: path for kind, path in outputs.items() if kind in ("png", "html") and kind not in unchanged}
+    record_question(manifest, question_number, changed, outputs.get("fingerprint"))
+    if corpus is not None and any(changed.values()):
+        text = None
+        if changed.get("html"):
+            with open(changed["html"], encoding="utf-8") as f:
+                text = f.read()
+        corpus.add_question(manifest["subject"], manifest["category"], question_number,
+                            text=text, screenshot_path=changed.get("png"))
+
+async def capture_questions_concurrently(page, base_test_url, question_numbers, screenshot_dir, html_dir,
+                                         concurrency=1, manifest=None, corpus=None, keep_unchanged=False,
+                                         writer=None, fingerprints=None):
+    """
+    Captures `question_numbers` in tabs of the page's context. All tabs share the session cookie,
+    so every tab sees the selected category. The number of questions in flight adapts between 1
+    and `concurrency` to the site's latency and errors (see scheduler.py); failed captures are
+    retried with backoff, and once the category's error budget is spent ErrorBudgetExceeded is raised.
+    The given page is reused as the first tab and stays open afterwards.
+    Each finished question is recorded in the checkpoint `manifest` and the `corpus`, if given.
+    Screenshot hashes are kept in the folder's `phash.json`. A question counts as captured
+    only once the screenshot handed to the `writer` is on disk. Writes are awaited after the
+    capture released its concurrency slot; a failed write captures the question again.
+    The manifest records the question's fingerprint from `fingerprints` (fetched by a sync), never the
+    browser's: innerText and the HTTP text differ on some markup, so only like is compared with like.
+    """
+    hashes = HashStore(screenshot_dir)
+    scheduler = Scheduler(concurrency, len(question_numbers))
+    expected_category = (manifest["subject"], manifest["category"]) if manifest is not None else None
+    idle_tabs = [page]
+    extra_tabs = []
+
+    async def capture(question_number):
+        if idle_tabs:
+            tab = idle_tabs.pop()
         else:
-            print(f"Element .container-test not found on question page {question_number}")
-    except Exception as e:
-        print(f"Error taking screenshot of .container-test on question {question_number}:", e)
+            tab = await page.context.new_page()
+            extra_tabs.append(tab)
+        try:
+            outputs = await capture_question(tab, base_test_url + str(question_number), question_number,
+                                             screenshot_dir, html_dir, hashes, keep_unchanged, writer,
+                                             expected_category)
+        except Exception:
+            # A tab that failed may be stuck mid-navigation; the next attempt gets a fresh one
+            if tab is page:
+                idle_tabs.append(tab)
+            else:
+                extra_tabs.remove(tab)
+                await tab.close()
+            raise
+        idle_tabs.append(tab)
+        return outputs
+
+    async def process(question_number):
+        label = f"Question {question_number}"
+        for _ in range(scheduler.attempts):
+            outputs = await scheduler.call(label, capture, question_number)
+            if outputs is None:
+                return
+            # Awaited outside the concurrency limit, so encoding and disk time never count as site latency
+            try:
+                for kind, written in outputs.pop("pending", {}).items():
+                    outputs[kind] = await written
+            except ImageWriteError as e:
+                hashes.forget(question_number)
+                error = e
+                print(f"{label}: writing the screenshot failed ({e}), capturing it again.")
+                continue
+            outputs["fingerprint"] = (fingerprints or {}).get(question_number)
+            record_outputs(manifest, corpus, question_number, outputs)
+            return
+        scheduler.budget.spend(label, error)
 
-    # Save HTML content of the question part only.
-    # Here we extract only the parts that contain the question content.
     try:
-        # Adjust the selector(s) as needed to capture the question text.
-        content = page.locator("div.citace-container, div.vypis_zadani").all_inner_texts()
-        html_filename = os.path.join(html_dir, f"question_{question_number}.html")
-        with open(html_filename, "w", encoding="utf-8") as f:
-            f.write("\n\n".join(content))
-        print(f"Saved question HTML to: {html_filename}")
-    except Exception as e:
-        print(f"Error saving HTML for question {question_number}:", e)
+        await scheduler.run_all(process, question_numbers)
+    finally:
+        hashes.save()
+        for tab in extra_tabs:
+            await tab.close()
+
+async def fetch_texts_over_http(page, base_test_url, question_numbers, html_dir, concurrency=1, manifest=None,
+                                corpus=None, fingerprints=None):
+    """
+    Fetches only the question texts with a pooled HTTP client that reuses the
+    browser session's cookies, instead of rendering every question page.
+    Fetches are paced, retried and budgeted like captures (see scheduler.py), so an expired
+    session aborts the category with ErrorBudgetExceeded.
+    `fingerprints` (from a sync) are recorded with the texts.
+    """
+    cookies = await page.context.cookies()
+    user_agent = await page.evaluate("navigator.userAgent")
+    session = create_session(cookies, user_agent, concurrency)
+    scheduler = Scheduler(concurrency, len(question_numbers))
+
+    async def fetch(question_number):
+        path = await scheduler.call(f"Text of question {question_number}", asyncio.to_thread, fetch_question_text,
+                                    session, base_test_url, question_number, html_dir)
+        if path:
+            record_outputs(manifest, corpus, question_number,
+                           {"html": path, "fingerprint": (fingerprints or {}).get(question_number)})
+
+    try:
+        await scheduler.run_all(fetch, question_numbers)
+    finally:
+        session.close()
+
+async def sync_question_numbers(page, base_test_url, manifest, previous_total, total, screenshot_dir, html_dir,
+                                concurrency=1):
+    """
+    Fingerprints questions 1 to `total` over HTTP with the browser session's cookies, through
+    a Scheduler like the captures. Returns the questions that are new, changed, renumbered,
+    incomplete or have no fingerprint recorded yet, and the fingerprints. Prints what changed upstream.
+    """
+    cookies = await page.context.cookies()
+    user_agent = await page.evaluate("navigator.userAgent")
+    session = create_session(cookies, user_agent, concurrency)
+    scheduler = Scheduler(concurrency, total)
+    fingerprints = {}
 
-def capture_all_questions(page, base_test_url, subject, category_radio_id,
-                          start_question, end_question, screenshot_dir, html_dir, detect_total=False):
-    # Step 4: Select subject
-    select_subject(page, subject)
-    # Step 5: Select category and submit
-    select_category(page, category_radio_id)
+    async def fetch(question_number):
+        fingerprints[question_number] = await scheduler.call(f"Fingerprint of question {question_number}",
+                                                             asyncio.to_thread, fetch_fingerprint, session,
+                                                             base_test_url, question_number)
 
+    try:
+        await scheduler.run_all(fetch, range(1, total + 1))
+    finally:
+        session.close()
+    plan = plan_sync(manifest, previous_total, total, fingerprints, screenshot_dir, html_dir)
+    print_sync_report(manifest["subject"], manifest["category"], previous_total, total, plan)
+    return plan["capture"], fingerprints
+
+async def capture_all_questions(page, base_test_url, start_question, end_question,
+                                screenshot_dir, html_dir, detect_total=False, concurrency=1,
+                                manifest=None, resume=False, text_only=False, corpus=None, keep_unchanged=False,
+                                writer=None, category_total=None, sync=False):
+    """
+    Captures questions `start_question` to `end_question` of the category open in `page`.
+    `category_total` is the category's question count when the range is only part of it (work-queue shards).
+    With `sync`, only questions that changed upstream since the last capture are captured.
+    """
     # Detect test folder name and update output directories
-    test_folder = get_test_folder_name(page)
+    test_folder = await get_test_folder_name(page)
     new_screenshot_dir = os.path.join(screenshot_dir, test_folder)
     new_html_dir = os.path.join(html_dir, test_folder)
     os.makedirs(new_screenshot_dir, exist_ok=True)
@@ -67,110 +303,370 @@ def capture_all_questions(page, base_test_url, subject, category_radio_id,
 
     # Optionally detect total questions from the page
     if detect_total:
-        detected_total = detect_total_questions(page)
+        detected_total = await detect_total_questions(page)
+        if manifest is not None:
+            remember_total(manifest["subject"], manifest["category"], detected_total)
         if detected_total is not None:
             end_question = detected_total
+        elif sync:
+            # Planned against a guessed total, later questions would count as removed upstream
+            raise TransientError("Could not detect the total number of questions, which a sync needs.")
         else:
             print("Falling back to provided end_question value.")
 
+    question_numbers = list(range(start_question, end_question + 1))
+    fingerprints = None
+    if manifest is not None:
+        previous_total = manifest.get("total")
+        manifest["folder"] = test_folder
+        manifest["total"] = category_total or end_question
+        if corpus is not None:
+            corpus.add_category(manifest["subject"], manifest["category"], test_folder, manifest["total"])
+        if resume:
+            kinds = ("html",) if text_only else ("png", "html")
+            question_numbers = missing_questions(manifest, question_numbers, new_screenshot_dir, new_html_dir, kinds)
+            print(f"Resuming: {end_question - start_question + 1 - len(question_numbers)} questions already captured.")
+        elif sync:
+            question_numbers, fingerprints = await sync_question_numbers(page, base_test_url, manifest, previous_total,
+                                                           end_question, new_screenshot_dir, new_html_dir, concurrency)
+
+    if text_only:
+        print(f"Fetching texts of questions {start_question} to {end_question} over HTTP.")
+        await fetch_texts_over_http(page, base_test_url, question_numbers, new_html_dir, concurrency, manifest,
+                                    corpus, fingerprints)
+        return test_folder
+
     print(f"Capturing questions from {start_question} to {end_question}.")
-    time.sleep(100)
-    # Step 6: Loop over questions and capture content
-    for i in range(start_question, end_question + 1):
-        question_url = base_test_url + str(i)
-        capture_question(page, question_url, i, new_screenshot_dir, new_html_dir)
+    await legacy_sleep(100)
+    # Step 6: Capture questions, several tabs at a time
+    await capture_questions_concurrently(page, base_test_url, question_numbers,
+                                         new_screenshot_dir, new_html_dir, concurrency, manifest, corpus,
+                                         keep_unchanged, writer, fingerprints)
     return test_folder  # Return the folder name for later use
 
-def show_results(page):
+async def show_results(page):
     # Click the "ukončit" link
     try:
-        page.click("a.odkaz.ukoncit", timeout=10000)
+        await page.click("a.odkaz.ukoncit", timeout=10000)
         print("Clicked on 'ukončit' button.")
     except Exception as e:
         print("Failed to click on 'ukončit' button:", e)
 
     # Wait for the popup to appear
     try:
-        page.wait_for_selector("div.vyskakovaci-okno", timeout=10000)
+        await page.wait_for_selector("div.vyskakovaci-okno", timeout=10000)
         print("Popup appeared.")
     except Exception as e:
         print("Popup did not appear:", e)
 
     # Click the "Ano" button within the popup
     try:
-        page.click("button.opravit-button", timeout=10000)
+        await page.click("button.opravit-button", timeout=10000)
         print("Clicked 'Ano' in popup.")
     except Exception as e:
         print("Failed to click 'Ano' button in popup:", e)
 
-    # Wait for the results container to appear
+    # Wait for the results container and its images to render
+    if await wait_for_results_ready(page):
+        print("Results container is ready.")
+
+async def capture_results_tiled(page, element, output_path, strip_height=RESULTS_STRIP_HEIGHT):
+    """
+    Captures a tall element by scrolling it through the viewport strip by strip and
+    streaming each strip into the PNG, so memory use does not grow with its height.
+    """
+    rect = await element.evaluate(ELEMENT_RECT_JS)
+    strip_height = min(strip_height, page.viewport_size["height"])
+    png = None
+    offset = 0
     try:
-        page.wait_for_selector("div.shrnuti-width", timeout=10000)
-        print("Results container is visible.")
-    except Exception as e:
-        print("Results container did not appear:", e)
+        while offset < rect["height"]:
+            await page.evaluate("y => window.scrollTo(0, y)", rect["pageY"] + offset)
+            # Near the end of the page the scroll position is clamped, so read where the element really is
+            current = await element.evaluate(ELEMENT_RECT_JS)
+            clip = {"x": current["x"], "y": current["y"] + offset, "width": current["width"],
+                    "height": min(strip_height, rect["height"] - offset)}
+            strip = Image.open(io.BytesIO(await page.screenshot(clip=clip)))
+            if png is None:
+                png = PngStripWriter(output_path, strip.width)
+            await asyncio.to_thread(png.add_strip, strip)
+            offset += clip["height"]
+    except Exception:
+        if png is not None:
+            png.abort()
+        raise
+    await asyncio.to_thread(png.close)
+    await asyncio.to_thread(adopt_output, output_path)
+    print(f"Saved tiled results screenshot as {output_path} ({png.height} px tall)")
 
-def capture_results(page, output_path):
+async def capture_results(page, output_path, writer=None):
     """
     Captures a full screenshot of the results container (<div class="shrnuti-width">)
-    by temporarily resizing the viewport.
+    by temporarily resizing the viewport. With a `writer`, it is encoded and written in the background.
+    Summaries taller than TILED_RESULTS_HEIGHT are captured in strips and always written as PNG.
+    Returns the written path, a future resolving to it (with a `writer`), or None on failure.
     """
+    written = None
     try:
-        element = page.query_selector("div.shrnuti-width")
+        element = await page.query_selector("div.shrnuti-width")
         if element:
-            bounding_box = element.bounding_box()
-            if bounding_box:
+            bounding_box = await element.bounding_box()
+            if bounding_box and bounding_box["height"] > TILED_RESULTS_HEIGHT:
+                await capture_results_tiled(page, element, output_path)
+                written = output_path
+            elif bounding_box:
                 # Save the original viewport size.
                 original_viewport = page.viewport_size
                 new_width = int(bounding_box["width"])
                 new_height = int(bounding_box["height"])
-                page.set_viewport_size({"width": new_width, "height": new_height})
-                
-                element.screenshot(path=output_path)
-                print(f"Saved full results screenshot as {output_path}")
-                
+                await page.set_viewport_size({"width": new_width, "height": new_height})
+
+                data = await element.screenshot()
+                if writer is not None:
+                    written = await writer.submit(output_path, data)
+                    print(f"Queued full results screenshot for {writer.path_for(output_path)}")
+                else:
+                    write_output(output_path, data)
+                    written = output_path
+                    print(f"Saved full results screenshot as {output_path}")
+
                 # Restore the original viewport.
-                page.set_viewport_size(original_viewport)
+                await page.set_viewport_size(original_viewport)
             else:
                 print("Could not determine bounding box for results container.")
         else:
             print("Results container not found.")
     except Exception as e:
         print("Error capturing results screenshot:", e)
+    return written
 
-def main(subject, category_radio_id, start_question, end_question,
-         screenshot_dir, html_dir, detect_total):
-    base_test_url = "https://tau.cermat.cz/test-kategorie.php?poradi_ulohy="
+async def scrape_category(browser, subject, category_radio_id, start_question, end_question,
+                          screenshot_dir, html_dir, detect_total, concurrency=1, use_session_cache=True,
+                          resume=False, prepare_context=None, text_only=False, corpus=None, keep_unchanged=False,
+                          writer=None, category_total=None, with_results=True, sync=False):
+    """
+    Runs the whole flow for one category inside its own isolated browser context,
+    so several categories can share a single browser process.
+    A work-queue shard passes its category's `category_total`, and only the last shard
+    of a category captures the results page (`with_results`).
+    """
+    async def open_category():
+        context, page = await open_category_page(browser, subject, category_radio_id, use_session_cache,
+                                                 prepare_context, viewport={'width': 2000, 'height': 2000})
+        # A step that timed out would otherwise leave us capturing the wrong page
+        if not is_expected_category(await read_cesta(page), subject, category_radio_id):
+            await context.close()
+            raise WrongPageError(f"Navigation did not reach {subject}/{category_radio_id}")
+        return context, page
+
+    # Steps 1-5: Reach the category, from a saved session snapshot when possible, retrying with backoff.
+    # The context gets a large viewport (simulating a maximized window).
+    context, page = await with_retries(f"Navigation to {subject}/{category_radio_id}", open_category)
+    try:
+        # Step 6: Process questions (with optional detection of total questions)
+        manifest = load_manifest(subject, category_radio_id)
+        test_folder = await capture_all_questions(page, TEST_URL, start_question, end_question,
+                                                  screenshot_dir, html_dir, detect_total, concurrency,
+                                                  manifest, resume, text_only, corpus, keep_unchanged, writer,
+                                                  category_total, sync)
+        if text_only or not with_results:
+            # Screenshots and the results page are left to a later run with --resume.
+            return test_folder
+
+        # Now, show results by clicking through the confirmation popup.
+        with span("show_results"):
+            await show_results(page)
+
+        # Capture the full results screenshot in the same test folder as questions.
+        results_output = os.path.join(screenshot_dir, test_folder, "results.png")
+        with span("capture_results"):
+            written = await capture_results(page, results_output, writer)
+        # Recorded so the blob store keeps the results object and `blob_store.py checkout` can restore it
+        if isinstance(written, asyncio.Future):
+            written.add_done_callback(lambda future: record_results(manifest, None if future.exception()
+                                                                    else future.result()))
+        else:
+            record_results(manifest, written)
+        return test_folder
+    finally:
+        await context.close()
+
+async def scrape_categories(categories, start_question, end_question, screenshot_dir, html_dir,
+                            detect_total, pool_size=1, headless=False, concurrency=1, use_session_cache=True,
+                            resume=False, blocked_classes=DEFAULT_BLOCKED, use_http_cache=True, text_only=False,
+                            corpus_path=None, keep_unchanged=False, image_format=DEFAULT_FORMAT,
+                            quality=None, sync=False):
+    """
+    Scrapes every category in `categories` (items shaped like `questions.CATEGORIES`)
+    on one shared Chromium. At most `pool_size` contexts are open at the same time,
+    each fetching up to `concurrency` questions at once. All contexts share one
+    static asset cache and skip the blocked resource classes.
+    Captured questions are also written to the corpus database at `corpus_path`, if given.
+    Screenshots are encoded to `image_format` in a process pool while capturing continues.
+    With `sync`, each category only captures what changed since its last capture.
+    """
+    cache = StaticCache() if use_http_cache else None
+    corpus = Corpus(corpus_path) if corpus_path else None
+
+    async def prepare_context(context):
+        await install_routes(context, cache, blocked_classes)
 
-    with sync_playwright() as p:
+    async with async_playwright() as p:
         # Launch the browser; set headless=True if you do not need the UI.
-        browser = p.chromium.launch(headless=False)
-        # Create a browser context with a large viewport (simulating a maximized window)
-        context = browser.new_context(viewport={'width': 2000, 'height': 2000})
-        page = context.new_page()
+        browser = await p.chromium.launch(headless=headless)
+        writer = ImageWriter(image_format, quality)
+        semaphore = asyncio.Semaphore(pool_size)
 
-        # Step 1: Open Homepage and Accept Cookies
-        page.goto("https://tau.cermat.cz/")
-        accept_cookies(page)
+        async def run(item):
+            async with semaphore:
+                print(f"Starting category {item['subject']}/{item['category']}.")
+                try:
+                    with span("scrape_category", subject=item["subject"], category=item["category"]):
+                        return await scrape_category(browser, item["subject"], item["category"],
+                                                     start_question, end_question, screenshot_dir, html_dir,
+                                                     detect_total, concurrency, use_session_cache, resume,
+                                                     prepare_context, text_only, corpus, keep_unchanged, writer,
+                                                     None, True, sync)
+                except ErrorBudgetExceeded as e:
+                    print(f"Aborted category {item['subject']}/{item['category']}, error budget spent ({e}). "
+                          "Finished questions are kept; re-run with --resume.")
+                    return None
+                except Exception as e:
+                    print(f"Scraping category {item['subject']}/{item['category']} failed:", e)
+                    return None
 
-        # Step 2: Click on the PŘIJÍMAČKY Button
-        click_prijimacky(page)
+        results = await asyncio.gather(*(run(item) for item in categories))
+        await browser.close()
+        await writer.close()
+        if cache is not None:
+            cache.flush()
+        if corpus is not None:
+            corpus.close()
+        return results
 
-        # Step 3: Wait for subject selection page to load
-        wait_for_subject_selection(page)
+async def detect_category_total(browser, subject, category_radio_id, use_session_cache=True, prepare_context=None):
+    """ Opens the category just to read its total number of questions (saving a session snapshot on the way). """
+    context, page = await open_category_page(browser, subject, category_radio_id, use_session_cache,
+                                             prepare_context)
+    try:
+        total = await detect_total_questions(page)
+        remember_total(subject, category_radio_id, total)
+        return total
+    finally:
+        await context.close()
 
-        # Steps 4-6: Process questions (with optional detection of total questions)
-        test_folder = capture_all_questions(page, base_test_url, subject, category_radio_id,
-                                            start_question, end_question, screenshot_dir, html_dir, detect_total)
+async def scrape_shards(queue_path, screenshot_dir, html_dir, pool_size=1, headless=False, concurrency=1,
+                        use_session_cache=True, blocked_classes=DEFAULT_BLOCKED, use_http_cache=True,
+                        text_only=False, corpus_path=None, keep_unchanged=False, image_format=DEFAULT_FORMAT,
+                        quality=None):
+    """
+    Runs as one worker of the shared work queue at `queue_path` (see work_queue.py): claims
+    (category, question range) shards, up to `pool_size` at a time, and captures them like
+    `scrape_categories` would, keeping their leases alive while they run. Shards are captured
+    with --resume semantics, so a shard re-queued after a lost worker only redoes what is missing.
+    Queue calls run in threads: a busy database (up to its 60 s lock timeout) must not stall the captures.
+    Returns once no shard is queued or leased any more.
+    """
+    queue = WorkQueue(queue_path)
+    worker = worker_id()
+    cache = StaticCache() if use_http_cache else None
+    corpus = Corpus(corpus_path) if corpus_path else None
 
-        # Now, show results by clicking through the confirmation popup.
-        show_results(page)
+    async def prepare_context(context):
+        await install_routes(context, cache, blocked_classes)
 
-        # Capture the full results screenshot in the same test folder as questions.
-        results_output = os.path.join(screenshot_dir, test_folder, "results.png")
-        capture_results(page, results_output)
-        
-        browser.close()
+    async def keep_leased(shard):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            if not await asyncio.to_thread(queue.heartbeat, shard, worker):
+                print(f"Lost the lease on {shard['subject']}/{shard['category']} "
+                      f"{shard['start_question']}-{shard['end_question']}, finishing it anyway.")
+                return
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        writer = ImageWriter(image_format, quality)
+
+        async def run(shard):
+            subject, category_radio_id = shard["subject"], shard["category"]
+            if shard["end_question"] is None:
+                total = await detect_category_total(browser, subject, category_radio_id, use_session_cache,
+                                                    prepare_context)
+                if total is None:
+                    raise TransientError(f"Could not detect the total of {subject}/{category_radio_id}")
+                shard = await asyncio.to_thread(queue.split, shard, worker, total)
+            total = await asyncio.to_thread(queue.category_total, shard)
+            print(f"Starting shard {subject}/{category_radio_id} {shard['start_question']}-{shard['end_question']}.")
+            with span("scrape_shard", subject=subject, category=category_radio_id, start=shard["start_question"]):
+                await scrape_category(browser, subject, category_radio_id, shard["start_question"],
+                                      shard["end_question"], screenshot_dir, html_dir, False, concurrency,
+                                      use_session_cache, True, prepare_context, text_only, corpus, keep_unchanged,
+                                      writer, total, shard["end_question"] == total)
+            return shard
+
+        async def slot():
+            while True:
+                shard = await asyncio.to_thread(queue.claim, worker)
+                if shard is None:
+                    if not await asyncio.to_thread(queue.has_unfinished):
+                        return
+                    # Other workers still hold leases; one of them may expire and come back
+                    await asyncio.sleep(HEARTBEAT_SECONDS)
+                    continue
+                heartbeat = asyncio.create_task(keep_leased(shard))
+                try:
+                    shard = await run(shard)
+                    await asyncio.to_thread(queue.complete, shard, worker)
+                except Exception as e:
+                    print(f"Shard {shard['subject']}/{shard['category']} from {shard['start_question']} failed:", e)
+                    await asyncio.to_thread(queue.fail, shard, worker, e)
+                finally:
+                    heartbeat.cancel()
+
+        await asyncio.gather(*(slot() for _ in range(pool_size)))
+        await browser.close()
+        await writer.close()
+        if cache is not None:
+            cache.flush()
+        if corpus is not None:
+            corpus.close()
+        queue.print_status()
+        queue.close()
+
+def main(subject, category_radio_id, start_question, end_question,
+         screenshot_dir, html_dir, detect_total, all_categories=False, pool_size=1, headless=False,
+         concurrency=1, use_session_cache=True, resume=False, blocked_classes=DEFAULT_BLOCKED, use_http_cache=True,
+         text_only=False, corpus_path=None, search_index=False, keep_unchanged=False, image_format=DEFAULT_FORMAT,
+         quality=None, trace=None, queue_path=None, sync=False, blob_dir=None):
+    if all_categories or sync:
+        # Every category has a different length, and a sync compares against the current total.
+        detect_total = True
+    if all_categories:
+        categories = CATEGORIES
+    else:
+        categories = [{"subject": subject, "category": category_radio_id}]
+
+    if trace:
+        enable_tracing(trace)
+    if blob_dir:
+        enable_blob_store(blob_dir)
+    try:
+        if queue_path:
+            asyncio.run(scrape_shards(queue_path, screenshot_dir, html_dir, pool_size, headless, concurrency,
+                                      use_session_cache, blocked_classes, use_http_cache, text_only,
+                                      corpus_path, keep_unchanged, image_format, quality))
+        else:
+            asyncio.run(scrape_categories(categories, start_question, end_question, screenshot_dir, html_dir,
+                                          detect_total, pool_size, headless, concurrency, use_session_cache,
+                                          resume, blocked_classes, use_http_cache, text_only,
+                                          corpus_path, keep_unchanged, image_format, quality, sync))
+    finally:
+        # Per-step p50/p95 summary, plus the JSONL and Chrome trace files
+        finish_tracing()
+        finish_blob_store()
+    if search_index:
+        # Only the question texts that changed since the last update are re-read
+        update_index(html_dir)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -184,7 +680,60 @@ if __name__ == "__main__":
                         help="Last question number to capture (default: 10). Ignored if --detect-total is used.")
     parser.add_argument("--detect-total", action="store_true",
                         help="Detect the total number of questions from the page instead of using --end_question.")
+    parser.add_argument("--all", action="store_true",
+                        help="Scrape every category from questions.CATEGORIES on one shared browser (implies --detect-total).")
+    parser.add_argument("--pool-size", type=int, default=4,
+                        help="Number of categories (or --queue shards) scraped at the same time, "
+                             "one browser context each (default: 4).")
+    parser.add_argument("--queue", type=str, default=None, metavar="PATH",
+                        help="Run as a worker of the shared work queue at PATH (filled with work_queue.py enqueue) "
+                             "instead of scraping --subject/--category or --all. Start as many workers as you like; "
+                             "workers on several machines need a filesystem with working locks and synced clocks.")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Maximum number of question tabs fetched at the same time per category; the actual "
+                             "number adapts to the site's latency and errors (default: 8).")
+    parser.add_argument("--no-session-cache", action="store_true",
+                        help="Always run the full navigation instead of reusing a saved session snapshot.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip questions whose screenshot and text were already captured completely.")
+    parser.add_argument("--sync", action="store_true",
+                        help="Capture only questions that are new, changed or renumbered upstream since the last "
+                             "capture, judged by the detected total and a fingerprint of each question's text "
+                             "fetched over HTTP (implies --detect-total). Numbering shifts are reported.")
+    parser.add_argument("--text-only", action="store_true",
+                        help="Fetch only the question texts over HTTP with the browser's session cookies. "
+                             "Screenshots can be added later by re-running with --resume.")
+    parser.add_argument("--corpus", type=str, default=None,
+                        help="Also record every captured question in this SQLite corpus database (e.g. corpus.db).")
+    parser.add_argument("--search-index", action="store_true",
+                        help="Update the full-text search index (search_index.py) after scraping.")
+    parser.add_argument("--keep-unchanged", action="store_true",
+                        help="Keep existing screenshots when the new capture is byte-identical, or looks the same "
+                             "(perceptual hash) and the question text is unchanged, so unchanged questions are not "
+                             "rewritten or re-recorded.")
+    parser.add_argument("--image-format", type=str, default=DEFAULT_FORMAT, choices=sorted(IMAGE_FORMATS),
+                        help=f"Format the screenshots are written in (default: {DEFAULT_FORMAT}; lossless webp "
+                             "where Pillow supports it, else optimized png). Lossless webp is many times smaller "
+                             "for text-heavy questions.")
+    parser.add_argument("--quality", type=int, default=None,
+                        help="Lossy quality 0-100 for webp and avif (default: lossless webp, avif at 60).")
+    parser.add_argument("--blob-store", type=str, default=None, metavar="DIR",
+                        help="Write screenshots and texts once into the content-addressed store DIR (e.g. blobs) "
+                             "and hard-link the output files to it; see blob_store.py for gc, import and checkout.")
+    parser.add_argument("--block", nargs="*", default=DEFAULT_BLOCKED, choices=sorted(BLOCKABLE_CLASSES),
+                        help=f"Resource classes to block (default: {' '.join(DEFAULT_BLOCKED)}). Pass no value to block nothing.")
+    parser.add_argument("--no-http-cache", action="store_true",
+                        help="Do not serve static assets from the on-disk cache.")
+    parser.add_argument("--legacy-waits", action="store_true",
+                        help="Use the old fixed sleeps and networkidle waits instead of the readiness checks.")
+    parser.add_argument("--trace", type=str, default=None, metavar="PREFIX",
+                        help="Record timing spans to PREFIX.jsonl and PREFIX.trace.json (chrome://tracing) "
+                             "and print a per-step summary.")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run the browser without a visible window.")
     args = parser.parse_args()
+    if args.sync and args.resume:
+        parser.error("--sync and --resume cannot be combined: --sync already recaptures missing or incomplete files.")
 
     # Configuration
     subject = args.subject
@@ -192,10 +741,16 @@ if __name__ == "__main__":
     start_question = 1
     end_question = args.end_question
 
+    set_legacy_waits(args.legacy_waits)
+
     # Base output directories
     screenshot_dir = "screenshots"
     html_dir = "html_pages"
     os.makedirs(screenshot_dir, exist_ok=True)
     os.makedirs(html_dir, exist_ok=True)
 
-    main(subject, category_radio_id, start_question, end_question, screenshot_dir, html_dir, args.detect_total)
+    main(subject, category_radio_id, start_question, end_question, screenshot_dir, html_dir,
+         args.detect_total, args.all, args.pool_size, args.headless, args.concurrency,
+         not args.no_session_cache, args.resume, args.block, not args.no_http_cache,
+         args.text_only, args.corpus, args.search_index, args.keep_unchanged, args.image_format, args.quality,
+         args.trace, args.queue, args.sync, args.blob_store)
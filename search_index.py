@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import time
+import zlib
+import struct
+import argparse
+import unicodedata
+from collections import Counter
+
+from corpus import category_for_folder
+
+SEARCH_INDEX_FILE = "search_index.bin"
+# Files of an older layout are rebuilt by the next update
+INDEX_MAGIC = b"SIX2"
+
+WORD = re.compile(r"\w+")
+# Czech case and number endings (after diacritic folding), longest first
+SUFFIXES = sorted([
+    "atech", "atum", "etem", "ovat", "emi", "ami", "ata", "aty", "ech", "eho", "emu", "ich", "iho", "imi", "imu",
+    "ove", "ovi", "ych", "ymi", "ach", "ani", "eni", "ou", "em", "es", "ho", "im", "mi", "mu", "om", "os", "ov",
+    "um", "us", "ym", "a", "e", "i", "o", "u", "y",
+], key=len, reverse=True)
+MIN_STEM = 3
+
+def fold(text):
+    """ Lowercase and strip diacritics: "Příliš žluťoučký" -> "prilis zlutoucky". """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+def stem(word):
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+def tokenize(text):
+    return [stem(word) for word in WORD.findall(fold(text))]
+
+# --------------------------
+# Index
+# --------------------------
+
+class SearchIndex:
+    """
+    Inverted index over the question texts in `html_pages/<folder>/question_N.html`.
+    Documents are keyed by path and remember (mtime, size) so `update` only re-reads changed files.
+    Postings hold each term's frequency in the document and documents their length in terms, so
+    hits are scored without re-reading texts; snippets come from the question files themselves.
+    On disk: INDEX_MAGIC, the length of a zlib-compressed JSON header (documents and the offset of
+    every term's posting list), then the separately compressed posting lists. A search reads
+    the header and only the posting lists of its own terms.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.docs = {}       # doc id -> {"path", "subject", "category", "question", "mtime", "size", "length"}
+        self.doc_ids = {}    # path -> doc id
+        self.postings = {}   # term -> {doc id: term frequency}, decoded on first use (see `posting`)
+        self.offsets = {}    # term -> (offset, length) of its posting list in the file, until decoded
+        self.next_id = 0
+
+    @classmethod
+    def load(cls, path=SEARCH_INDEX_FILE):
+        index = cls(path)
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                    return cls()
+                header_length, = struct.unpack("<I", f.read(4))
+                header = json.loads(zlib.decompress(f.read(header_length)))
+        except (OSError, ValueError, struct.error, zlib.error):
+            return cls()
+        index.docs = {int(doc_id): doc for doc_id, doc in header["docs"].items()}
+        index.doc_ids = {doc["path"]: doc_id for doc_id, doc in index.docs.items()}
+        body = len(INDEX_MAGIC) + 4 + header_length
+        index.offsets = {term: (body + offset, length) for term, (offset, length) in header["terms"].items()}
+        index.next_id = header["next_id"]
+        return index
+
+    def read_postings(self, terms):
+        """ Decodes the posting lists of `terms` that are still only in the file. """
+        pending = sorted((self.offsets.pop(term), term) for term in terms if term in self.offsets)
+        if not pending:
+            return
+        with open(self.path, "rb") as f:
+            for (offset, length), term in pending:
+                f.seek(offset)
+                self.postings[term] = decode_posting(zlib.decompress(f.read(length)).decode("ascii"))
+
+    def save(self, path=SEARCH_INDEX_FILE):
+        self.read_postings(list(self.offsets))
+        terms, chunks, offset = {}, [], 0
+        for term, entries in self.postings.items():
+            chunk = zlib.compress(encode_posting(entries).encode("ascii"), 6)
+            terms[term] = (offset, len(chunk))
+            chunks.append(chunk)
+            offset += len(chunk)
+        header = zlib.compress(json.dumps({"next_id": self.next_id, "docs": self.docs, "terms": terms},
+                                          ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(INDEX_MAGIC + struct.pack("<I", len(header)) + header)
+            f.writelines(chunks)
+        os.replace(tmp_path, path)
+        self.path = path
+
+    def remove_many(self, paths):
+        """ Drops the documents at `paths`, in one pass over the posting lists. """
+        removed = {self.doc_ids.pop(path) for path in paths if path in self.doc_ids}
+        if not removed:
+            return
+        for doc_id in removed:
+            del self.docs[doc_id]
+        self.read_postings(list(self.offsets))
+        for term in list(self.postings):
+            entries = self.postings[term]
+            for doc_id in removed & entries.keys():
+                del entries[doc_id]
+            if not entries:
+                del self.postings[term]
+
+    def remove(self, path):
+        self.remove_many([path])
+
+    def add(self, path, subject, category_radio_id, question_number, text, mtime=None, size=None):
+        self.remove(path)
+        self.insert(path, subject, category_radio_id, question_number, text, mtime, size)
+
+    def insert(self, path, subject, category_radio_id, question_number, text, mtime=None, size=None):
+        """ Adds a document whose path is not indexed yet. """
+        doc_id = self.next_id
+        self.next_id += 1
+        tokens = tokenize(text)
+        self.docs[doc_id] = {"path": path, "subject": subject, "category": category_radio_id,
+                             "question": question_number, "mtime": mtime, "size": size, "length": len(tokens)}
+        self.doc_ids[path] = doc_id
+        counts = Counter(tokens)
+        self.read_postings(counts)
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+    def update(self, html_dir="html_pages"):
+        """ Indexes new and changed question files and drops deleted ones. Returns (added, removed). """
+        seen = set()
+        changed = []
+        if os.path.isdir(html_dir):
+            for folder in sorted(os.listdir(html_dir)):
+                folder_path = os.path.join(html_dir, folder)
+                item = category_for_folder(folder)
+                if item is None or not os.path.isdir(folder_path):
+                    continue
+                for filename in os.listdir(folder_path):
+                    match = re.match(r"^question_(\d+)\.html$", filename)
+                    if not match:
+                        continue
+                    path = os.path.join(folder_path, filename)
+                    seen.add(path)
+                    stat = os.stat(path)
+                    doc_id = self.doc_ids.get(path)
+                    if doc_id is not None and (self.docs[doc_id]["mtime"], self.docs[doc_id]["size"]) == (stat.st_mtime, stat.st_size):
+                        continue
+                    changed.append((path, item, int(match.group(1)), stat))
+        removed = [path for path in self.doc_ids if path not in seen]
+        self.remove_many(removed + [path for path, _, _, _ in changed])
+        for path, item, question_number, stat in changed:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            self.insert(path, item["subject"], item["category"], question_number, text, stat.st_mtime, stat.st_size)
+        return len(changed), len(removed)
+
+    def search(self, query, limit=20):
+        """ Returns hits for documents containing every query term, best matches first. """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        self.read_postings(terms)
+        postings = sorted((self.postings.get(term, {}) for term in terms), key=len)
+        candidates = set(postings[0])
+        for entries in postings[1:]:
+            candidates.intersection_update(entries)
+        if not candidates:
+            return []
+        hits = []
+        for doc_id in candidates:
+            doc = self.docs[doc_id]
+            score = sum(entries[doc_id] for entries in postings) / (1 + doc["length"]) ** 0.5
+            hits.append((score, doc))
+        hits.sort(key=lambda hit: (-hit[0], hit[1]["subject"], hit[1]["category"], hit[1]["question"]))
+        return [{"subject": doc["subject"], "category": doc["category"], "question": doc["question"],
+                 "score": round(score, 3), "snippet": snippet(read_text(doc["path"]), terms)}
+                for score, doc in hits[:limit]]
+
+def encode_posting(entries):
+    """ "delta:frequency" pairs of the sorted doc ids, e.g. {3: 1, 7: 2} -> "3:1 4:2". """
+    pairs, previous = [], 0
+    for doc_id in sorted(entries):
+        pairs.append(f"{doc_id - previous}:{entries[doc_id]}")
+        previous = doc_id
+    return " ".join(pairs)
+
+def decode_posting(encoded):
+    entries, current = {}, 0
+    for pair in encoded.split():
+        delta, count = pair.split(":")
+        current += int(delta)
+        entries[current] = int(count)
+    return entries
+
+def read_text(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+def snippet(text, terms, width=60):
+    """ A single-line excerpt around the first word of `text` matching one of the (normalized) terms. """
+    for match in WORD.finditer(text):
+        if stem(fold(match.group())) in terms:
+            start = max(0, match.start() - width)
+            end = min(len(text), match.end() + width)
+            excerpt = " ".join(text[start:end].split())
+            return ("…" if start > 0 else "") + excerpt + ("…" if end < len(text) else "")
+    return " ".join(text[:2 * width].split())
+
+def update_index(html_dir="html_pages", path=SEARCH_INDEX_FILE):
+    index = SearchIndex.load(path)
+    added, removed = index.update(html_dir)
+    if added or removed:
+        index.save(path)
+    print(f"Search index: {added} questions (re)indexed, {removed} removed, {len(index.docs)} total.")
+    return index
+
+if __name__ == "__main__":
+    from questions import CATEGORIES
+
+    parser = argparse.ArgumentParser(description="Full-text search over the scraped question texts.")
+    parser.add_argument("--index", type=str, default=SEARCH_INDEX_FILE, help=f"Index file (default: {SEARCH_INDEX_FILE}).")
+    parser.add_argument("--html-dir", type=str, default="html_pages")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("update", help="Index new and changed question texts.")
+    search_parser = subparsers.add_parser("search", help="Search the index.")
+    search_parser.add_argument("query", type=str)
+    search_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "update":
+        update_index(args.html_dir, args.index)
+    else:
+        started = time.perf_counter()
+        index = SearchIndex.load(args.index)
+        hits = index.search(args.query, args.limit)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        names = {(item["subject"], item["category"]): item["name"] for item in CATEGORIES}
+        for hit in hits:
+            name = names.get((hit["subject"], hit["category"]), hit["category"])
+            print(f"{name} #{hit['question']}: {hit['snippet']}")
+        print(f"{len(hits)} hits in {elapsed_ms:.1f} ms.")
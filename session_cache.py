@@ -0,0 +1,119 @@
+import os
+import json
+import time
+
+from common import TEST_URL, navigate_to_category
+from tracing import span
+from questions import CATEGORIES
+
+# Directory holding one Playwright storage state per (subject, category radio id)
+SESSION_CACHE_DIR = ".session_cache"
+# Snapshots older than this are not even tried
+SESSION_MAX_AGE = 6 * 60 * 60
+
+def snapshot_path(subject, category_radio_id):
+    return os.path.join(SESSION_CACHE_DIR, f"{subject}_{category_radio_id}.json")
+
+def load_snapshot(subject, category_radio_id, max_age=SESSION_MAX_AGE):
+    """ Returns the path of a usable snapshot, or None if there is none or it is too old. """
+    path = snapshot_path(subject, category_radio_id)
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except OSError:
+        return None
+    if age > max_age:
+        print(f"Session snapshot {path} is {int(age)} s old, ignoring it.")
+        return None
+    return path
+
+def write_snapshot(state, subject, category_radio_id):
+    """ Writes the storage state atomically so a killed run never leaves half a file. """
+    os.makedirs(SESSION_CACHE_DIR, exist_ok=True)
+    path = snapshot_path(subject, category_radio_id)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+    print(f"Saved session snapshot to {path}")
+
+def drop_snapshot(subject, category_radio_id):
+    try:
+        os.remove(snapshot_path(subject, category_radio_id))
+    except OSError:
+        pass
+
+def is_expected_category(cesta_text, subject, category_radio_id):
+    """
+    Checks the <p class="cesta"> breadcrumb of a question page against `CATEGORIES`.
+    Example content: "Matematika (5. ročník) / Číslo a početní operace"
+    """
+    if not cesta_text:
+        return False
+    for item in CATEGORIES:
+        if item["subject"] == subject and item["category"] == category_radio_id:
+            return cesta_text.strip().endswith(item["name"])
+    # Unknown category, the breadcrumb being there is all we can check.
+    return True
+
+# --------------------------
+# Category pages
+# --------------------------
+
+async def read_cesta(page):
+    try:
+        await page.wait_for_selector("p.cesta", timeout=3000)
+        element = await page.query_selector("p.cesta")
+        return await element.inner_text()
+    except Exception:
+        return None
+
+async def new_category_context(browser, subject, category_radio_id, use_cache=True, prepare_context=None,
+                               **context_options):
+    """
+    Creates a context preloaded with the category's session snapshot, if there is one.
+    Returns (context, from_snapshot). `prepare_context` is called before any page opens.
+    """
+    snapshot = load_snapshot(subject, category_radio_id) if use_cache else None
+    if snapshot:
+        context = await browser.new_context(storage_state=snapshot, **context_options)
+    else:
+        context = await browser.new_context(**context_options)
+    if prepare_context:
+        await prepare_context(context)
+    return context, snapshot is not None
+
+async def ensure_category(context, page, subject, category_radio_id, from_snapshot):
+    """
+    Puts `page` on question 1 of the category. A snapshot session is checked first;
+    if it is stale, or there was none, the full navigation from `common.py` runs
+    and a new snapshot is saved. Returns True if the full navigation was needed.
+    """
+    with span("ensure_category", subject=subject, category=category_radio_id, from_snapshot=from_snapshot) as step:
+        if from_snapshot:
+            await page.goto(TEST_URL + "1")
+            if is_expected_category(await read_cesta(page), subject, category_radio_id):
+                print(f"Reused session snapshot for {subject}/{category_radio_id}.")
+                return False
+            print(f"Session snapshot for {subject}/{category_radio_id} is stale, navigating again.")
+            step.retry()
+            drop_snapshot(subject, category_radio_id)
+            await context.clear_cookies()
+
+        await navigate_to_category(page, subject, category_radio_id)
+        if is_expected_category(await read_cesta(page), subject, category_radio_id):
+            write_snapshot(await context.storage_state(), subject, category_radio_id)
+        else:
+            step.fail("category not reached")
+        return True
+
+async def open_category_page(browser, subject, category_radio_id, use_cache=True, prepare_context=None,
+                             **context_options):
+    """
+    Returns a (context, page) pair with the category selected and the page on question 1,
+    reusing a saved session snapshot when it still points at the right category.
+    """
+    context, from_snapshot = await new_category_context(browser, subject, category_radio_id, use_cache,
+                                                        prepare_context, **context_options)
+    page = await context.new_page()
+    await ensure_category(context, page, subject, category_radio_id, from_snapshot)
+    return context, page
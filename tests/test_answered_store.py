@@ -0,0 +1,66 @@
+import answered_store
+from answered_store import (AnsweredStore, bitset_runs, decode_state, encode_state, expand_answered,
+                            format_answered, from_bitset, read_varint, runs_bitset, to_bitset, write_varint)
+
+def test_varints_round_trip():
+    out = bytearray()
+    for value in (0, 1, 127, 128, 300, 1 << 40):
+        write_varint(out, value)
+    offset, values = 0, []
+    while offset < len(out):
+        value, offset = read_varint(out, offset)
+        values.append(value)
+    assert values == [0, 1, 127, 128, 300, 1 << 40]
+    assert bytes(out[:4]) == b"\x00\x01\x7f\x80"
+
+def test_bitset_runs():
+    questions = {1, 2, 3, 7, 10, 11}
+    bits = to_bitset(questions)
+    assert bitset_runs(bits) == [[1, 4], [7, 8], [10, 12]]
+    assert runs_bitset(bitset_runs(bits)) == bits
+    assert from_bitset(bits) == questions
+    assert bitset_runs(0) == []
+
+def test_state_round_trip():
+    state = {"Číslo a početní operace": to_bitset(range(1, 500)), "Geometrie": to_bitset({5, 9}), "Prázdná": 0}
+    assert decode_state(encode_state(state)) == state
+
+def test_answered_python_format():
+    assert format_answered({1, 2, 3, 5}) == "[range(1, 4), 5]"
+    assert expand_answered([{"name": "A", "answered": [range(1, 4), 5]}]) == {"A": {1, 2, 3, 5}}
+
+def test_store_adds_only_new_numbers_and_shares_them(tmp_path):
+    first, second = AnsweredStore(str(tmp_path)), AnsweredStore(str(tmp_path))
+    first.add("A", [1, 2, 3])
+    first.add("A", [2, 3])
+    second.add("B", [7])
+    assert first.load() == {"A": {1, 2, 3}, "B": {7}}
+    with open(first.log_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+def test_log_is_compacted_into_the_state_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(answered_store, "COMPACT_LOG_BYTES", 100)
+    store = AnsweredStore(str(tmp_path))
+    reader = AnsweredStore(str(tmp_path))
+    assert reader.load() == {}
+    for question in range(1, 40, 2):
+        store.add("A", [question])
+    assert 0 < store.log_offset <= 100
+    assert reader.load() == {"A": set(range(1, 40, 2))}
+    store.compact()
+    assert open(store.log_path, "rb").read() == b""
+    assert AnsweredStore(str(tmp_path)).answered("A") == set(range(1, 40, 2))
+
+def test_torn_log_line_is_ignored(tmp_path):
+    store = AnsweredStore(str(tmp_path))
+    store.add("A", [1])
+    with open(store.log_path, "ab") as f:
+        f.write(b'{"name": "A", "runs": [[5')
+    assert AnsweredStore(str(tmp_path)).load() == {"A": {1}}
+
+def test_export_writes_the_whole_state(tmp_path):
+    store = AnsweredStore(str(tmp_path / "store"))
+    store.add("A", [1, 2, 3, 9])
+    path = str(tmp_path / "answered.py")
+    store.export(path)
+    assert expand_answered(answered_store.load_answered_python(path)) == {"A": {1, 2, 3, 9}}
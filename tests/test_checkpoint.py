@@ -0,0 +1,64 @@
+import io
+
+import pytest
+from PIL import Image
+
+import checkpoint
+from checkpoint import file_record, is_image_complete, missing_questions, record_question
+
+def image_bytes(image_format):
+    out = io.BytesIO()
+    Image.new("RGB", (8, 8), (200, 10, 10)).save(out, image_format)
+    return out.getvalue()
+
+@pytest.mark.parametrize("extension, image_format", [(".png", "PNG"), (".webp", "WEBP")])
+def test_truncated_images_are_incomplete(tmp_path, extension, image_format):
+    data = image_bytes(image_format)
+    path = tmp_path / ("question_1" + extension)
+    path.write_bytes(data)
+    assert is_image_complete(str(path))
+    path.write_bytes(data[:-5])
+    assert not is_image_complete(str(path))
+    assert not is_image_complete(str(tmp_path / "missing.png"))
+
+@pytest.fixture
+def category(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    screenshot_dir, html_dir = tmp_path / "screenshots", tmp_path / "html"
+    screenshot_dir.mkdir()
+    html_dir.mkdir()
+    manifest = checkpoint.new_manifest("ma", "radio_2")
+    for n in (1, 2, 3):
+        (screenshot_dir / f"question_{n}.webp").write_bytes(image_bytes("WEBP"))
+        (html_dir / f"question_{n}.html").write_text(f"text {n}", encoding="utf-8")
+        record_question(manifest, n, {"png": str(screenshot_dir / f"question_{n}.webp"),
+                                      "html": str(html_dir / f"question_{n}.html")})
+    return manifest, screenshot_dir, html_dir
+
+def test_recorded_questions_are_complete(category):
+    manifest, screenshot_dir, html_dir = category
+    assert missing_questions(manifest, [1, 2, 3, 4], str(screenshot_dir), str(html_dir)) == [4]
+    assert checkpoint.load_manifest("ma", "radio_2")["questions"].keys() == {"1", "2", "3"}
+
+def test_changed_or_missing_outputs_are_incomplete(category):
+    manifest, screenshot_dir, html_dir = category
+    (html_dir / "question_1.html").write_text("longer text 1", encoding="utf-8")
+    (screenshot_dir / "question_2.webp").unlink()
+    assert missing_questions(manifest, [1, 2, 3], str(screenshot_dir), str(html_dir)) == [1, 2]
+    assert missing_questions(manifest, [1, 2, 3], str(screenshot_dir), str(html_dir), kinds=("png",)) == [2]
+
+def test_unrecorded_screenshot_counts_if_not_truncated(category):
+    manifest, screenshot_dir, html_dir = category
+    (screenshot_dir / "question_4.png").write_bytes(image_bytes("PNG"))
+    (html_dir / "question_4.html").write_text("text 4", encoding="utf-8")
+    assert missing_questions(manifest, [4], str(screenshot_dir), str(html_dir), kinds=("png",)) == []
+    assert missing_questions(manifest, [4], str(screenshot_dir), str(html_dir)) == [4]
+
+def test_save_keeps_questions_other_workers_recorded(category):
+    manifest, screenshot_dir, _ = category
+    other = checkpoint.load_manifest("ma", "radio_2")
+    del manifest["questions"]["3"]
+    other["questions"]["9"] = file_record(str(screenshot_dir / "question_1.webp"))
+    checkpoint.save_manifest(other)
+    checkpoint.save_manifest(manifest)
+    assert checkpoint.load_manifest("ma", "radio_2")["questions"].keys() == {"1", "2", "3", "9"}
@@ -0,0 +1,37 @@
+import random
+
+from dedup import find_duplicates, shared_blocks, with_answered_duplicates
+
+WORDS = [f"slovo{i}" for i in range(3000)]
+
+def paragraph(generator, length):
+    return " ".join(generator.choice(WORDS) for _ in range(length))
+
+def test_tasks_about_one_passage_are_not_duplicates():
+    generator = random.Random(1)
+    passage = paragraph(generator, 100) + "\n\n" + paragraph(generator, 100)
+    items = [(("cj", "radio_1", "A", n), passage + "\n\n" + paragraph(generator, 15)) for n in range(1, 9)]
+    assert find_duplicates(items) == []
+
+def test_copies_and_near_copies_are_found():
+    generator = random.Random(2)
+    passage = paragraph(generator, 100)
+    task = paragraph(generator, 40) + "\n\n" + paragraph(generator, 30)
+    other_task = paragraph(generator, 15)
+    items = [
+        (("cj", "radio_1", "A", 1), passage + "\n\n" + other_task),
+        (("cj", "radio_1", "A", 2), passage + "\n\n" + paragraph(generator, 15)),
+        (("cj", "radio_1", "A", 3), task),
+        (("cj", "radio_2", "B", 1), task.replace(task.split()[3], "jine")),
+        (("cj", "radio_2", "B", 2), passage + "\n\n" + other_task),
+    ]
+    clusters = sorted(sorted(cluster["members"]) for cluster in find_duplicates(items))
+    assert clusters == [[("cj", "radio_1", "A", 1), ("cj", "radio_2", "B", 2)],
+                        [("cj", "radio_1", "A", 3), ("cj", "radio_2", "B", 1)]]
+
+def test_identical_texts_keep_their_paragraphs():
+    assert shared_blocks(["a\n\nb", "a\n\nb", "a\n\nc"]) == {"a"}
+
+def test_answered_duplicates_count_as_answered():
+    duplicate_map = {("A", 1): {("B", 2)}, ("B", 2): {("A", 1)}}
+    assert with_answered_duplicates({"A": {1}}, duplicate_map) == {"A": {1}, "B": {2}}
@@ -0,0 +1,79 @@
+import pytest
+
+from checkpoint import PNG_TRAILER, file_record
+from delta_sync import extract_fingerprint, fingerprint, plan_sync, shift_runs
+
+def write_question(manifest, screenshot_dir, html_dir, question_number, value):
+    """ Writes complete outputs of a question and records them with fingerprint `value`. """
+    png = screenshot_dir / f"question_{question_number}.png"
+    png.write_bytes(b"\x89PNG" + bytes(question_number) + PNG_TRAILER)
+    html = html_dir / f"question_{question_number}.html"
+    html.write_text(f"text {question_number}", encoding="utf-8")
+    entry = {"png": file_record(png), "html": file_record(html)}
+    if value:
+        entry["fingerprint"] = value
+    manifest["questions"][str(question_number)] = entry
+
+@pytest.fixture
+def dirs(tmp_path):
+    screenshot_dir, html_dir = tmp_path / "screenshots", tmp_path / "html"
+    screenshot_dir.mkdir()
+    html_dir.mkdir()
+    return screenshot_dir, html_dir
+
+def captured(dirs, fingerprints):
+    manifest = {"subject": "ma", "category": "radio_2", "questions": {}}
+    for question_number, value in fingerprints.items():
+        write_question(manifest, *dirs, question_number, value)
+    return manifest
+
+def test_unchanged_questions_are_skipped(dirs):
+    manifest = captured(dirs, {1: "a", 2: "b"})
+    plan = plan_sync(manifest, 2, 2, {1: "a", 2: "b"}, *map(str, dirs))
+    assert plan["capture"] == []
+    assert plan["unchanged"] == 2
+
+def test_new_and_changed_questions(dirs):
+    manifest = captured(dirs, {1: "a", 2: "b"})
+    plan = plan_sync(manifest, 2, 3, {1: "a", 2: "x", 3: "c"}, *map(str, dirs))
+    assert plan["new"] == [3]
+    assert plan["changed"] == [2]
+    assert plan["capture"] == [2, 3]
+
+def test_inserted_question_shifts_the_rest(dirs):
+    manifest = captured(dirs, {1: "a", 2: "b", 3: "c"})
+    plan = plan_sync(manifest, 3, 4, {1: "a", 2: "new", 3: "b", 4: "c"}, *map(str, dirs))
+    assert plan["shifted"] == [(3, 2), (4, 3)]
+    # The inserted question takes over a recorded number, so it counts as a change there
+    assert plan["changed"] == [2]
+    assert plan["capture"] == [2, 3, 4]
+    assert shift_runs(plan["shifted"]) == [(3, 4, 1)]
+
+def test_removed_questions_are_reported(dirs):
+    manifest = captured(dirs, {1: "a", 2: "b", 3: "c"})
+    plan = plan_sync(manifest, 3, 2, {1: "a", 2: "b"}, *map(str, dirs))
+    assert plan["removed"] == [3]
+    assert plan["capture"] == []
+
+def test_unchanged_question_with_missing_or_truncated_files_is_recaptured(dirs):
+    screenshot_dir, html_dir = dirs
+    manifest = captured(dirs, {1: "a", 2: "b", 3: "c"})
+    (html_dir / "question_2.html").unlink()
+    (screenshot_dir / "question_3.png").write_bytes(b"\x89PNG")
+    plan = plan_sync(manifest, 3, 3, {1: "a", 2: "b", 3: "c"}, *map(str, dirs))
+    assert plan["incomplete"] == [2, 3]
+    assert plan["capture"] == [2, 3]
+
+def test_unreadable_and_baseline_questions_are_captured(dirs):
+    manifest = captured(dirs, {1: "a", 2: None})
+    plan = plan_sync(manifest, 2, 2, {1: None, 2: "b"}, *map(str, dirs))
+    assert plan["unreadable"] == [1]
+    assert plan["baseline"] == [2]
+    assert plan["capture"] == [1, 2]
+
+def test_fingerprint_ignores_whitespace_and_shared_passages():
+    page = ("<html><body><div class='container-test'>"
+            "<div class='citace-container'>Passage</div>"
+            "<div class='vypis_zadani'>Solve\n   x + 1 = 2</div></div></body></html>")
+    assert extract_fingerprint(page.encode("utf-8")) == fingerprint(["Solve x + 1 = 2"])
+    assert extract_fingerprint(b"<html><body>Login</body></html>") is None
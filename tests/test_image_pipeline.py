@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from checkpoint import is_image_complete
+from image_pipeline import PngStripWriter
+
+def test_strips_make_one_png(tmp_path):
+    generator = np.random.RandomState(0)
+    strips = [generator.randint(0, 256, size=(height, 30, 3), dtype=np.uint8) for height in (7, 1, 12)]
+    path = str(tmp_path / "results.png")
+    writer = PngStripWriter(path, 30)
+    for strip in strips:
+        writer.add_strip(Image.fromarray(strip))
+    writer.close()
+    assert is_image_complete(path)
+    with Image.open(path) as image:
+        assert image.size == (30, 20)
+        assert np.array_equal(np.asarray(image.convert("RGB")), np.vstack(strips))
+    assert not os.path.exists(path + ".tmp")
+
+def test_strips_are_cropped_or_padded_to_the_width(tmp_path):
+    path = str(tmp_path / "results.png")
+    writer = PngStripWriter(path, 4)
+    writer.add_strip(Image.new("RGB", (6, 2), (10, 20, 30)))
+    writer.add_strip(Image.new("RGBA", (2, 1), (0, 0, 0, 255)))
+    writer.close()
+    with Image.open(path) as image:
+        pixels = np.asarray(image.convert("RGB"))
+    assert pixels.shape == (3, 4, 3)
+    assert (pixels[:2] == (10, 20, 30)).all()
+    assert (pixels[2, :2] == 0).all() and (pixels[2, 2:] == 255).all()
+
+def test_abort_leaves_nothing_behind(tmp_path):
+    path = str(tmp_path / "results.png")
+    writer = PngStripWriter(path, 4)
+    writer.add_strip(Image.new("RGB", (4, 2)))
+    writer.abort()
+    assert os.listdir(tmp_path) == []
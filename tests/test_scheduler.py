@@ -0,0 +1,141 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import scheduler
+from scheduler import (AdaptiveLimiter, ErrorBudget, ErrorBudgetExceeded, PermanentError, Scheduler,
+                       TransientError, WrongPageError, classify, with_retries)
+from tracing import retry_attempt
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(scheduler, "backoff_delay", lambda attempt: 0)
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only the limiter's clock: the event loop keeps the real time.monotonic
+    now = SimpleNamespace(value=100.0)
+    monkeypatch.setattr(scheduler, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+def test_classify():
+    assert isinstance(classify(ConnectionError("reset")), TransientError)
+    assert isinstance(classify(asyncio.TimeoutError()), TransientError)
+    assert isinstance(classify(ValueError("bad")), PermanentError)
+    error = WrongPageError("session expired")
+    assert classify(error) is error
+
+def test_error_budget_allows_a_share_of_the_items():
+    assert ErrorBudget(3).allowed == scheduler.ERROR_BUDGET_MIN
+    budget = ErrorBudget(200)
+    assert budget.allowed == 20
+    for _ in range(20):
+        budget.spend("Question", TransientError("timeout"))
+    with pytest.raises(ErrorBudgetExceeded):
+        budget.spend("Question", TransientError("timeout"))
+
+def test_limiter_waits_for_a_free_slot(clock):
+    async def run():
+        limiter = AdaptiveLimiter(8, initial=2)
+        first = await limiter.acquire()
+        await limiter.acquire()
+        third = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not third.done()
+        await limiter.release(first, ok=True)
+        await asyncio.wait_for(third, 1)
+        assert limiter.in_flight == 2
+
+    asyncio.run(run())
+
+def test_limiter_grows_on_fast_successes_and_halves_once_per_round(clock):
+    async def run():
+        limiter = AdaptiveLimiter(16, initial=4)
+        for _ in range(8):
+            started = await limiter.acquire()
+            clock.value += 1
+            await limiter.release(started, ok=True)
+        grown = limiter.limit
+        assert 5 < grown <= 6
+
+        # Two failures of operations started before the first decrease only halve the limit once
+        first, second = await limiter.acquire(), await limiter.acquire()
+        clock.value += 1
+        await limiter.release(first, ok=False)
+        await limiter.release(second, ok=False)
+        assert limiter.limit == grown / 2
+
+        # A completion far slower than the best latency counts as congestion
+        clock.value += 1
+        started = await limiter.acquire()
+        clock.value += 10
+        await limiter.release(started, ok=True)
+        assert limiter.limit == max(1, grown / 4)
+
+    asyncio.run(run())
+
+def test_limiter_stays_within_its_bounds(clock):
+    async def run():
+        limiter = AdaptiveLimiter(3, initial=2)
+        for _ in range(20):
+            started = await limiter.acquire()
+            clock.value += 1
+            await limiter.release(started, ok=True)
+        assert limiter.limit == 3
+        for _ in range(5):
+            started = await limiter.acquire()
+            clock.value += 1
+            await limiter.release(started, ok=False)
+        assert limiter.limit == 1
+
+    asyncio.run(run())
+
+def test_retries_transient_failures_only():
+    attempts = []
+
+    async def flaky():
+        attempts.append(retry_attempt.get())
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    async def broken():
+        attempts.append(retry_attempt.get())
+        raise ValueError("bad input")
+
+    assert asyncio.run(with_retries("Question 1", flaky, attempts=3)) == "ok"
+    assert attempts == [0, 1, 2]
+
+    attempts.clear()
+    with pytest.raises(PermanentError):
+        asyncio.run(with_retries("Question 1", broken, attempts=3))
+    assert attempts == [0]
+
+def test_call_charges_failures_to_the_budget():
+    async def fail(error):
+        raise error
+
+    async def run():
+        runner = Scheduler(4, total_items=1, attempts=2)
+        assert await runner.call("Question 1", asyncio.sleep, 0, "done") == "done"
+        for number in range(runner.budget.allowed):
+            assert await runner.call(f"Question {number}", fail, TransientError("timeout")) is None
+        assert runner.limiter.in_flight == 0
+        with pytest.raises(ErrorBudgetExceeded):
+            await runner.call("Question 9", fail, ValueError("bad input"))
+
+    asyncio.run(run())
+
+def test_run_all_cancels_the_rest_once_one_raises():
+    finished = []
+
+    async def worker(number):
+        if number == 0:
+            raise ErrorBudgetExceeded("spent")
+        await asyncio.sleep(10)
+        finished.append(number)
+
+    with pytest.raises(ErrorBudgetExceeded):
+        asyncio.run(Scheduler(4, 10).run_all(worker, range(5)))
+    assert finished == []
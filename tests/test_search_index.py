@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from questions import CATEGORIES
+from search_index import SearchIndex, fold, tokenize
+
+@pytest.fixture
+def html_dir(tmp_path):
+    folder = tmp_path / CATEGORIES[0]["name"]
+    folder.mkdir()
+    (folder / "question_1.html").write_text("Vyřešte rovnici pro trojúhelník.", encoding="utf-8")
+    (folder / "question_2.html").write_text("Rovnice s rovnicemi, rovnice všude.", encoding="utf-8")
+    (folder / "question_3.html").write_text("Obsah čtverce.", encoding="utf-8")
+    return tmp_path
+
+def test_folding_and_stemming():
+    assert fold("Příliš žluťoučký") == "prilis zlutoucky"
+    assert tokenize("rovnice rovnici") == ["rovnic", "rovnic"]
+
+def test_search_scores_by_term_frequency(html_dir, tmp_path):
+    index = SearchIndex()
+    assert index.update(str(html_dir)) == (3, 0)
+    hits = index.search("rovnice")
+    assert [hit["question"] for hit in hits] == [2, 1]
+    assert "Rovnice" in hits[0]["snippet"]
+    assert [hit["question"] for hit in index.search("rovnice trojuhelnik")] == [1]
+    assert index.search("kruh") == []
+
+def test_saved_index_searches_and_updates(html_dir, tmp_path):
+    path = str(tmp_path / "index.bin")
+    index = SearchIndex()
+    index.update(str(html_dir))
+    index.save(path)
+
+    loaded = SearchIndex.load(path)
+    assert [hit["question"] for hit in loaded.search("čtverce")] == [3]
+
+    folder = html_dir / CATEGORIES[0]["name"]
+    os.remove(folder / "question_1.html")
+    (folder / "question_3.html").write_text("Obvod kruhu.", encoding="utf-8")
+    assert loaded.update(str(html_dir)) == (1, 1)
+    loaded.save(path)
+    reloaded = SearchIndex.load(path)
+    assert reloaded.search("ctverce") == []
+    assert [hit["question"] for hit in reloaded.search("kruh")] == [3]
+    assert [hit["question"] for hit in reloaded.search("rovnice")] == [2]
+
+def test_unreadable_index_starts_empty(tmp_path):
+    path = tmp_path / "index.bin"
+    path.write_bytes(b"not an index")
+    assert SearchIndex.load(str(path)).docs == {}
@@ -0,0 +1,64 @@
+import pytest
+
+from work_queue import MAX_ATTEMPTS, WorkQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    yield queue
+    queue.close()
+
+def test_claims_shards_in_order_and_only_once(queue):
+    assert queue.enqueue_category("ma", "radio_2", 60, 25) == 3
+    assert queue.enqueue_category("ma", "radio_2", 60, 25) == 0
+    first, second = queue.claim("a"), queue.claim("b")
+    assert (first["start_question"], first["end_question"]) == (1, 25)
+    assert (second["start_question"], second["end_question"]) == (26, 50)
+    assert queue.claim("c")["start_question"] == 51
+    assert queue.claim("d") is None
+    assert queue.has_unfinished()
+
+def test_complete_only_by_the_lease_holder(queue):
+    queue.enqueue_category("ma", "radio_2", 10, 25)
+    shard = queue.claim("a")
+    assert not queue.complete(shard, "b")
+    assert queue.complete(shard, "a")
+    assert queue.counts() == {"done": 1}
+    assert not queue.has_unfinished()
+
+def test_expired_lease_is_requeued_and_lost_by_its_worker(queue):
+    queue.enqueue_category("ma", "radio_2", 10, 25)
+    shard = queue.claim("a", lease_seconds=-1)
+    taken_over = queue.claim("b")
+    assert taken_over["id"] == shard["id"]
+    assert taken_over["attempts"] == 2
+    assert not queue.heartbeat(shard, "a")
+    assert queue.heartbeat(taken_over, "b")
+
+def test_shard_is_parked_after_max_attempts(queue):
+    queue.enqueue_category("ma", "radio_2", 10, 25)
+    for _ in range(MAX_ATTEMPTS):
+        assert queue.claim("a", lease_seconds=-1) is not None
+    assert queue.claim("a") is None
+    assert queue.counts() == {"failed": 1}
+    assert queue.requeue_failed() == 1
+    assert queue.claim("a")["attempts"] == 1
+
+def test_fail_requeues_until_out_of_attempts(queue):
+    queue.enqueue_category("ma", "radio_2", 10, 25)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        shard = queue.claim("a")
+        assert shard["attempts"] == attempt
+        queue.fail(shard, "a", RuntimeError("boom"))
+    assert queue.counts() == {"failed": 1}
+
+def test_split_keeps_the_first_range_and_queues_the_rest(queue):
+    queue.enqueue_category("ma", "radio_2")
+    shard = queue.claim("a")
+    assert shard["end_question"] is None
+    assert queue.category_total(shard) is None
+    shard = queue.split(shard, "a", 60, 25)
+    assert (shard["start_question"], shard["end_question"]) == (1, 25)
+    assert queue.category_total(shard) == 60
+    assert [queue.claim("b")["start_question"], queue.claim("c")["start_question"]] == [26, 51]
+    assert queue.heartbeat(shard, "a")
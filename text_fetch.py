@@ -0,0 +1,97 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+import lxml.html
+
+from blob_store import write_output
+from scheduler import TransientError, WrongPageError
+from tracing import span
+
+# Same containers as the `div.citace-container, div.vypis_zadani` locator in scrape.py
+QUESTION_TEXT_XPATH = ("//div[contains(concat(' ', normalize-space(@class), ' '), ' citace-container ')"
+                       " or contains(concat(' ', normalize-space(@class), ' '), ' vypis_zadani ')]")
+CONTAINER_TEST_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' container-test ')]"
+
+# Elements that start a new line in the rendered text, like `innerText` does
+BLOCK_TAGS = {"address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "fieldset", "figcaption",
+              "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main",
+              "nav", "ol", "p", "pre", "section", "table", "tbody", "thead", "tfoot", "tr", "ul"}
+SKIPPED_TAGS = {"script", "style", "noscript", "template"}
+
+def create_session(cookies, user_agent=None, pool_size=8):
+    """
+    Returns a keep-alive HTTP session carrying the browser's cookies
+    (as returned by Playwright's `context.cookies()`), with a connection pool of `pool_size`.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=2)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if user_agent:
+        session.headers["User-Agent"] = user_agent
+    for cookie in cookies:
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+    return session
+
+def inner_text(element):
+    """ Approximates the browser's `innerText`: block elements and <br> break lines, other whitespace collapses. """
+    lines = [""]
+
+    def walk(node):
+        tag = node.tag if isinstance(node.tag, str) else None
+        if tag in SKIPPED_TAGS:
+            return
+        if tag == "br":
+            lines.append("")
+        elif tag in BLOCK_TAGS and lines[-1].strip():
+            lines.append("")
+        if node.text and tag is not None:
+            lines[-1] += node.text
+        for child in node:
+            walk(child)
+            if child.tail:
+                lines[-1] += child.tail
+        if tag in BLOCK_TAGS and lines[-1].strip():
+            lines.append("")
+
+    walk(element)
+    return "\n".join(" ".join(line.split()) for line in lines if line.strip())
+
+def extract_question_text(html, encoding="utf-8"):
+    """
+    Returns the question text of a `test-kategorie.php?poradi_ulohy=N` page, joined the same way
+    as the Playwright path, or None if the page is not a question page (e.g. the session expired).
+    """
+    document = lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding=encoding))
+    if not document.xpath(CONTAINER_TEST_XPATH):
+        return None
+    return "\n\n".join(inner_text(element) for element in document.xpath(QUESTION_TEXT_XPATH))
+
+def fetch_page(session, url, step, timeout=30):
+    """ Returns (body, encoding) of `url`; network and HTTP errors are raised as TransientError. """
+    try:
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise TransientError(f"{type(e).__name__}: {e}") from e
+    step.add_bytes(len(response.content))
+    # Without a charset in the headers, requests would assume ISO-8859-1; the site serves UTF-8.
+    encoding = response.encoding if "charset" in response.headers.get("content-type", "") else "utf-8"
+    return response.content, encoding
+
+def fetch_question_text(session, base_test_url, question_number, html_dir, timeout=30):
+    """
+    Fetches and saves one question's text and returns the written path. Raises TransientError,
+    or WrongPageError when no question page came back (e.g. the session expired).
+    Run it through a `scheduler.Scheduler`, which retries it and charges failures to the error budget.
+    """
+    with span("fetch_question_text", question=question_number) as step:
+        html, encoding = fetch_page(session, base_test_url + str(question_number), step, timeout)
+        text = extract_question_text(html, encoding)
+        if text is None:
+            raise WrongPageError(f"Question {question_number} did not return a question page (session expired?)")
+        html_filename = os.path.join(html_dir, f"question_{question_number}.html")
+        write_output(html_filename, text.encode("utf-8"))
+        print(f"Saved question HTML to: {html_filename}")
+        return html_filename
@@ -0,0 +1,199 @@
+import os
+import json
+import math
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Span tracing for the navigation steps and question captures. Off unless `enable_tracing`
+# is called (e.g. via `scrape.py --trace`); the helpers then record one span per call.
+
+TRACER = None
+
+current_span = contextvars.ContextVar("current_span", default=None)
+# Set by `scheduler.with_retries` around a repeated attempt; claimed by the first span the attempt opens
+retry_attempt = contextvars.ContextVar("retry_attempt", default=0)
+
+class Span:
+    """ One timed step. Helpers that swallow their exceptions report them with `fail`. """
+
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.outcome = "ok"
+        self.error = None
+        self.retries = 0
+        self.bytes = 0
+
+    def fail(self, error):
+        self.outcome = "error"
+        self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+    def retry(self):
+        self.retries += 1
+
+    def add_bytes(self, count):
+        self.bytes += count
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+class NullSpan(Span):
+    """ Returned while tracing is off, so call sites never need to check. """
+
+    def __init__(self):
+        super().__init__(None, None, {})
+
+    def fail(self, error):
+        pass
+
+    def retry(self):
+        pass
+
+    def add_bytes(self, count):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Tracer:
+    """
+    Collects finished spans. Each one is appended to a JSONL file as it ends, so a killed
+    run keeps what it had; the Chrome trace (chrome://tracing, Perfetto) is written by `close`.
+    """
+
+    def __init__(self, jsonl_path, chrome_trace_path=None):
+        self.jsonl_path = jsonl_path
+        self.chrome_trace_path = chrome_trace_path
+        self.lock = threading.Lock()
+        self.spans = []
+        self.lanes = {}
+        self.next_id = 0
+        self.started = time.time()
+        self.jsonl = open(jsonl_path, "a", encoding="utf-8")
+
+    def lane(self):
+        """ One timeline row per asyncio task or thread, so concurrent tabs show side by side. """
+        try:
+            key = ("task", id(asyncio.current_task()))
+        except RuntimeError:
+            key = ("thread", threading.get_ident())
+        with self.lock:
+            return self.lanes.setdefault(key, len(self.lanes) + 1)
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    def record(self, span, start, end, lane):
+        entry = {
+            "id": span.id, "parent": span.parent, "name": span.name, "start": start, "duration_ms": (end - start) * 1000,
+            "outcome": span.outcome, "error": span.error, "retries": span.retries, "bytes": span.bytes,
+            "lane": lane, **span.attrs,
+        }
+        with self.lock:
+            self.spans.append(entry)
+            self.jsonl.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def write_chrome_trace(self):
+        events = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": lane,
+                   "args": {"name": f"{kind} {lane}"}} for (kind, _), lane in self.lanes.items()]
+        for entry in self.spans:
+            args = {key: value for key, value in entry.items()
+                    if key not in ("name", "start", "duration_ms", "lane") and value not in (None, 0)}
+            events.append({"name": entry["name"], "cat": entry["outcome"], "ph": "X", "pid": os.getpid(),
+                           "tid": entry["lane"], "ts": (entry["start"] - self.started) * 1e6,
+                           "dur": entry["duration_ms"] * 1000, "args": args})
+        with open(self.chrome_trace_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    def summary(self):
+        """ {span name: {"count", "errors", "retries", "p50_ms", "p95_ms", "max_ms", "total_s"}} """
+        by_name = {}
+        for entry in self.spans:
+            by_name.setdefault(entry["name"], []).append(entry)
+        result = {}
+        for name, entries in by_name.items():
+            durations = sorted(entry["duration_ms"] for entry in entries)
+            result[name] = {
+                "count": len(entries),
+                "errors": sum(entry["outcome"] != "ok" for entry in entries),
+                "retries": sum(entry["retries"] for entry in entries),
+                "p50_ms": percentile(durations, 50),
+                "p95_ms": percentile(durations, 95),
+                "max_ms": durations[-1],
+                "total_s": sum(durations) / 1000,
+            }
+        return result
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"{'step':<28} {'count':>6} {'errors':>6} {'retries':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} "
+              f"{'total s':>8}")
+        for name, s in sorted(summary.items(), key=lambda item: -item[1]["total_s"]):
+            print(f"{name:<28} {s['count']:>6} {s['errors']:>6} {s['retries']:>7} {s['p50_ms']:>9.0f} "
+                  f"{s['p95_ms']:>9.0f} {s['max_ms']:>9.0f} {s['total_s']:>8.1f}")
+
+    def close(self):
+        self.jsonl.close()
+        if self.chrome_trace_path:
+            self.write_chrome_trace()
+        self.print_summary()
+
+def percentile(sorted_values, p):
+    """ Nearest-rank percentile of an already sorted list. """
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def enable_tracing(prefix):
+    """ Starts recording spans to `<prefix>.jsonl` and `<prefix>.trace.json`. """
+    global TRACER
+    TRACER = Tracer(prefix + ".jsonl", prefix + ".trace.json")
+    print(f"Tracing to {prefix}.jsonl and {prefix}.trace.json")
+
+def finish_tracing():
+    """ Writes the Chrome trace and prints the per-step summary. """
+    global TRACER
+    if TRACER is not None:
+        TRACER.close()
+        TRACER = None
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times the enclosed block as a step called `name`. An exception escaping the block
+    marks the span as failed and is re-raised; swallowed errors are reported with `fail`.
+    The first span opened by a retried attempt counts the retry and records its `attempt` number.
+    """
+    tracer = TRACER
+    if tracer is None:
+        yield NULL_SPAN
+        return
+    parent = current_span.get()
+    current = Span(name, parent.id if parent else None, attrs)
+    current.id = tracer.new_id()
+    attempt = retry_attempt.get()
+    if attempt:
+        current.retry()
+        current.attrs["attempt"] = attempt
+    token = current_span.set(current)
+    attempt_token = retry_attempt.set(0)
+    lane = tracer.lane()
+    start = time.time()
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(e)
+        raise
+    finally:
+        retry_attempt.reset(attempt_token)
+        current_span.reset(token)
+        tracer.record(current, start, time.time(), lane)
@@ -0,0 +1,238 @@
+import os
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+
+from category_cache import cached_total
+from questions import CATEGORIES
+
+# Shared by every worker; put it on a filesystem all machines can reach. SQLite's rollback journal relies
+# on the filesystem's locks, so the share must support them (NFS with working locking, not a synced folder).
+# Leases expire by comparing `time.time()` of different hosts: keep the machines' clocks in sync (NTP).
+QUEUE_PATH = "work_queue.db"
+SHARD_SIZE = 25
+# A shard whose worker stopped heartbeating for this long goes back to the queue
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 30
+# After this many expired or failed leases a shard is parked as "failed"
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    subject TEXT NOT NULL,
+    category TEXT NOT NULL,
+    start_question INTEGER NOT NULL,
+    end_question INTEGER,
+    state TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL,
+    UNIQUE (subject, category, start_question)
+);
+CREATE INDEX IF NOT EXISTS shards_state ON shards (state, id);
+"""
+
+# Shards are (category, question range). A category whose total is not known yet gets a single
+# shard with end_question NULL: its worker detects the total and splits it (see `split`).
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def shard_ranges(total, shard_size=SHARD_SIZE):
+    return [(start, min(start + shard_size - 1, total)) for start in range(1, total + 1, shard_size)]
+
+class WorkQueue:
+    """
+    Lease-based queue of scraping shards in one SQLite database. Claims run in
+    IMMEDIATE transactions, so any number of processes can share the file.
+    The default rollback journal works across machines sharing the file; WAL is faster
+    but needs shared memory on one host, so it is only used with `single_host`.
+    The connection may be used from several threads (e.g. `asyncio.to_thread`); `lock` serializes them.
+    """
+
+    def __init__(self, path=QUEUE_PATH, single_host=False):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if single_host else 'DELETE'}")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def transaction(self):
+        """ Takes the write lock up front, so two workers never claim the same shard. """
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def enqueue_category(self, subject, category_radio_id, total=None, shard_size=SHARD_SIZE):
+        """ Adds the shards of one category; shards already in the queue are left as they are. Returns the count added. """
+        with self.lock:
+            ranges = shard_ranges(total, shard_size) if total else [(1, None)]
+            conn = self.transaction()
+            try:
+                added = 0
+                for start, end in ranges:
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO shards (subject, category, start_question, end_question, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?)", (subject, category_radio_id, start, end, time.time()))
+                    added += cursor.rowcount
+                conn.execute("COMMIT")
+                return added
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def requeue_expired(self, conn, now):
+        """ Puts shards with lapsed leases back in the queue, or parks them once out of attempts. """
+        conn.execute("UPDATE shards SET state = 'failed', error = 'lease expired', worker = NULL, updated_at = ?"
+                     " WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?", (now, now, MAX_ATTEMPTS))
+        cursor = conn.execute("UPDATE shards SET state = 'queued', worker = NULL, updated_at = ?"
+                              " WHERE state = 'leased' AND lease_expires < ?", (now, now))
+        if cursor.rowcount:
+            print(f"Re-queued {cursor.rowcount} shard(s) whose lease expired.")
+
+    def claim(self, worker, lease_seconds=LEASE_SECONDS):
+        """ Leases the oldest queued shard to `worker`. Returns it as a dict, or None if none is queued. """
+        with self.lock:
+            now = time.time()
+            conn = self.transaction()
+            try:
+                self.requeue_expired(conn, now)
+                row = conn.execute("SELECT id, subject, category, start_question, end_question, attempts FROM shards"
+                                   " WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+                if row is not None:
+                    conn.execute("UPDATE shards SET state = 'leased', worker = ?, lease_expires = ?,"
+                                 " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                                 (worker, now + lease_seconds, now, row[0]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if row is None:
+                return None
+            keys = ("id", "subject", "category", "start_question", "end_question", "attempts")
+            # Including this claim, as `fail` compares it with MAX_ATTEMPTS
+            return dict(zip(keys, row[:-1] + (row[-1] + 1,)))
+
+    def heartbeat(self, shard, worker, lease_seconds=LEASE_SECONDS):
+        """ Extends the lease. Returns False if the shard was meanwhile handed to another worker. """
+        with self.lock:
+            now = time.time()
+            cursor = self.conn.execute("UPDATE shards SET lease_expires = ?, updated_at = ?"
+                                       " WHERE id = ? AND worker = ? AND state = 'leased'",
+                                       (now + lease_seconds, now, shard["id"], worker))
+            return cursor.rowcount == 1
+
+    def complete(self, shard, worker):
+        with self.lock:
+            cursor = self.conn.execute("UPDATE shards SET state = 'done', error = NULL, lease_expires = NULL,"
+                                       " updated_at = ? WHERE id = ? AND worker = ?", (time.time(), shard["id"], worker))
+            return cursor.rowcount == 1
+
+    def fail(self, shard, worker, error):
+        """ Returns the shard to the queue for another attempt, or parks it as failed. """
+        with self.lock:
+            state = "failed" if shard["attempts"] >= MAX_ATTEMPTS else "queued"
+            self.conn.execute("UPDATE shards SET state = ?, worker = NULL, lease_expires = NULL, error = ?,"
+                              " updated_at = ? WHERE id = ? AND worker = ?",
+                              (state, str(error), time.time(), shard["id"], worker))
+
+    def split(self, shard, worker, total, shard_size=SHARD_SIZE):
+        """
+        Turns a detect-total shard into the category's real ranges once `total` is known.
+        The first range stays leased to `worker`; the rest are queued. Returns the updated shard.
+        """
+        with self.lock:
+            ranges = shard_ranges(total, shard_size)
+            conn = self.transaction()
+            try:
+                conn.execute("UPDATE shards SET end_question = ?, updated_at = ? WHERE id = ? AND worker = ?",
+                             (ranges[0][1], time.time(), shard["id"], worker))
+                for start, end in ranges[1:]:
+                    conn.execute("INSERT OR IGNORE INTO shards (subject, category, start_question, end_question, updated_at)"
+                                 " VALUES (?, ?, ?, ?, ?)", (shard["subject"], shard["category"], start, end, time.time()))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return dict(shard, end_question=ranges[0][1])
+
+    def category_total(self, shard):
+        """ The shard's category total (its highest queued question), or None while it is still being detected. """
+        with self.lock:
+            row = self.conn.execute("SELECT MAX(end_question), COUNT(*) - COUNT(end_question) FROM shards"
+                                    " WHERE subject = ? AND category = ?", (shard["subject"], shard["category"])).fetchone()
+            return row[0] if row[1] == 0 else None
+
+    def counts(self):
+        """ {state: number of shards} """
+        with self.lock:
+            return dict(self.conn.execute("SELECT state, COUNT(*) FROM shards GROUP BY state"))
+
+    def has_unfinished(self):
+        """ True while shards are queued or leased (an expired lease may still come back). """
+        counts = self.counts()
+        return counts.get("queued", 0) + counts.get("leased", 0) > 0
+
+    def requeue_failed(self):
+        with self.lock:
+            cursor = self.conn.execute("UPDATE shards SET state = 'queued', attempts = 0, error = NULL, updated_at = ?"
+                                       " WHERE state = 'failed'", (time.time(),))
+            return cursor.rowcount
+
+    def print_status(self):
+        counts = self.counts()
+        print(", ".join(f"{state}: {counts.get(state, 0)}" for state in ("queued", "leased", "done", "failed")))
+        now = time.time()
+        for row in self.conn.execute("SELECT subject, category, start_question, end_question, worker, lease_expires"
+                                     " FROM shards WHERE state = 'leased' ORDER BY id"):
+            subject, category, start, end, worker, expires = row
+            print(f"  {subject}/{category} {start}-{end if end else '?'} leased by {worker}, "
+                  f"expires in {int(expires - now)} s")
+        for row in self.conn.execute("SELECT subject, category, start_question, end_question, error FROM shards"
+                                     " WHERE state = 'failed' ORDER BY id"):
+            subject, category, start, end, error = row
+            print(f"  {subject}/{category} {start}-{end if end else '?'} failed: {error}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Shared work queue for sharded scraping. Fill it here, then start any number of "
+                    "`scrape.py --queue PATH` workers (on one machine or several sharing the filesystem; "
+                    "leases expire by wall-clock time, so keep the machines' clocks in sync)."
+    )
+    parser.add_argument("--queue", type=str, default=QUEUE_PATH, help=f"Queue database (default: {QUEUE_PATH}).")
+    parser.add_argument("--single-host", action="store_true",
+                        help="All workers run on this machine: use SQLite's faster WAL journal. "
+                             "Never use it for a queue shared over a network filesystem.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add categories to the queue, split into question ranges.")
+    enqueue_parser.add_argument("--all", action="store_true", help="Every category from questions.CATEGORIES.")
+    enqueue_parser.add_argument("--subject", type=str, default="ma", choices=["ma", "cj"])
+    enqueue_parser.add_argument("--category", type=str, default="radio_2")
+    enqueue_parser.add_argument("--shard-size", type=int, default=SHARD_SIZE,
+                                help=f"Questions per shard (default: {SHARD_SIZE}).")
+    subparsers.add_parser("status", help="Show the shard counts, active leases and failures.")
+    subparsers.add_parser("requeue-failed", help="Give failed shards a fresh set of attempts.")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue, args.single_host)
+    if args.command == "enqueue":
+        categories = CATEGORIES if args.all else [{"subject": args.subject, "category": args.category}]
+        added = 0
+        for item in categories:
+            # Unknown totals are detected by the first worker that claims the category
+            total = cached_total(item["subject"], item["category"])
+            added += queue.enqueue_category(item["subject"], item["category"], total, args.shard_size)
+        print(f"Added {added} shard(s) for {len(categories)} categor{'y' if len(categories) == 1 else 'ies'}.")
+        queue.print_status()
+    elif args.command == "status":
+        queue.print_status()
+    elif args.command == "requeue-failed":
+        print(f"Re-queued {queue.requeue_failed()} failed shard(s).")
+    queue.close()